@@ -0,0 +1,64 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt5.QtWidgets import QCompleter
+
+from gazetteer import complete_city, complete_street
+
+
+class CompletionModel(QAbstractListModel):
+    """Список вариантов, который пересчитывается запросом к индексу на каждое нажатие."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.items[index.row()]
+        return None
+
+    def set_items(self, items):
+        if items == self.items:
+            return
+        self.beginResetModel()
+        self.items = items
+        self.endResetModel()
+
+
+def _attach(field, complete):
+    model = CompletionModel(field)
+    completer = QCompleter(model, field)
+    # Фильтрует индекс, а не QCompleter: показываем все найденные варианты
+    completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+    completer.setCaseSensitivity(Qt.CaseInsensitive)
+    field.setCompleter(completer)
+
+    def on_edited(text):
+        model.set_items(complete(text) if text.strip() else [])
+        if model.items:
+            completer.complete()
+        else:
+            completer.popup().hide()
+
+    field.textEdited.connect(on_edited)
+    return completer
+
+
+def attach_city_completer(field):
+    return _attach(field, complete_city)
+
+
+def attach_street_completer(field, city_field):
+    """Автодополнение улицы в пределах города из city_field.
+
+    Дополняется только часть адреса до первой запятой (название улицы).
+    """
+    def complete(text):
+        street, comma, _ = text.partition(",")
+        if comma:
+            return []
+        return complete_street(city_field.text(), street)
+
+    return _attach(field, complete)
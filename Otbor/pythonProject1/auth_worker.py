@@ -0,0 +1,57 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class _CheckSignals(QObject):
+    # номер запроса, логин, результат authenticate()
+    finished = pyqtSignal(int, str, object)
+    # номер запроса, текст ошибки
+    failed = pyqtSignal(int, str)
+
+
+class CredentialCheckTask(QRunnable):
+    def __init__(self, checker, request_id, login, password):
+        super().__init__()
+        self.checker = checker
+        self.request_id = request_id
+        self.login = login
+        self.password = password
+
+    def run(self):
+        try:
+            result = self.checker.get_registry().authenticate(self.login, self.password)
+        except Exception as e:
+            self.checker.signals.failed.emit(self.request_id, str(e))
+            return
+        self.checker.signals.finished.emit(self.request_id, self.login, result)
+
+
+class CredentialChecker(QObject):
+    """Проверка пароля в рабочем потоке, чтобы медленный KDF или запрос к сервису не блокировал окно.
+
+    get_registry вызывается в рабочем потоке, поэтому первое открытие хранилищ
+    тоже не задерживает интерфейс. Результат — словарь Registry.authenticate().
+    """
+
+    finished = pyqtSignal(str, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, get_registry, parent=None, pool=None):
+        super().__init__(parent)
+        self.get_registry = get_registry
+        self.pool = pool or QThreadPool.globalInstance()
+        self.current = 0
+        self.signals = _CheckSignals()
+        self.signals.finished.connect(self._on_finished)
+        self.signals.failed.connect(self._on_failed)
+
+    def check(self, login, password):
+        self.current += 1
+        self.pool.start(CredentialCheckTask(self, self.current, login, password))
+
+    def _on_finished(self, request_id, login, result):
+        if request_id == self.current:
+            self.finished.emit(login, result)
+
+    def _on_failed(self, request_id, message):
+        if request_id == self.current:
+            self.failed.emit(message)
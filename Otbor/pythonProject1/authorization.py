@@ -1,16 +1,32 @@
+import time
+STARTED = time.perf_counter()
+
 import sys
-import hashlib
+import math
+import threading
 import uuid
-import time
 import os
-import re
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QMessageBox, QWidget,
     QVBoxLayout, QLabel, QLineEdit, QPushButton, QFormLayout, QFileDialog, QCompleter
 )
 from PyQt5.QtCore import QTimer, Qt
-from PyQt5.QtGui import QPixmap
-from PIL import Image
+from metrics import timed_slot
+from startup import measure_first_paint, startup_time_requested
+
+# Реестр: локальная база или сервис (SESSIA_SERVICE_URL), создается при первом обращении
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    # Вызывается в том числе из рабочего потока проверки пароля
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            from registry import connect
+            _registry = connect()
+    return _registry
 
 
 class CreateDriverWindow(QWidget):
@@ -19,6 +35,10 @@ class CreateDriverWindow(QWidget):
         self.init_ui()
 
     def init_ui(self):
+        from form_validation import FormValidator, duplicate_check
+        from photo_loader import PhotoLoader
+        from uniqueness import PASSPORT
+
         self.setWindowTitle("Создание водителя")
         self.setGeometry(560, 290, 800, 500)
 
@@ -44,9 +64,25 @@ class CreateDriverWindow(QWidget):
         self.notes_field = QLineEdit()
         self.choose_photo_button = QPushButton("Выбрать фото")
         self.choose_photo_button.clicked.connect(self.choose_photo)
+        self.photo_loader = PhotoLoader(self, perceptual_hash=True)
+        self.photo_loader.loaded.connect(self.on_photo_loaded)
+        self.photo_loader.failed.connect(self.on_photo_failed)
+        self.previous_preview = None
         self.submit_button = QPushButton("Сохранить")
         self.submit_button.clicked.connect(self.validate_data)
 
+        # В этой форме нет полей городов и фото не обязательно
+        self.form_validator = FormValidator("driver_no_city", {
+            "last_name": self.last_name_field,
+            "first_name": self.first_name_field,
+            "middle_name": self.middle_name_field,
+            "passport": self.passport_field,
+            "registration_address": self.registration_address_field,
+            "living_address": self.living_address_field,
+            "phone": self.phone_field,
+            "email": self.email_field,
+        }, self)
+        self.form_validator.add_async_check("passport", duplicate_check(get_registry, PASSPORT, self.guid_field.text()))
 
         form_layout = QFormLayout()
         form_layout.addRow("Идентификатор (GUID):", self.guid_field)
@@ -69,44 +105,59 @@ class CreateDriverWindow(QWidget):
         form_layout.addRow("", self.submit_button)
         self.setLayout(form_layout)
 
+    @timed_slot("gui.choose_photo")
     def choose_photo(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Выберите фотографию", "", "Images (*.jpg *.png)")
         if file_path:
-            try:
-                image = Image.open(file_path)
-                width, height = image.size
-                file_size = os.path.getsize(file_path)
-                if width / height == 3 / 4:
-                    raise ValueError("Соотношение сторон изображения должно быть 3:4.")
-                if height < width:
-                    raise ValueError("Изображение должно быть вертикальным.")
-                if file_size > 2 * 1024 * 1024:
-                    raise ValueError("Размер изображения не должен превышать 2 МБ.")
-                self.photo_path_label.setText(f"Фото выбрано: {os.path.basename(file_path)}")
-                self.photo_preview.setPixmap(QPixmap(file_path).scaled(100, 133, Qt.KeepAspectRatio))
-                self.photo_path = file_path
-            except Exception as e:
-                QMessageBox.warning(self, "Ошибка", str(e))
+            # Проверка и декодирование идут в фоне, предыдущий незавершенный выбор отменяется
+            self.previous_preview = self.photo_preview.pixmap()
+            self.photo_preview.setText("Загрузка...")
+            self.photo_loader.load(file_path)
+
+    def on_photo_loaded(self, file_path, pixmap):
+        self.photo_path_label.setText(f"Фото выбрано: {os.path.basename(file_path)}")
+        self.photo_preview.setPixmap(pixmap)
+        self.photo_path = file_path
+        self.photo_hash = self.photo_loader.photo_hash
+
+    def on_photo_failed(self, file_path, message):
+        if self.previous_preview is not None and not self.previous_preview.isNull():
+            self.photo_preview.setPixmap(self.previous_preview)
+        else:
+            self.photo_preview.clear()
+        QMessageBox.warning(self, "Ошибка", message)
+
+    def collect_data(self):
+        """Данные формы в виде записи для модуля validation."""
+        return {
+            "driver_id": self.guid_field.text(),
+            "last_name": self.last_name_field.text(),
+            "first_name": self.first_name_field.text(),
+            "middle_name": self.middle_name_field.text(),
+            "passport": self.passport_field.text(),
+            "registration_address": self.registration_address_field.text(),
+            "living_address": self.living_address_field.text(),
+            "workplace": self.workplace_field.text(),
+            "position": self.position_field.text(),
+            "phone": self.phone_field.text(),
+            "email": self.email_field.text(),
+            "photo_path": getattr(self, 'photo_path', None),
+            "notes": self.notes_field.text(),
+            "photo_hash": getattr(self, 'photo_hash', None),
+        }
 
+    @timed_slot("gui.validate_data")
     def validate_data(self):
-        errors = []
-        if not self.last_name_field.text():
-            errors.append("Фамилия обязательна.")
-        if not self.first_name_field.text():
-            errors.append("Имя обязательно.")
-        if not self.middle_name_field.text():
-            errors.append("Отчество обязательно.")
-        if not self.passport_field.text() or not re.match(r"^\d{4}\s\d{6}$", self.passport_field.text()):
-            errors.append("Паспорт должен быть в формате 'XXXX XXXXXX'.")
-        if not self.registration_address_field.text():
-            errors.append("Адрес регистрации обязателен.")
-        if not self.living_address_field.text():
-            errors.append("Адрес проживания обязателен.")
-        if not self.phone_field.text() or not re.match(r"^\+7\d{10}$", self.phone_field.text()):
-            errors.append("Телефон должен быть в формате '+7XXXXXXXXXX'.")
-        if not self.email_field.text() or not re.match(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$", self.email_field.text()):
-            errors.append("Email имеет неверный формат.")
-            QMessageBox.warning(self, "Ошибки", "\n".join(errors))
+        from registry import RegistryError
+
+        if not self.form_validator.submit():
+            return
+        try:
+            get_registry().save_driver(self.collect_data(), profile="driver_no_city")
+        except RegistryError as e:
+            rest = self.form_validator.show_errors(e.errors)
+            if rest or not e.errors:
+                QMessageBox.warning(self, "Ошибки", "\n".join(rest.values()) or e.message)
         else:
             QMessageBox.information(self, "Успех", "Водитель успешно сохранен!")
 
@@ -136,9 +187,7 @@ class MainApplication(QMainWindow):
 class AuthSystem(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.attempts = 0
         self.locked = False
-        self.lock_time = 60  # блокировка на 60 секунд
         self.last_activity_time = time.time()
         self.setWindowTitle("Авторизация")
         self.setGeometry(810, 440, 300, 200)
@@ -166,46 +215,54 @@ class AuthSystem(QMainWindow):
 
         self.lock_timer = QTimer()
         self.lock_timer.timeout.connect(self.unlock)
+        self.credential_checker = None
 
+    @timed_slot("gui.check_credentials")
     def check_credentials(self):
-        if self.locked:
-            QMessageBox.warning(self, "Ошибка", "У вас слишком много неудачных попыток входа. Попробуйте через 1 минуту.")
-            return
-
-        def hash(text):
-            return hashlib.sha256(text.encode()).hexdigest()
-
-        hash_password = '98fe442255035a1459bb5b86fda03d7c34c23d512b1b5bf3a5ecb7a802601895'
-
         username = self.username_input.text()
-        password = self.password_input.text()
-        hash_input_password = hash(password)
+        if self.credential_checker is None:
+            from auth_worker import CredentialChecker
+            self.credential_checker = CredentialChecker(get_registry, self)
+            self.credential_checker.finished.connect(self.on_credentials_checked)
+            self.credential_checker.failed.connect(self.on_check_failed)
 
+        # Пароль проверяется в фоне, кнопка недоступна до ответа
+        self.login_button.setEnabled(False)
+        self.credential_checker.check(username, self.password_input.text())
 
-        if username == "inspector" and hash_input_password == hash_password:
-            QMessageBox.information(self, "Успех", "Добро пожаловать, inspector!")
-            self.reset_attempts()
+    def on_check_failed(self, message):
+        self.login_button.setEnabled(True)
+        QMessageBox.warning(self, "Ошибка", f"Не удалось проверить пароль: {message}")
+
+    def on_credentials_checked(self, username, result):
+        self.login_button.setEnabled(True)
+        locked_for = result["locked_for"]
+        if result["ok"]:
+            QMessageBox.information(self, "Успех", f"Добро пожаловать, {username}!")
+            get_registry().set_actor(username)
+            self.unlock()
             self.open_main_window()
+        elif not result["checked"]:
+            # Пароль не проверялся: блокировка еще действует
+            self.lock(locked_for)
+            QMessageBox.warning(self, "Ошибка", f"У вас слишком много неудачных попыток входа. Попробуйте через {math.ceil(locked_for)} с.")
         else:
-            self.attempts += 1
             self.last_activity_time = time.time()
             QMessageBox.warning(self, "Ошибка", "Неверный логин или пароль!")
-            if self.attempts >= 3:
-                self.locked = True
-                self.login_button.setEnabled(False)
-                self.lock_timer.start(60000)  # блокировка на 60 секунд
-                QMessageBox.warning(self, "Блокировка", "Вход временно заблокирован. Попробуйте через 1 минуту.")
-
-    def reset_attempts(self):
-        self.attempts = 0
-        self.locked = False
-        self.login_button.setEnabled(True)
+            if locked_for:
+                self.lock(locked_for)
+                QMessageBox.warning(self, "Блокировка", f"Вход временно заблокирован. Попробуйте через {math.ceil(locked_for)} с.")
+
+    def lock(self, seconds):
+        # Кнопка недоступна, пока не истечет блокировка в общем хранилище
+        self.locked = True
+        self.login_button.setEnabled(False)
+        self.lock_timer.start(max(int(seconds * 1000), 1000))
 
     def unlock(self):
         self.locked = False
         self.login_button.setEnabled(True)
         self.lock_timer.stop()
-        self.attempts = 0
 
 
     def open_main_window(self):
@@ -216,6 +273,10 @@ class AuthSystem(QMainWindow):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    from stall_watchdog import instrument_gui
+    watchdog = instrument_gui(app)
     window = AuthSystem()
+    if startup_time_requested():
+        measure_first_paint(app, window, STARTED)
     window.show()
     sys.exit(app.exec_())
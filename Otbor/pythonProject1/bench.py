@@ -0,0 +1,276 @@
+"""Замеры горячих путей реестра на синтетических данных (synthetic.py).
+
+    python bench.py --output results.json
+    python bench.py --drivers 10000000 --only storage --output big.json
+    python bench.py --output new.json --compare results.json
+
+Группы замеров: validation (правила validate_data и проверка поля при вводе),
+photos (проверки choose_photo: заголовок и перцептивный хеш), credentials
+(хеширование пароля в check_credentials), storage (запись и поиск водителей
+и ВУ через Registry во временной базе).
+
+Результат — JSON: окружение, параметры запуска и по каждому замеру число
+операций, операций в секунду и время одного вызова (медиана, 95 и 99
+процентили). С --compare печатается сравнение с прошлым результатом; код
+выхода 1, если какой-то замер стал медленнее больше чем на --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+from synthetic import DriverGenerator, write_photos
+
+GROUPS = ("validation", "photos", "credentials", "storage")
+FORMAT_VERSION = 1
+
+
+def _percentile(timings, share):
+    return timings[min(len(timings) - 1, int(len(timings) * share))]
+
+
+class Suite:
+    def __init__(self):
+        self.results = []
+
+    def measure(self, name, func, calls, ops=None):
+        """Время каждого вызова func(item) для item из calls.
+
+        ops — число операций за все вызовы (записей в пачках), по умолчанию — число вызовов.
+        """
+        timings = []
+        perf_counter = time.perf_counter
+        for item in calls:
+            started = perf_counter()
+            func(item)
+            timings.append(perf_counter() - started)
+        if not timings:
+            return None
+        total = sum(timings)
+        timings.sort()
+        ops = ops or len(timings)
+        result = {
+            "name": name,
+            "calls": len(timings),
+            "ops": ops,
+            "seconds": round(total, 6),
+            "ops_per_second": round(ops / total, 1) if total else None,
+            "p50_us": round(_percentile(timings, 0.5) * 1e6, 2),
+            "p95_us": round(_percentile(timings, 0.95) * 1e6, 2),
+            "p99_us": round(_percentile(timings, 0.99) * 1e6, 2),
+        }
+        self.results.append(result)
+        print(f"{name:32} {result['ops_per_second']:>14,.1f} оп/с   медиана {result['p50_us']:>12,.2f} мкс   "
+              f"95% {result['p95_us']:>12,.2f} мкс")
+        return result
+
+
+def _batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def bench_validation(suite, generator, args):
+    from validation import get_validator
+
+    count = min(args.drivers, args.sample)
+    corrupt = random.Random(args.seed)
+    records = []
+    for driver in generator.drivers(count):
+        driver.pop("licenses")
+        driver["photo_path"] = "photo.jpg"
+        # Каждая десятая запись с ошибкой, как при ручном вводе
+        if corrupt.random() < 0.1:
+            driver[corrupt.choice(("phone", "passport", "email"))] = "неверно"
+        records.append(driver)
+    validator = get_validator("driver")
+    suite.measure("validation.validate", validator.validate, records)
+    suite.measure("validation.validate_batch", validator.validate_batch, list(_batches(records, 1000)), count)
+    fields = [(field, record[field]) for record in records for field in ("passport", "phone", "email")]
+    suite.measure("validation.validate_field", lambda item: validator.validate_field(*item), fields)
+
+
+def bench_photos(suite, generator, args, directory):
+    from photo_hash import dhash
+    from photo_probe import check_photo
+
+    paths = write_photos(os.path.join(directory, "photos"), args.photos, args.seed)
+    suite.measure("photos.check_photo", check_photo, paths)
+    suite.measure("photos.dhash", dhash, paths)
+
+
+def bench_credentials(suite, generator, args, directory):
+    from credentials import CredentialStore, derive
+    from registry import Registry
+
+    salt = os.urandom(16)
+    suite.measure("credentials.derive", lambda password: derive(password, salt), ["secret"] * args.logins)
+    users_path = os.path.join(directory, "users.db")
+    store = CredentialStore(users_path)
+    store.set_password("bench", "secret")
+    store.close()
+    registry = Registry(
+        os.path.join(directory, "credentials.db"), credentials_path=users_path,
+        limits_path=os.path.join(directory, "limits.db"),
+    )
+    try:
+        # Первое обращение открывает хранилища учетных записей и счетчиков
+        registry.authenticate("bench", "secret")
+        suite.measure("credentials.authenticate", lambda password: registry.authenticate("bench", password),
+                      ["secret"] * args.logins)
+    finally:
+        registry.close()
+
+
+def bench_storage(suite, generator, args, directory):
+    from registry import Registry
+    from uniqueness import PASSPORT
+
+    registry = Registry(os.path.join(directory, "bench.db"))
+    try:
+        drivers = args.drivers
+        licenses = []
+
+        def save_batch(batch):
+            for driver in batch:
+                licenses.extend(driver.pop("licenses"))
+            registry.save_drivers(batch, profile="driver_no_city")
+
+        # ВУ копятся, пока пишутся водители, и пишутся после них пачками того же размера
+        suite.measure("storage.save_drivers", save_batch, _batches(generator.drivers(drivers), args.batch), drivers)
+        suite.measure("storage.register_licenses", registry.register_licenses, _batches(licenses, args.batch),
+                      len(licenses))
+        del licenses[:]
+
+        # Форма: по одному водителю и ВУ за транзакцию
+        single = list(generator.drivers(args.singles, drivers))
+        for driver in single:
+            licenses.extend(driver.pop("licenses"))
+        suite.measure("storage.save_driver",
+                      lambda driver: registry.save_driver(driver, profile="driver_no_city"), single)
+        suite.measure("storage.register_license", registry.register_license, licenses)
+
+        # Первый проход по различным водителям — промахи кеша, второй — попадания
+        lookup = random.Random(args.seed)
+        numbers = lookup.sample(range(drivers), min(args.queries, drivers, registry.driver_cache.max_items))
+        sample = [generator.driver(number) for number in numbers]
+        driver_ids = [driver["driver_id"] for driver in sample]
+        suite.measure("storage.get_driver.cold", registry.get_driver, driver_ids)
+        suite.measure("storage.get_driver.cached", registry.get_driver, driver_ids)
+        suite.measure("storage.find_owner", lambda driver: registry.find_owner(PASSPORT, driver["passport"]), sample)
+        # Индекс ФИО строится при первом поиске
+        registry.search_drivers(sample[0]["last_name"])
+        suite.measure("storage.search_drivers",
+                      lambda driver: registry.search_drivers(driver["last_name"], driver["first_name"]),
+                      sample[:args.searches])
+    finally:
+        registry.close()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    suite = Suite()
+    generator = DriverGenerator(args.seed)
+    groups = args.only.split(",") if args.only else GROUPS
+    with tempfile.TemporaryDirectory(prefix="sessia-bench-") as directory:
+        for group in groups:
+            if group == "validation":
+                bench_validation(suite, generator, args)
+            elif group == "photos":
+                bench_photos(suite, generator, args, directory)
+            elif group == "credentials":
+                bench_credentials(suite, generator, args, directory)
+            elif group == "storage":
+                bench_storage(suite, generator, args, directory)
+            else:
+                raise SystemExit(f"Неизвестная группа замеров: {group}")
+    return {
+        "format": FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "threshold")},
+        "results": suite.results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Печать изменений против baseline; возвращает названия замеров, ставших медленнее порога."""
+    before = {result["name"]: result for result in baseline["results"]}
+    slower = []
+    print(f"\nСравнение с {baseline.get('revision') or 'прошлым результатом'} ({baseline.get('created')}):")
+    for result in report["results"]:
+        old = before.get(result["name"])
+        if old is None or not old.get("ops_per_second") or not result["ops_per_second"]:
+            continue
+        ratio = result["ops_per_second"] / old["ops_per_second"]
+        mark = ""
+        if ratio < 1 - threshold:
+            mark = "  МЕДЛЕННЕЕ"
+            slower.append(result["name"])
+        print(f"{result['name']:32} {old['ops_per_second']:>14,.1f} -> {result['ops_per_second']:>14,.1f} оп/с "
+              f"({ratio - 1:+.1%}){mark}")
+    # Набор групп на сами замеры не влияет
+    parameters = dict(report["parameters"], only=None)
+    if parameters != dict(baseline.get("parameters") or {}, only=None):
+        print("Внимание: параметры запуска отличаются, сравнение может быть некорректным.")
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры горячих путей реестра водителей")
+    parser.add_argument("--only", default="", help="Группы через запятую: " + ", ".join(GROUPS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--drivers", type=int, default=100000, help="Водителей в базе замера storage")
+    parser.add_argument("--sample", type=int, default=100000, help="Записей для замеров validation")
+    parser.add_argument("--batch", type=int, default=1000, help="Размер пачки записи")
+    parser.add_argument("--singles", type=int, default=500, help="Водителей, записываемых по одному")
+    parser.add_argument("--queries", type=int, default=5000, help="Поисков водителя и номера")
+    parser.add_argument("--searches", type=int, default=500, help="Поисков по ФИО")
+    parser.add_argument("--photos", type=int, default=100)
+    parser.add_argument("--logins", type=int, default=10, help="Проверок пароля")
+    parser.add_argument("--output", default=None, help="Файл результата (JSON)")
+    parser.add_argument("--compare", default=None, help="Прошлый результат для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Допустимое замедление (0.1 — 10%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(report, json.load(f), args.threshold)
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""Сжатое множество целых чисел по схеме Roaring.
+
+Числа делятся на блоки по старшим 16 битам. Блок с небольшим числом элементов
+хранится отсортированным массивом младших 16 бит (2 байта на элемент), плотный
+блок — битовой картой на 65536 бит (8 КБ, целое число Python). Пересечение,
+объединение и разность выполняются поблочно: для битовых карт — одной
+побитовой операцией над целым числом.
+"""
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Блок-массив длиннее этого порога превращается в битовую карту. В Roaring
+# порог 4096 (объемы равны), здесь ниже: операции над целым числом выполняются
+# в C, а над массивом — циклом Python, поэтому выигрыш в скорости важнее памяти
+ARRAY_LIMIT = 1024
+BLOCK_BYTES = 8192
+
+_MAGIC = b"RBM1"
+_HEADER = struct.Struct("<4sI")
+_BLOCK = struct.Struct("<IBI")
+
+# Положение младшей половины 32-битного числа среди 16-битных слов
+_LOW_HALF = 0 if sys.byteorder == "little" else 1
+
+# Номера установленных битов для каждого значения байта
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+def _to_bits(values):
+    bits = bytearray(BLOCK_BYTES)
+    for value in values:
+        bits[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _from_bits(bits):
+    values = array("H")
+    for position, byte in enumerate(bits.to_bytes(BLOCK_BYTES, "little")):
+        if byte:
+            base = position << 3
+            values.extend(base + bit for bit in _BYTE_BITS[byte])
+    return values
+
+
+def _normalize(block):
+    """Привести блок к компактному виду; None для пустого."""
+    if isinstance(block, int):
+        count = block.bit_count()
+        if not count:
+            return None
+        return _from_bits(block) if count <= ARRAY_LIMIT else block
+    if not block:
+        return None
+    return _to_bits(block) if len(block) > ARRAY_LIMIT else block
+
+
+def _split_sorted(values):
+    """Строго возрастающий список -> пары (старшие 16 бит, блок младших)."""
+    start = 0
+    while start < len(values):
+        high = values[start] >> 16
+        stop = bisect_left(values, (high + 1) << 16, start)
+        # Младшие 16 бит отделяются срезом массива, без цикла по элементам
+        words = array("H")
+        words.frombytes(array("I", values[start:stop]).tobytes())
+        yield high, words[_LOW_HALF::2]
+        start = stop
+
+
+def _filter(values, bits, keep):
+    data = bits.to_bytes(BLOCK_BYTES, "little")
+    return array("H", [value for value in values if bool(data[value >> 3] >> (value & 7) & 1) is keep])
+
+
+def _and(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return a & b
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        return _filter(a, b, True)
+    return array("H", sorted(set(a).intersection(b)))
+
+
+def _or(a, b):
+    if isinstance(a, int) or isinstance(b, int):
+        return (a if isinstance(a, int) else _to_bits(a)) | (b if isinstance(b, int) else _to_bits(b))
+    return _normalize(array("H", sorted(set(a).union(b))))
+
+
+def _andnot(a, b):
+    if isinstance(a, int):
+        return a & ~(b if isinstance(b, int) else _to_bits(b))
+    if isinstance(b, int):
+        return _filter(a, b, False)
+    return array("H", sorted(set(a).difference(b)))
+
+
+class Bitmap:
+    """Множество неотрицательных целых (< 2**32) с быстрыми &, |, -."""
+
+    __slots__ = ("blocks",)
+
+    def __init__(self, values=()):
+        # старшие 16 бит -> блок (array('H') или int)
+        self.blocks = {}
+        if values:
+            self.update(values)
+
+    @classmethod
+    def from_sorted(cls, values):
+        """Построение из строго возрастающего списка без сортировки."""
+        bitmap = cls()
+        for high, block in _split_sorted(values):
+            bitmap.blocks[high] = _normalize(block)
+        return bitmap
+
+    def update(self, values):
+        """Добавить числа в любом порядке и с повторами."""
+        for high, block in _split_sorted(sorted(set(values))):
+            old = self.blocks.get(high)
+            self.blocks[high] = _normalize(block if old is None else _or(old, block))
+
+    def add(self, value):
+        self.update((value,))
+
+    def __contains__(self, value):
+        block = self.blocks.get(value >> 16)
+        if block is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(block, int):
+            return bool(block >> low & 1)
+        position = bisect_right(block, low)
+        return position > 0 and block[position - 1] == low
+
+    def __len__(self):
+        return sum(block.bit_count() if isinstance(block, int) else len(block) for block in self.blocks.values())
+
+    def __bool__(self):
+        return bool(self.blocks)
+
+    def __iter__(self):
+        for high in sorted(self.blocks):
+            block = self.blocks[high]
+            base = high << 16
+            for low in (_from_bits(block) if isinstance(block, int) else block):
+                yield base + low
+
+    def __eq__(self, other):
+        return isinstance(other, Bitmap) and self.blocks.keys() == other.blocks.keys() and all(
+            list(self._block_values(high)) == list(other._block_values(high)) for high in self.blocks
+        )
+
+    def _block_values(self, high):
+        block = self.blocks[high]
+        return _from_bits(block) if isinstance(block, int) else block
+
+    # Результаты операций не сжимаются: разреженная битовая карта остается
+    # целым числом, чтобы не тратить время на перевод в массив при каждом запросе.
+    # Сжатие выполняется при добавлении чисел (update, from_sorted).
+
+    def _combine(self, other, operation, keys):
+        result = Bitmap()
+        for high in keys:
+            block = operation(self.blocks[high], other.blocks[high])
+            if block:
+                result.blocks[high] = block
+        return result
+
+    def __and__(self, other):
+        return self._combine(other, _and, self.blocks.keys() & other.blocks.keys())
+
+    def __or__(self, other):
+        result = Bitmap()
+        result.blocks = dict(self.blocks)
+        for high, block in other.blocks.items():
+            old = result.blocks.get(high)
+            result.blocks[high] = block if old is None else _or(old, block)
+        return result
+
+    def __sub__(self, other):
+        result = Bitmap()
+        for high, block in self.blocks.items():
+            if high in other.blocks:
+                block = _andnot(block, other.blocks[high])
+            if block:
+                result.blocks[high] = block
+        return result
+
+    def page(self, after=-1, limit=1000):
+        """До limit чисел больше after по возрастанию."""
+        values = []
+        start_high = (after + 1) >> 16
+        for high in sorted(high for high in self.blocks if high >= start_high):
+            base = high << 16
+            block = self._block_values(high)
+            if high == start_high:
+                block = block[bisect_right(block, after - base):] if after >= base else block
+            for low in block:
+                values.append(base + low)
+                if len(values) >= limit:
+                    return values
+        return values
+
+    def compact(self):
+        """Перевести блоки в наиболее компактный вид (перед долгим хранением)."""
+        for high, block in list(self.blocks.items()):
+            self.blocks[high] = _normalize(block)
+        return self
+
+    def nbytes(self):
+        """Объем данных блоков в байтах (без накладных расходов словаря)."""
+        return sum(BLOCK_BYTES if isinstance(block, int) else 2 * len(block) for block in self.blocks.values())
+
+    # --- Сохранение ---
+
+    def to_bytes(self):
+        parts = [_HEADER.pack(_MAGIC, len(self.blocks))]
+        for high in sorted(self.blocks):
+            block = self.blocks[high]
+            if isinstance(block, int):
+                parts.append(_BLOCK.pack(high, 1, BLOCK_BYTES))
+                parts.append(block.to_bytes(BLOCK_BYTES, "little"))
+            else:
+                parts.append(_BLOCK.pack(high, 0, len(block)))
+                parts.append(block.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """Возвращает (Bitmap, смещение после него)."""
+        magic, count = _HEADER.unpack_from(data, offset)
+        if magic != _MAGIC:
+            raise ValueError("Неверный формат битовой карты")
+        offset += _HEADER.size
+        bitmap = cls()
+        for _ in range(count):
+            high, dense, size = _BLOCK.unpack_from(data, offset)
+            offset += _BLOCK.size
+            if dense:
+                bitmap.blocks[high] = int.from_bytes(data[offset:offset + size], "little")
+                offset += size
+            else:
+                block = array("H")
+                block.frombytes(data[offset:offset + 2 * size])
+                bitmap.blocks[high] = block
+                offset += 2 * size
+        return bitmap, offset
@@ -0,0 +1,243 @@
+"""Потоковая загрузка реестров водителей и ВУ из CSV/JSONL.
+
+Пример:
+    python bulk_import.py drivers registry.csv --errors rejects.jsonl
+    python bulk_import.py licenses licenses.jsonl --batch-size 10000
+
+Файл читается построчно, в памяти одновременно находится только одна пачка.
+После каждой пачки позиция сохраняется в базе в той же транзакции, что и
+данные, поэтому прерванную загрузку можно просто запустить повторно.
+Отклоненные записи пишутся в файл ошибок после фиксации пачки и при
+повторном запуске не дублируются.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import uuid
+from itertools import islice
+
+from journal import Journal, JournalBusyError, journal_path
+from storage import DB_PATH, DriverStore
+from uniqueness import LICENSE, PASSPORT, BloomFilter, DuplicateKeyError, duplicate_message, find_duplicates, key_hash
+from validation import DRIVER_FIELDS, LICENSE_FIELDS, Validator
+
+# В реестрах фотографий нет, они приходят отдельными папками
+IMPORT_DRIVER_FIELDS = tuple(field for field in DRIVER_FIELDS if field != "photo_path")
+
+
+def read_records(path, delimiter=","):
+    """Генератор (номер записи, запись или None, исходная строка при ошибке разбора)."""
+    if path.endswith(".jsonl") or path.endswith(".json"):
+        with open(path, encoding="utf-8-sig") as f:
+            for position, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    yield position, None, line
+                    continue
+                if not isinstance(record, dict):
+                    yield position, None, line
+                    continue
+                yield position, record, None
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            for position, record in enumerate(csv.DictReader(f, delimiter=delimiter), 1):
+                yield position, record, None
+
+
+def batches(records, size):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Importer:
+    def __init__(self, store, kind, errors_file, batch_size=5000):
+        self.store = store
+        self.kind = kind
+        self.errors_file = errors_file
+        self.batch_size = batch_size
+        if kind == "drivers":
+            self.validator = Validator(IMPORT_DRIVER_FIELDS)
+        else:
+            self.validator = Validator(LICENSE_FIELDS)
+        self.read = 0
+        self.accepted = 0
+        self.rejected = 0
+        # Фильтр Блума по занятым паспортам и номерам ВУ: новые номера
+        # отсеиваются без запросов к базе
+        self.bloom = None
+        # Хеши номеров текущей пачки; попадают в фильтр после ее записи
+        self.claimed = []
+
+    def run(self, path, delimiter=",", restart=False, progress=True):
+        source = os.path.abspath(path)
+        if restart:
+            self.store.clear_checkpoint(source)
+        start_position, self.accepted, self.rejected = self.store.get_checkpoint(source)
+
+        started = time.perf_counter()
+        self.bloom = BloomFilter.from_store(self.store)
+        if progress:
+            print(f"Фильтр занятых номеров: {self.bloom.count} за {time.perf_counter() - started:.1f} с", file=sys.stderr)
+        records = read_records(path, delimiter)
+        if start_position:
+            records = (item for item in records if item[0] > start_position)
+
+        with open(self.errors_file, "a", encoding="utf-8") as errors_out:
+            for number, batch in enumerate(batches(records, self.batch_size), 1):
+                # Проверка, данные пачки и контрольная точка фиксируются одной
+                # транзакцией. Если фильтр устарел (номер записал другой процесс),
+                # запись остановит база, и пачка проверяется заново без фильтра
+                for bloom in (self.bloom, None):
+                    self.claimed = []
+                    try:
+                        with self.store.transaction():
+                            rows, rejects = self.process_batch(batch, bloom)
+                            if self.kind == "drivers":
+                                self.store.save_drivers(rows, bloom)
+                            else:
+                                self.store.add_licenses(rows, bloom)
+                            self.store.set_checkpoint(
+                                source, batch[-1][0], self.accepted + len(rows), self.rejected + len(rejects)
+                            )
+                        break
+                    except DuplicateKeyError:
+                        if bloom is None:
+                            raise
+                for value_hash in self.claimed:
+                    self.bloom.add_hash(value_hash)
+                self.claimed = []
+
+                self.read += len(batch)
+                self.accepted += len(rows)
+                self.rejected += len(rejects)
+                # Отклоненные записи дописываются только после фиксации пачки:
+                # повторный запуск после сбоя не запишет их второй раз
+                for reject in rejects:
+                    errors_out.write(json.dumps(reject, ensure_ascii=False) + "\n")
+                errors_out.flush()
+
+                if progress and number % 20 == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"... {self.read} записей, {self.read / elapsed:.0f} зап/с", file=sys.stderr)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "source": source,
+            "resumed_from": start_position,
+            "read": self.read,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "seconds": round(elapsed, 3),
+            "records_per_second": round(self.read / elapsed) if elapsed else 0,
+        }
+
+    def process_batch(self, batch, bloom=None):
+        """Проверка пачки. Возвращает (строки для вставки, отклоненные записи).
+
+        bloom — фильтр занятых номеров; без него номера проверяются по базе.
+        """
+        rejects = []
+        parsed = []
+        for position, record, raw in batch:
+            if record is None:
+                rejects.append({"record": position, "errors": {"_": "Не удалось разобрать строку."}, "data": raw})
+            else:
+                parsed.append((position, record))
+
+        invalid = dict(self.validator.validate_batch([record for _, record in parsed]))
+        valid = []
+        for index, (position, record) in enumerate(parsed):
+            if index in invalid:
+                rejects.append({"record": position, "errors": invalid[index], "data": record})
+            else:
+                valid.append((position, record))
+
+        if self.kind == "drivers":
+            return self.check_passports(valid, rejects, bloom)
+        return self.check_drivers(valid, rejects, bloom)
+
+    def check_passports(self, valid, rejects, bloom=None):
+        items = [(record["passport"], record.get("driver_id") or str(uuid.uuid4())) for _, record in valid]
+        return self.check_unique(PASSPORT, valid, items, rejects, bloom)
+
+    def check_drivers(self, valid, rejects, bloom=None):
+        known = self.store.existing_driver_ids(record["driver_id"] for _, record in valid)
+        found = []
+        for position, record in valid:
+            if record["driver_id"] not in known:
+                rejects.append({
+                    "record": position,
+                    "errors": {"driver_id": "Водитель с таким ID не найден."},
+                    "data": record,
+                })
+                continue
+            found.append((position, record))
+        items = [(record["license_number"], record["driver_id"]) for _, record in found]
+        return self.check_unique(LICENSE, found, items, rejects, bloom)
+
+    def check_unique(self, kind, valid, items, rejects, bloom=None):
+        """Отклонить записи с номером, уже занятым в базе или раньше в файле."""
+        duplicates = find_duplicates(self.store, kind, items, bloom)
+        field = "passport" if kind == PASSPORT else "license_number"
+        rows = []
+        for index, ((position, record), (value, driver_id)) in enumerate(zip(valid, items)):
+            owner = duplicates.get(index)
+            if owner:
+                rejects.append({
+                    "record": position,
+                    "errors": {field: duplicate_message(kind, value, owner)},
+                    "data": record,
+                })
+                continue
+            self.claimed.append(key_hash(kind, value))
+            rows.append((driver_id, record))
+        return rows, rejects
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Массовая загрузка водителей и ВУ из CSV/JSONL")
+    parser.add_argument("kind", choices=("drivers", "licenses"))
+    parser.add_argument("path", help="Файл .csv или .jsonl")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--errors", default=None, help="Файл отклоненных записей (JSONL)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--restart", action="store_true", help="Начать заново, игнорируя контрольную точку")
+    args = parser.parse_args(argv)
+
+    errors_file = args.errors or args.path + ".rejects.jsonl"
+    try:
+        journal = Journal(journal_path(args.db))
+    except JournalBusyError as e:
+        print(e, file=sys.stderr)
+        return 1
+    store = DriverStore(args.db, journal=journal)
+    try:
+        importer = Importer(store, args.kind, errors_file, args.batch_size)
+        report = importer.run(args.path, args.delimiter, args.restart)
+    finally:
+        store.close()
+        journal.close()
+
+    if report["resumed_from"]:
+        print(f"Продолжено с записи {report['resumed_from']}")
+    print(f"Прочитано: {report['read']}")
+    print(f"Загружено всего: {report['accepted']}")
+    print(f"Отклонено всего: {report['rejected']} (см. {errors_file})")
+    print(f"Время: {report['seconds']} с, {report['records_per_second']} зап/с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Категории транспортных средств в виде битовой маски.
+
+Строка из формы ("B, C, CE", "в с се", "B;BE") разбирается в число, где каждой
+категории соответствует один бит. Маски сравниваются и объединяются побитовыми
+операциями без разбора текста.
+"""
+import re
+
+# Категории ВУ РФ; порядок задает номер бита и не должен меняться
+CATEGORIES = (
+    "A", "A1", "B", "B1", "BE", "C", "C1", "CE",
+    "C1E", "D", "D1", "DE", "D1E", "M", "Tm", "Tb",
+)
+BITS = {category.upper(): 1 << number for number, category in enumerate(CATEGORIES)}
+ALL_CATEGORIES = (1 << len(CATEGORIES)) - 1
+
+# Кириллические буквы, которые пишут вместо латинских
+_TO_LATIN = str.maketrans("АВСЕМТ", "ABCEMT")
+_SEPARATORS = re.compile(r"[\s,;/]+")
+
+
+def _category_pattern(category):
+    cyrillic = dict(zip("ABCEMT", "АВСЕМТ"))
+    return "".join(f"[{char}{cyrillic[char]}]" if char in cyrillic else char for char in category.upper())
+
+
+# Шаблон для validation: список известных категорий через разделители
+_TOKEN = "(?:" + "|".join(
+    _category_pattern(category) for category in sorted(CATEGORIES, key=len, reverse=True)
+) + ")"
+CATEGORIES_RE = re.compile(rf"(?i:[\s,;/]*{_TOKEN}(?:[\s,;/]+{_TOKEN})*[\s,;/]*)")
+
+
+def category_bit(name):
+    """Бит категории по названию (регистр и кириллица не важны)."""
+    bit = BITS.get(name.strip().upper().translate(_TO_LATIN))
+    if bit is None:
+        raise ValueError(f"Неизвестная категория: {name}")
+    return bit
+
+
+def parse_categories(text, strict=True):
+    """Строка категорий -> маска. При strict=False неизвестные категории пропускаются."""
+    mask = 0
+    for name in _SEPARATORS.split(text.strip().upper().translate(_TO_LATIN)) if text else ():
+        if not name:
+            continue
+        bit = BITS.get(name)
+        if bit is None:
+            if strict:
+                raise ValueError(f"Неизвестная категория: {name}")
+            continue
+        mask |= bit
+    return mask
+
+
+def format_categories(mask):
+    return ", ".join(category for number, category in enumerate(CATEGORIES) if mask >> number & 1)
+
+
+def is_valid_categories(text):
+    try:
+        return parse_categories(text) != 0
+    except ValueError:
+        return False
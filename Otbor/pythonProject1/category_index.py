@@ -0,0 +1,324 @@
+"""Битовые индексы ВУ и водителей по категориям транспортных средств.
+
+Для каждой категории хранятся два множества (bitmap.Bitmap): внутренние id ВУ
+с этой категорией и id водителей, у которых есть хотя бы одно такое ВУ.
+Запрос вида "C & CE & !D" сводится к пересечению, объединению и разности
+множеств без разбора строк категорий.
+
+Пример:
+    python category_index.py build --db drivers.db
+    python category_index.py query "C & CE & !D" --level drivers
+    python category_index.py bench --licenses 10000000
+"""
+import argparse
+import os
+import random
+import re
+import struct
+import sys
+import time
+
+from bitmap import Bitmap
+from categories import CATEGORIES, category_bit
+
+LEVELS = ("licenses", "drivers")
+
+_MAGIC = b"CIX1"
+_HEADER = struct.Struct("<4sQI")
+
+_TOKENS = re.compile(r"\s*(?:([&|!()])|([^\s&|!()]+))")
+
+
+def index_path(db_path):
+    return db_path + ".categories"
+
+
+def _bit_numbers(mask):
+    return [number for number in range(len(CATEGORIES)) if mask >> number & 1]
+
+
+class CategoryIndex:
+    def __init__(self):
+        self.watermark = 0  # наибольший id ВУ, уже внесенный в индекс
+        self.all = {level: Bitmap() for level in LEVELS}
+        self.by_category = {level: [Bitmap() for _ in CATEGORIES] for level in LEVELS}
+
+    def add_rows(self, rows):
+        """Внести строки (id ВУ, id водителя, маска) с возрастающими id ВУ."""
+        licenses_by_mask = {}
+        drivers_by_mask = {}
+        license_ids = []
+        for license_id, driver_no, mask in rows:
+            license_ids.append(license_id)
+            licenses_by_mask.setdefault(mask, []).append(license_id)
+            drivers_by_mask.setdefault(mask, []).append(driver_no)
+        if not license_ids:
+            return 0
+        # Строки с одинаковой маской собираются в одно множество и добавляются
+        # ко всем ее категориям сразу
+        all_drivers = Bitmap()
+        for mask, ids in licenses_by_mask.items():
+            licenses = Bitmap.from_sorted(ids)
+            drivers = Bitmap(drivers_by_mask[mask])
+            all_drivers = all_drivers | drivers
+            for number in _bit_numbers(mask):
+                self.by_category["licenses"][number] = self.by_category["licenses"][number] | licenses
+                self.by_category["drivers"][number] = self.by_category["drivers"][number] | drivers
+        self.all["licenses"] = self.all["licenses"] | Bitmap.from_sorted(license_ids)
+        self.all["drivers"] = self.all["drivers"] | all_drivers
+        self.watermark = max(self.watermark, license_ids[-1])
+        return len(license_ids)
+
+    def refresh(self, store, page_size=200000):
+        """Дочитать из базы ВУ, добавленные после последнего обновления. Возвращает их число."""
+        if self.watermark > store.max_license_id():
+            # Файл индекса от другой базы
+            self.__init__()
+        added = 0
+        while True:
+            rows = store.license_categories(self.watermark, page_size)
+            if not rows:
+                return added
+            added += self.add_rows(rows)
+
+    # --- Запросы ---
+
+    def query(self, expression, level="drivers"):
+        """Множество id, удовлетворяющих выражению над категориями.
+
+        Операции: & (и), | (или), ! (не), скобки. Например: "C & CE & !D".
+        """
+        if level not in LEVELS:
+            raise ValueError(f"Неизвестный уровень: {level}")
+        return _Parser(expression, self.by_category[level], self.all[level]).parse()
+
+    def count(self, expression, level="drivers"):
+        return len(self.query(expression, level))
+
+    def nbytes(self):
+        return sum(bitmap.nbytes() for level in LEVELS for bitmap in [self.all[level]] + self.by_category[level])
+
+    # --- Сохранение ---
+
+    def save(self, path):
+        parts = [_HEADER.pack(_MAGIC, self.watermark, len(CATEGORIES))]
+        for level in LEVELS:
+            parts.append(self.all[level].to_bytes())
+            parts.extend(bitmap.to_bytes() for bitmap in self.by_category[level])
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, watermark, count = _HEADER.unpack_from(data)
+        if magic != _MAGIC or count != len(CATEGORIES):
+            raise ValueError("Неверный формат индекса категорий")
+        index = cls()
+        index.watermark = watermark
+        offset = _HEADER.size
+        for level in LEVELS:
+            index.all[level], offset = Bitmap.from_bytes(data, offset)
+            for number in range(count):
+                index.by_category[level][number], offset = Bitmap.from_bytes(data, offset)
+        return index
+
+    @classmethod
+    def open(cls, store, path):
+        """Загрузить индекс из файла (если он есть и читается) и дочитать новые ВУ из базы."""
+        index = None
+        if os.path.exists(path):
+            try:
+                index = cls.load(path)
+            except (OSError, ValueError, struct.error):
+                index = None
+        if index is None:
+            index = cls()
+        if index.refresh(store):
+            index.save(path)
+        return index
+
+
+class _Parser:
+    """Разбор выражения рекурсивным спуском с вычислением на лету.
+
+    В конъюнкции отрицания вычитаются из пересечения остальных множеств,
+    поэтому "C & !D" не строит дополнение D до всех id.
+    """
+
+    def __init__(self, expression, bitmaps, universe):
+        self.tokens = []
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = _TOKENS.match(expression, position)
+            if match is None:
+                raise ValueError(f"Неверное выражение: {expression}")
+            self.tokens.append(match.group(1) or match.group(2))
+            position = match.end()
+        self.position = 0
+        self.bitmaps = bitmaps
+        self.universe = universe
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            wanted = f"«{expected}»" if expected else "категория"
+            raise ValueError(f"Ожидалась {wanted}, получено: {token or 'конец выражения'}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Пустое выражение")
+        result = self.union()
+        if self.peek() is not None:
+            raise ValueError(f"Лишний символ: {self.peek()}")
+        return result
+
+    def union(self):
+        result = self.conjunction()
+        while self.peek() == "|":
+            self.take("|")
+            result = result | self.conjunction()
+        return result
+
+    def conjunction(self):
+        positive = []
+        negative = []
+        while True:
+            if self.peek() == "!":
+                self.take("!")
+                negative.append(self.factor())
+            else:
+                positive.append(self.factor())
+            if self.peek() != "&":
+                break
+            self.take("&")
+        # Пересечение начинается с наименьшего множества
+        positive.sort(key=len)
+        result = positive[0] if positive else self.universe
+        for bitmap in positive[1:]:
+            result = result & bitmap
+        for bitmap in negative:
+            result = result - bitmap
+        return result
+
+    def factor(self):
+        token = self.take()
+        if token == "(":
+            result = self.union()
+            self.take(")")
+            return result
+        if token == "!":
+            return self.universe - self.factor()
+        if token in "&|)":
+            raise ValueError(f"Неожиданный символ: {token}")
+        return self.bitmaps[category_bit(token).bit_length() - 1]
+
+
+# --- Замеры ---
+
+# Доля ВУ с категорией в синтетических данных
+_SHARES = {
+    "A": 0.12, "A1": 0.02, "B": 0.9, "B1": 0.01, "BE": 0.06, "C": 0.25, "C1": 0.05, "CE": 0.08,
+    "C1E": 0.01, "D": 0.05, "D1": 0.02, "DE": 0.01, "D1E": 0.005, "M": 0.3, "Tm": 0.01, "Tb": 0.005,
+}
+
+
+def synthetic_rows(count, seed=1, chunk=1000000):
+    """Пачки строк (id ВУ, id водителя, маска); в среднем 1.25 ВУ на водителя."""
+    generator = random.Random(seed)
+    pool = []
+    for _ in range(4096):
+        mask = 0
+        for category, share in _SHARES.items():
+            if generator.random() < share:
+                mask |= category_bit(category)
+        pool.append(mask)
+    for start in range(1, count + 1, chunk):
+        stop = min(start + chunk, count + 1)
+        masks = generator.choices(pool, k=stop - start)
+        yield [(license_id, license_id * 4 // 5, mask) for license_id, mask in zip(range(start, stop), masks)]
+
+
+BENCH_QUERIES = ("C & CE & !D", "B | BE", "D & !(C | CE)", "!B", "A & B & C & D")
+
+
+def benchmark(count, seed=1):
+    index = CategoryIndex()
+    masks = []
+    started = time.perf_counter()
+    for rows in synthetic_rows(count, seed):
+        index.add_rows(rows)
+        masks.extend(row[2] for row in rows)
+    build = time.perf_counter() - started
+    print(f"ВУ: {count}, водителей: {len(index.all['drivers'])}")
+    print(f"Построение: {build:.1f} с, объем индекса: {index.nbytes() / 2 ** 20:.1f} МБ")
+
+    for expression in BENCH_QUERIES:
+        for level in LEVELS:
+            started = time.perf_counter()
+            result = index.query(expression, level)
+            found = len(result)
+            elapsed = time.perf_counter() - started
+            print(f"{expression:<16} {level:<9} {found:>10}  {elapsed * 1000:8.1f} мс")
+
+    # Для сравнения: проверка маски каждого ВУ
+    need = category_bit("C") | category_bit("CE")
+    deny = category_bit("D")
+    started = time.perf_counter()
+    found = sum(1 for mask in masks if mask & need == need and not mask & deny)
+    print(f"Перебор масок \"C & CE & !D\": {found}  {(time.perf_counter() - started) * 1000:.1f} мс")
+
+
+def main(argv=None):
+    from storage import DB_PATH, DriverStore
+
+    parser = argparse.ArgumentParser(description="Индекс ВУ и водителей по категориям")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Построить или дополнить индекс")
+    build.add_argument("--db", default=DB_PATH)
+    query = commands.add_parser("query", help="Выполнить запрос")
+    query.add_argument("expression")
+    query.add_argument("--level", choices=LEVELS, default="drivers")
+    query.add_argument("--db", default=DB_PATH)
+    query.add_argument("--limit", type=int, default=20)
+    bench = commands.add_parser("bench", help="Замеры на синтетических данных")
+    bench.add_argument("--licenses", type=int, default=10000000)
+    bench.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.licenses, args.seed)
+        return 0
+
+    store = DriverStore(args.db)
+    try:
+        started = time.perf_counter()
+        index = CategoryIndex.open(store, index_path(args.db))
+        print(f"Индекс: {index.watermark} ВУ, {time.perf_counter() - started:.2f} с")
+        if args.command == "query":
+            started = time.perf_counter()
+            result = index.query(args.expression, args.level)
+            print(f"Найдено: {len(result)} за {(time.perf_counter() - started) * 1000:.1f} мс")
+            ids = result.page(limit=args.limit)
+            if args.level == "drivers":
+                rows = store.drivers_by_ids(ids, ("driver_id", "last_name", "first_name"))
+            else:
+                rows = store.licenses_by_ids(ids, ("driver_id", "license_number", "vehicle_categories"))
+            for row in rows:
+                print(*row[1:])
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import http.client
+import json
+import os
+import threading
+from urllib.parse import urlencode, urlsplit
+
+from lookup_cache import LookupCache
+from metrics import timed
+from records import DriverRecord
+from registry import RegistryError
+
+
+class RegistryClient:
+    """Клиент сервиса реестра с теми же методами, что у Registry.
+
+    Изменения сервис принимает только после входа: authenticate() сохраняет
+    токен сессии, и он передается с каждым запросом.
+
+    У каждого потока свое постоянное (keep-alive) соединение. Карточки
+    водителей и фото кешируются: фото в хранилище не меняются, а карточки
+    сбрасываются при записи через этот клиент и устаревают через минуту
+    (их могли изменить другие инспекторы).
+    """
+
+    is_local = False
+
+    def __init__(self, base_url, timeout=30):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = timeout
+        self.local = threading.local()
+        self.token = None
+        self.driver_cache = LookupCache(max_items=1000, ttl=60.0)
+        self.photo_cache = LookupCache(max_items=64, ttl=3600.0)
+
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.local.connection = connection
+        return connection
+
+    def _request(self, method, path, payload=None, query=None):
+        """JSON-запрос; payload типа bytes отправляется как есть (содержимое фото).
+
+        Ответ не в JSON (фото) возвращается в виде bytes.
+        """
+        if query:
+            path += "?" + urlencode(query)
+        if isinstance(payload, bytes):
+            body = payload
+            headers = {"Content-Type": "application/octet-stream"}
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        # Сервер мог закрыть простаивающее соединение — одна повторная попытка
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.CannotSendRequest):
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+        if response.status < 400 and not response.getheader("Content-Type", "").startswith("application/json"):
+            return data
+        result = json.loads(data) if data else {}
+        if response.status >= 400:
+            raise RegistryError(result.get("error", f"Ошибка сервиса {response.status}"),
+                                result.get("errors"), response.status)
+        return result
+
+    @timed("client.save_driver")
+    def save_driver(self, data, profile="driver"):
+        data = self._upload_photo(data)
+        driver_id = self._request("POST", "/drivers", {"data": data, "profile": profile})["driver_id"]
+        self.driver_cache.invalidate([driver_id])
+        return driver_id
+
+    @timed("client.save_drivers")
+    def save_drivers(self, items, profile="driver"):
+        items = [self._upload_photo(data) for data in items]
+        result = self._request("POST", "/drivers/batch", {"items": items, "profile": profile})
+        self.driver_cache.invalidate(result["saved"].values())
+        return {
+            "saved": {int(index): driver_id for index, driver_id in result["saved"].items()},
+            "errors": {int(index): errors for index, errors in result["errors"].items()},
+        }
+
+    def get_driver(self, driver_id):
+        return self.driver_cache.get(
+            driver_id, lambda key: DriverRecord.from_dict(self._request("GET", f"/drivers/{key}"))
+        )
+
+    def cache_stats(self):
+        stats = self._request("GET", "/cache/stats")
+        stats.update(client_drivers=self.driver_cache.stats(), client_photos=self.photo_cache.stats())
+        return stats
+
+    @timed("client.page_drivers")
+    def page_drivers(self, columns, sort="last_name", descending=False, after=None, limit=200, last_name_prefix=""):
+        query = {
+            "columns": ",".join(columns),
+            "sort": sort,
+            "descending": int(descending),
+            "limit": limit,
+            "prefix": last_name_prefix,
+        }
+        if after is not None:
+            query["after"] = json.dumps(list(after), ensure_ascii=False)
+        return [tuple(row) for row in self._request("GET", "/drivers", query=query)["rows"]]
+
+    @timed("client.search_drivers")
+    def search_drivers(self, last_name="", first_name="", middle_name="", limit=20):
+        query = {"last_name": last_name, "first_name": first_name, "middle_name": middle_name, "limit": limit}
+        return self._request("GET", "/drivers/search", query=query)["rows"]
+
+    @timed("client.register_license")
+    def register_license(self, data):
+        self._request("POST", "/licenses", {"data": self._upload_photo(data)})
+        self.driver_cache.invalidate([data.get("driver_id")])
+
+    @timed("client.register_licenses")
+    def register_licenses(self, items):
+        items = [self._upload_photo(data) for data in items]
+        result = self._request("POST", "/licenses/batch", {"items": items})
+        self.driver_cache.invalidate({data.get("driver_id") for data in items})
+        return {
+            "saved": result["saved"],
+            "errors": {int(index): errors for index, errors in result["errors"].items()},
+        }
+
+    def licenses_expiring(self, first, last, columns=("driver_id", "license_number"), after=None, limit=1000):
+        query = {"from": first, "to": last}
+        return self._expiry_page("/licenses/expiring", query, columns, after, limit)
+
+    def invalid_licenses(self, on=None, columns=("driver_id", "license_number"), after=None, limit=1000):
+        query = {"on": on} if on is not None else {}
+        return self._expiry_page("/licenses/invalid", query, columns, after, limit)
+
+    def _expiry_page(self, path, query, columns, after, limit):
+        query.update(columns=",".join(columns), limit=limit)
+        if after is not None:
+            query["after"] = json.dumps(list(after))
+        return [tuple(row) for row in self._request("GET", path, query=query)["rows"]]
+
+    def find_owner(self, kind, value):
+        return self._request("GET", f"/unique/{kind}", query={"value": value})["owner"]
+
+    # --- Фото ---
+
+    def _upload_photo(self, data):
+        # Файл фото с компьютера инспектора передается в хранилище сервиса,
+        # в записи остается ключ фото в хранилище. Хеш для поиска похожих
+        # фото сервис считает сам по принятому файлу
+        path = data.get("photo_path")
+        if not path or not os.path.isfile(path):
+            return data
+        with open(path, "rb") as f:
+            return dict(data, photo_path=self.add_photo(f.read())["key"])
+
+    @timed("client.add_photo")
+    def add_photo(self, content):
+        return self._request("POST", "/photos", content)
+
+    def photo_bytes(self, key):
+        from photo_store import photo_key
+
+        key = photo_key(key)
+        if key is None:
+            raise RegistryError("Фото не найдено.", status=404)
+        return self.photo_cache.get(key, lambda key: self._request("GET", f"/photos/{key}"))
+
+    def photo_savings(self):
+        return self._request("GET", "/photos/savings")
+
+    def similar_photos(self, photo_hash, distance=None, exclude=None):
+        from photo_hash import format_hash, parse_hash
+
+        query = {"hash": format_hash(parse_hash(photo_hash))}
+        if distance is not None:
+            query["distance"] = distance
+        if exclude:
+            query["exclude"] = exclude
+        return self._request("GET", "/photos/similar", query=query)["rows"]
+
+    def drivers_by_categories(self, expression, columns=("driver_id", "last_name", "first_name", "middle_name"),
+                              after=0, limit=200):
+        return self._categories_page("/drivers/by-categories", expression, columns, after, limit)
+
+    def licenses_by_categories(self, expression, columns=("driver_id", "license_number", "vehicle_categories"),
+                               after=0, limit=200):
+        return self._categories_page("/licenses/by-categories", expression, columns, after, limit)
+
+    def _categories_page(self, path, expression, columns, after, limit):
+        query = {"q": expression, "columns": ",".join(columns), "after": after, "limit": limit}
+        result = self._request("GET", path, query=query)
+        return {"count": result["count"], "rows": [tuple(row) for row in result["rows"]]}
+
+    def sync_state(self, peer=""):
+        return self._request("GET", "/sync/state", query={"peer": peer})
+
+    @timed("client.sync_changes")
+    def sync_changes(self, after=0, peer="", limit=1000):
+        return self._request("GET", "/sync/changes", query={"after": after, "peer": peer, "limit": limit})
+
+    @timed("client.apply_sync_changes")
+    def apply_sync_changes(self, payload):
+        result = self._request("POST", "/sync/changes", payload)
+        # Пачка могла изменить любые карточки
+        self.driver_cache.clear()
+        return result
+
+    def set_actor(self, login):
+        # Логин для журнала изменений сервис берет из сессии, выданной authenticate()
+        pass
+
+    @timed("client.authenticate")
+    def authenticate(self, login, password, client=None):
+        # Адрес клиента сервис определяет сам
+        result = self._request("POST", "/auth/login", {"login": login, "password": password})
+        if result["ok"]:
+            self.token = result.pop("token")
+        return result
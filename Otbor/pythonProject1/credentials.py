@@ -0,0 +1,166 @@
+"""Учетные записи инспекторов: соль + scrypt, хранение в SQLite.
+
+    python credentials.py add inspector            # добавить/сменить пароль
+    python credentials.py add inspector --cost 15  # с повышенной стоимостью
+    python credentials.py bench --threads 4        # входов в секунду под нагрузкой
+"""
+import argparse
+import getpass
+import hashlib
+import hmac
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+CREDENTIALS_PATH = "users.db"
+
+# Стоимость scrypt: N = 2 ** cost, память = 128 * r * N байт (16 МБ при cost=14)
+DEFAULT_COST = 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_SIZE = 16
+HASH_SIZE = 32
+
+# Другие схемы (например, sha256 без соли из старого authorization.py) не принимаются:
+# таким пользователям пароль задается заново через "credentials.py add"
+SCRYPT_SCHEME = "scrypt"
+
+
+def derive(password, salt, cost=DEFAULT_COST):
+    n = 2 ** cost
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=n, r=SCRYPT_R, p=SCRYPT_P,
+        maxmem=256 * SCRYPT_R * n, dklen=HASH_SIZE,
+    )
+
+
+class CredentialStore:
+    """Хранилище учетных записей.
+
+    Все записи держатся в словаре (тысячи инспекторов — это килобайты),
+    поэтому поиск по логину O(1); SQLite нужен только для сохранности.
+    Проверка пароля намеренно медленная — вызывать ее вне GUI-потока.
+    """
+
+    def __init__(self, path=CREDENTIALS_PATH, cost=DEFAULT_COST):
+        self.cost = cost
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "login TEXT PRIMARY KEY, scheme TEXT NOT NULL, cost INTEGER NOT NULL, "
+            "salt BLOB NOT NULL, hash BLOB NOT NULL)"
+        )
+        self.users = {
+            row[0]: row[1:]
+            for row in self.conn.execute("SELECT login, scheme, cost, salt, hash FROM users")
+        }
+        # Для неизвестного логина считаем хеш с этой солью, чтобы время ответа не выдавало,
+        # существует ли пользователь
+        self.dummy_salt = os.urandom(SALT_SIZE)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __contains__(self, login):
+        return login in self.users
+
+    def __len__(self):
+        return len(self.users)
+
+    def _put(self, login, scheme, cost, salt, password_hash):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?)",
+                (login, scheme, cost, salt, password_hash),
+            )
+            self.users[login] = (scheme, cost, salt, password_hash)
+
+    def set_password(self, login, password, cost=None):
+        cost = cost or self.cost
+        salt = os.urandom(SALT_SIZE)
+        self._put(login, SCRYPT_SCHEME, cost, salt, derive(password, salt, cost))
+
+    def verify(self, login, password):
+        record = self.users.get(login)
+        if record is None or record[0] != SCRYPT_SCHEME:
+            derive(password, self.dummy_salt, self.cost)
+            return False
+
+        _, cost, salt, expected = record
+        if not hmac.compare_digest(derive(password, salt, cost), expected):
+            return False
+
+        # Заниженная стоимость — перехешируем с текущими параметрами
+        if cost < self.cost:
+            self.set_password(login, password)
+        return True
+
+
+def benchmark(threads=4, seconds=5.0, cost=DEFAULT_COST):
+    """Сколько проверок пароля в секунду выдерживает хранилище при threads параллельных входах."""
+    store = CredentialStore(":memory:", cost=cost)
+    store.set_password("bench", "secret")
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(slot):
+        while time.perf_counter() < deadline:
+            store.verify("bench", "secret")
+            counts[slot] += 1
+
+    workers = [threading.Thread(target=worker, args=(slot,)) for slot in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    store.close()
+
+    total = sum(counts) / elapsed
+    cores = min(threads, os.cpu_count() or 1)
+    return {
+        "cost": cost,
+        "threads": threads,
+        "logins_per_second": round(total, 1),
+        "logins_per_second_per_core": round(total / cores, 1),
+        "ms_per_login": round(1000 * threads / total, 1) if total else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Учетные записи инспекторов")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Добавить пользователя или сменить пароль")
+    add.add_argument("login")
+    add.add_argument("--cost", type=int, default=DEFAULT_COST)
+    add.add_argument("--db", default=CREDENTIALS_PATH)
+    bench = commands.add_parser("bench", help="Замер входов в секунду")
+    bench.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    bench.add_argument("--seconds", type=float, default=5.0)
+    bench.add_argument("--cost", type=int, default=DEFAULT_COST)
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        password = getpass.getpass("Пароль: ")
+        if password != getpass.getpass("Повторите пароль: "):
+            print("Пароли не совпадают")
+            return 1
+        store = CredentialStore(args.db, cost=args.cost)
+        store.set_password(args.login, password)
+        store.close()
+        print(f"Пользователь {args.login} сохранен")
+    else:
+        result = benchmark(args.threads, args.seconds, args.cost)
+        for key, value in result.items():
+            print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
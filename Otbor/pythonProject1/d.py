@@ -1,5 +1,6 @@
 import sys
-import hashlib
+import math
+import threading
 import uuid
 import os
 import re
@@ -7,19 +8,35 @@ from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QMessageBox, QWidget,
     QVBoxLayout, QLabel, QLineEdit, QPushButton, QFormLayout, QFileDialog, QComboBox
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
-from PIL import Image
+from PyQt5.QtCore import QTimer, Qt
+
+from metrics import timed_slot
+
+# Реестр: локальная база или сервис (SESSIA_SERVICE_URL), создается при первом обращении
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    # Вызывается в том числе из рабочего потока проверки пароля
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            from registry import connect
+            _registry = connect()
+    return _registry
 
-# Словарь для хранения данных водителей
-drivers_db = {}
 
 class DriverLicenseWindow(QWidget):
-    def init(self):
-        super().init()
+    def __init__(self):
+        super().__init__()
         self.init_ui()
 
     def init_ui(self):
+        from form_validation import FormValidator, driver_exists_check, duplicate_check
+        from photo_loader import PhotoLoader
+        from uniqueness import LICENSE
+
         self.setWindowTitle("Регистрация ВУ")
 
         # Поля ввода для ВУ
@@ -38,11 +55,27 @@ class DriverLicenseWindow(QWidget):
         self.driver_photo_preview.setAlignment(Qt.AlignCenter)
         self.choose_photo_button = QPushButton("Выбрать фото")
         self.choose_photo_button.clicked.connect(self.choose_photo)
+        self.photo_loader = PhotoLoader(self, check=False)
+        self.photo_loader.loaded.connect(self.on_photo_loaded)
+        self.photo_loader.failed.connect(self.on_photo_failed)
+        self.previous_preview = None
 
         # Кнопка для сохранения данных
         self.submit_button = QPushButton("Сохранить")
         self.submit_button.clicked.connect(self.save_driver_license)
 
+        # Поля проверяются по мере ввода, водитель и занятость номера — в фоне
+        self.form_validator = FormValidator("license", {
+            "driver_id": self.driver_id_field,
+            "license_number": self.license_number_field,
+            "issue_date": self.issue_date_field,
+            "expiry_date": self.expiry_date_field,
+            "issuing_authority": self.issuing_authority_field,
+            "vehicle_categories": self.vehicle_categories_field,
+        }, self)
+        self.form_validator.add_async_check("driver_id", driver_exists_check(get_registry))
+        self.form_validator.add_async_check("license_number", duplicate_check(get_registry, LICENSE))
+
         # Компоновка формы
         form_layout = QFormLayout()
         form_layout.addRow("Идентификатор водителя (GUID):", self.driver_id_field)
@@ -59,51 +92,61 @@ class DriverLicenseWindow(QWidget):
         form_layout.addRow("", self.submit_button)
         self.setLayout(form_layout)
 
+    @timed_slot("gui.choose_photo")
     def choose_photo(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Выберите фотографию", "", "Images (*.jpg *.png)")
         if file_path:
-            try:
-                image = Image.open(file_path)
-                self.driver_photo_label.setText(f"Фото выбрано: {os.path.basename(file_path)}")
-                self.driver_photo_preview.setPixmap(QPixmap(file_path).scaled(100, 133, Qt.KeepAspectRatio))
-                self.photo_path = file_path
-            except Exception as e:
-                QMessageBox.warning(self, "Ошибка", str(e))
+            # Проверка и декодирование идут в фоне, предыдущий незавершенный выбор отменяется
+            self.previous_preview = self.driver_photo_preview.pixmap()
+            self.driver_photo_preview.setText("Загрузка...")
+            self.photo_loader.load(file_path)
 
+    def on_photo_loaded(self, file_path, pixmap):
+        self.driver_photo_label.setText(f"Фото выбрано: {os.path.basename(file_path)}")
+        self.driver_photo_preview.setPixmap(pixmap)
+        self.photo_path = file_path
+
+    def on_photo_failed(self, file_path, message):
+        if self.previous_preview is not None and not self.previous_preview.isNull():
+            self.driver_photo_preview.setPixmap(self.previous_preview)
+        else:
+            self.driver_photo_preview.clear()
+        QMessageBox.warning(self, "Ошибка", message)
+
+    @timed_slot("gui.save_driver_license")
     def save_driver_license(self):
-        driver_id = self.driver_id_field.text()
-        license_number = self.license_number_field.text()
-        issue_date = self.issue_date_field.text()
-        expiry_date = self.expiry_date_field.text()
-        issuing_authority = self.issuing_authority_field.text()
-        vehicle_categories = self.vehicle_categories_field.text()
-
-        if not driver_id or not license_number or not issue_date or not expiry_date or not issuing_authority or not vehicle_categories:
-            QMessageBox.warning(self, "Ошибка", "Все поля должны быть заполнены!")
-            return
+        from registry import RegistryError
 
-        # Проверка существования водителя в базе
-        if driver_id not in drivers_db:
-            QMessageBox.warning(self, "Ошибка", "Водитель с таким ID не найден. Добавьте его в систему.")
+        # Окончательно поля и существование водителя проверяет реестр
+        if not self.form_validator.submit():
             return
-            # Добавляем данные ВУ для водителя
-            drivers_db[driver_id]["licenses"].append({
-                "license_number": license_number,
-                "issue_date": issue_date,
-                "expiry_date": expiry_date,
-                "issuing_authority": issuing_authority,
-                "vehicle_categories": vehicle_categories,
+        try:
+            get_registry().register_license({
+                "driver_id": self.driver_id_field.text(),
+                "license_number": self.license_number_field.text(),
+                "issue_date": self.issue_date_field.text(),
+                "expiry_date": self.expiry_date_field.text(),
+                "issuing_authority": self.issuing_authority_field.text(),
+                "vehicle_categories": self.vehicle_categories_field.text(),
                 "photo_path": getattr(self, 'photo_path', None)
             })
+        except RegistryError as e:
+            errors = e.errors or ({"driver_id": e.message} if e.status == 404 else {})
+            rest = self.form_validator.show_errors(errors)
+            if rest or not errors:
+                QMessageBox.warning(self, "Ошибка", "\n".join(rest.values()) or e.message)
+            return
 
-            QMessageBox.information(self, "Успех", "ВУ успешно зарегистрировано!")
+        QMessageBox.information(self, "Успех", "ВУ успешно зарегистрировано!")
 
 class AddDriverWindow(QWidget):
-    def init(self):
-        super().init()
+    def __init__(self):
+        super().__init__()
         self.init_ui()
 
     def init_ui(self):
+        from form_validation import FormValidator
+
         self.setWindowTitle("Добавление водителя")
 
         # Поля ввода
@@ -117,6 +160,12 @@ class AddDriverWindow(QWidget):
         self.choose_photo_button.clicked.connect(self.choose_photo)
         self.submit_button = QPushButton("Сохранить")
         self.submit_button.clicked.connect(self.save_driver)
+        self.form_validator = FormValidator("driver_short", {
+            "last_name": self.last_name_field,
+            "first_name": self.first_name_field,
+            "middle_name": self.middle_name_field,
+            "dob": self.dob_field,
+        }, self)
 
         # Компоновка
         form_layout = QFormLayout()
@@ -129,37 +178,39 @@ class AddDriverWindow(QWidget):
         form_layout.addRow("", self.submit_button)
         self.setLayout(form_layout)
 
+    @timed_slot("gui.choose_photo")
     def choose_photo(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Выберите фотографию", "", "Images (*.jpg *.png)")
         if file_path:
             self.photo_field.setText(f"Фото выбрано: {os.path.basename(file_path)}")
             self.photo_path = file_path
 
+    @timed_slot("gui.save_driver")
     def save_driver(self):
-        driver_id = self.driver_id_field.text()
-        last_name = self.last_name_field.text()
-        first_name = self.first_name_field.text()
-        middle_name = self.middle_name_field.text()
-        dob = self.dob_field.text()
-
-        if not last_name or not first_name or not middle_name or not dob:
-            QMessageBox.warning(self, "Ошибка", "Все поля должны быть заполнены!")
-            return
+        from registry import RegistryError
 
-        # Добавляем водителя в базу данных
-        drivers_db[driver_id] = {
-            "last_name": last_name,
-            "first_name": first_name,
-            "middle_name": middle_name,
-            "dob": dob,
-            "licenses": []  # Список ВУ для водителя
-        }
+        if not self.form_validator.submit():
+            return
+        try:
+            get_registry().save_driver({
+                "driver_id": self.driver_id_field.text(),
+                "last_name": self.last_name_field.text(),
+                "first_name": self.first_name_field.text(),
+                "middle_name": self.middle_name_field.text(),
+                "dob": self.dob_field.text(),
+                "photo_path": getattr(self, 'photo_path', None)
+            }, profile="driver_short")
+        except RegistryError as e:
+            rest = self.form_validator.show_errors(e.errors)
+            if rest or not e.errors:
+                QMessageBox.warning(self, "Ошибка", "\n".join(rest.values()) or e.message)
+            return
 
         QMessageBox.information(self, "Успех", "Водитель успешно добавлен!")
 
 class MainApplication(QMainWindow):
-    def init(self):
-        super().init()
+    def __init__(self):
+        super().__init__()
         self.setWindowTitle("Главное окно")
         self.setGeometry(810, 440, 300, 200)
         self.init_ui()
@@ -185,11 +236,9 @@ class MainApplication(QMainWindow):
         self.register_license_window.show()
 
 class AuthSystem(QMainWindow):
-    def init(self):
-        super().init()
-        self.attempts = 0
+    def __init__(self):
+        super().__init__()
         self.locked = False
-        self.lock_time = 60  # блокировка на 60 секунд
         self.setWindowTitle("Авторизация")
         self.setGeometry(810, 440, 300, 200)
         self.initUI()
@@ -214,13 +263,50 @@ class AuthSystem(QMainWindow):
         self.setCentralWidget(widget)
         widget.setLayout(layout)
 
+        self.lock_timer = QTimer()
+        self.lock_timer.timeout.connect(self.unlock)
+        self.credential_checker = None
+
+    @timed_slot("gui.check_credentials")
     def check_credentials(self):
+        # Пароль проверяет хранилище учетных записей (credentials.py) в фоне
         username = self.username_input.text()
-        password = self.password_input.text()
-        if username == "inspector" and password == "12345":
+        if self.credential_checker is None:
+            from auth_worker import CredentialChecker
+            self.credential_checker = CredentialChecker(get_registry, self)
+            self.credential_checker.finished.connect(self.on_credentials_checked)
+            self.credential_checker.failed.connect(self.on_check_failed)
+        self.login_button.setEnabled(False)
+        self.credential_checker.check(username, self.password_input.text())
+
+    def on_check_failed(self, message):
+        self.login_button.setEnabled(True)
+        QMessageBox.warning(self, "Ошибка", f"Не удалось проверить пароль: {message}")
+
+    def on_credentials_checked(self, username, result):
+        self.login_button.setEnabled(True)
+        locked_for = result["locked_for"]
+        if result["ok"]:
+            get_registry().set_actor(username)
+            self.unlock()
             self.open_main_window()
+        elif not result["checked"]:
+            self.lock(locked_for)
+            QMessageBox.warning(self, "Ошибка", f"Вход заблокирован. Попробуйте через {math.ceil(locked_for)} с.")
         else:
             QMessageBox.warning(self, "Ошибка", "Неверный логин или пароль!")
+            if locked_for:
+                self.lock(locked_for)
+
+    def lock(self, seconds):
+        self.locked = True
+        self.login_button.setEnabled(False)
+        self.lock_timer.start(max(int(seconds * 1000), 1000))
+
+    def unlock(self):
+        self.locked = False
+        self.login_button.setEnabled(True)
+        self.lock_timer.stop()
 
     def open_main_window(self):
         self.main_window = MainApplication()
@@ -230,6 +316,8 @@ class AuthSystem(QMainWindow):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    from stall_watchdog import instrument_gui
+    watchdog = instrument_gui(app)
     window = AuthSystem()
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""Даты в виде целых чисел ГГГГММДД.
+
+Такие числа сравниваются и сортируются как сами даты, поэтому по ним строятся
+индексы (срок действия ВУ) без разбора строк при каждом запросе.
+"""
+import datetime
+import re
+
+# ДД.ММ.ГГГГ (как вводят в формах) и ГГГГ-ММ-ДД (ISO, реестры)
+DATE_RE = re.compile(r"(\d{2})\.(\d{2})\.(\d{4})|(\d{4})-(\d{2})-(\d{2})")
+
+# Дата не указана или не разобрана: меньше любой настоящей даты
+UNKNOWN_DAY = 0
+
+
+def parse_day(text):
+    """Строка даты -> ГГГГММДД; UNKNOWN_DAY, если строку разобрать нельзя."""
+    match = DATE_RE.fullmatch(text.strip()) if text else None
+    if match is None:
+        return UNKNOWN_DAY
+    if match.group(1):
+        day, month, year = match.group(1, 2, 3)
+    else:
+        year, month, day = match.group(4, 5, 6)
+    try:
+        return to_day(datetime.date(int(year), int(month), int(day)))
+    except ValueError:
+        return UNKNOWN_DAY
+
+
+def to_day(value):
+    """date/datetime или строка -> ГГГГММДД."""
+    if isinstance(value, str):
+        return parse_day(value)
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+def from_day(day):
+    """ГГГГММДД -> date (None для UNKNOWN_DAY)."""
+    if day == UNKNOWN_DAY:
+        return None
+    return datetime.date(day // 10000, day // 100 % 100, day % 100)
+
+
+def format_day(day):
+    """ГГГГММДД -> 'ДД.ММ.ГГГГ' (пустая строка для UNKNOWN_DAY)."""
+    if day == UNKNOWN_DAY:
+        return ""
+    return f"{day % 100:02d}.{day // 100 % 100:02d}.{day // 10000:04d}"
+
+
+def today():
+    return to_day(datetime.date.today())
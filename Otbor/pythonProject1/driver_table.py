@@ -0,0 +1,160 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QSize, Qt, QTimer
+from PyQt5.QtWidgets import QAbstractItemView, QHeaderView, QLineEdit, QTableView, QVBoxLayout, QWidget
+
+from photo_loader import ThumbnailLoader
+from records import DriverRecord
+from storage import SORTABLE_COLUMNS
+
+# Столбцы списка: (поле в базе, заголовок)
+COLUMNS = (
+    ("last_name", "Фамилия"),
+    ("first_name", "Имя"),
+    ("middle_name", "Отчество"),
+    ("passport", "Паспорт"),
+    ("phone", "Телефон"),
+    ("registration_city", "Город регистрации"),
+)
+
+PAGE_SIZE = 200
+
+# Поля, которые читаются из базы для строки модели
+_FIELDS = ("photo_path",) + tuple(field for field, _ in COLUMNS)
+
+
+class DriverTableModel(QAbstractTableModel):
+    """Модель списка водителей, подгружающая страницы из хранилища по мере прокрутки.
+
+    Сортировка и фильтр выполняются запросом к базе. В памяти лежат только
+    записи (records.py) уже показанных строк, превью грузятся в фоне для видимых строк.
+    """
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.rows = []
+        self.exhausted = False
+        self.sort_column = "last_name"
+        self.descending = False
+        self.last_name_prefix = ""
+        # Фото записей лежат в хранилище реестра (локально или у сервиса)
+        self.thumb_loader = ThumbnailLoader(self, fetch=store.photo_bytes)
+        self.thumb_loader.ready.connect(self.on_thumbnail_ready)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return getattr(record, COLUMNS[index.column()][0])
+        if role == Qt.DecorationRole and index.column() == 0:
+            photo_path = record.photo_path
+            if not photo_path:
+                return None
+            pixmap = self.thumb_loader.cache.peek(photo_path)
+            if pixmap is None:
+                # data() вызывается только для видимых строк — превью грузятся лениво
+                self.thumb_loader.request(photo_path)
+            return pixmap
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section][1]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        last = self.rows[-1] if self.rows else None
+        after = (getattr(last, self.sort_column), last.id) if last is not None else None
+        page = self.store.page_drivers(
+            _FIELDS,
+            sort=self.sort_column,
+            descending=self.descending,
+            after=after,
+            limit=PAGE_SIZE,
+            last_name_prefix=self.last_name_prefix,
+        )
+        if len(page) < PAGE_SIZE:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(DriverRecord.from_page_row(_FIELDS, row) for row in page)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        field = COLUMNS[column][0]
+        if field not in SORTABLE_COLUMNS:
+            return
+        self.sort_column = field
+        self.descending = order == Qt.DescendingOrder
+        self.reload()
+
+    def set_filter(self, last_name_prefix):
+        if last_name_prefix != self.last_name_prefix:
+            self.last_name_prefix = last_name_prefix
+            self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.thumb_loader.clear()
+        self.endResetModel()
+        self.fetchMore()
+
+    def on_thumbnail_ready(self, file_path, pixmap):
+        # Одно фото может стоять у нескольких записей (хранилище хранит его один раз)
+        for row, record in enumerate(self.rows):
+            if record.photo_path == file_path:
+                index = self.index(row, 0)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class DriverListWindow(QWidget):
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.init_ui()
+
+    def init_ui(self):
+        self.setWindowTitle("Водители")
+        self.resize(900, 600)
+
+        self.filter_field = QLineEdit()
+        self.filter_field.setPlaceholderText("Фамилия начинается с...")
+        # Запрос к базе только после паузы в наборе
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(250)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_field.textEdited.connect(lambda _: self.filter_timer.start())
+
+        self.model = DriverTableModel(self.store, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setIconSize(QSize(30, 40))
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+        # Фиксированная высота строк: представлению не нужно измерять содержимое
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(44)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.filter_field)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+    def apply_filter(self):
+        self.model.set_filter(self.filter_field.text().strip())
@@ -0,0 +1,224 @@
+"""Проверка полей форм водителя и ВУ по мере ввода.
+
+После правки поля (textEdited) и паузы DEBOUNCE_MS проверяется только это
+поле по правилам validation.py. Результат запоминается, неверное поле
+подсвечивается рамкой, текст ошибки — во всплывающей подсказке. При
+сохранении заново проверяются только поля, пауза после правки которых еще
+не истекла, остальное берется из запомненных результатов.
+
+Проверки, которым нужна база или сервис (занят ли паспорт или номер ВУ,
+есть ли водитель), выполняются в пуле потоков и не задерживают ввод.
+Окончательная проверка остается за реестром: его ошибки показываются у
+полей через show_errors().
+"""
+from functools import partial
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QLineEdit
+
+from uniqueness import duplicate_message
+from validation import get_validator
+
+DEBOUNCE_MS = 300
+INVALID_STYLE = "border: 1px solid #d32f2f;"
+# Результатов фоновых проверок на форму; при переполнении забываются все
+ASYNC_CACHE_SIZE = 256
+
+
+class _CheckSignals(QObject):
+    # номер запроса, поле, значение, текст ошибки или None
+    finished = pyqtSignal(int, str, str, object)
+
+
+class AsyncCheckTask(QRunnable):
+    def __init__(self, signals, request_id, field, value, check):
+        super().__init__()
+        self.signals = signals
+        self.request_id = request_id
+        self.field = field
+        self.value = value
+        self.check = check
+
+    def run(self):
+        try:
+            message = self.check(self.value)
+        except Exception:
+            # Нет связи с базой или сервисом: ввод не блокируется, при сохранении проверит реестр
+            return
+        self.signals.finished.emit(self.request_id, self.field, self.value, message)
+
+
+class FormValidator(QObject):
+    """Проверка полей одной формы по набору правил profile (validation.PROFILES).
+
+    fields — {поле: виджет}. Значение QLineEdit — его текст, значение
+    остальных виджетов (надпись с выбранным фото) задается set_value().
+    Начальные значения проверяются сразу, но подсвечиваются только после
+    правки поля или попытки сохранения.
+    """
+
+    # поле, текст ошибки ('' — поле заполнено верно)
+    field_checked = pyqtSignal(str, str)
+
+    def __init__(self, profile, fields, parent=None, delay=DEBOUNCE_MS, pool=None):
+        super().__init__(parent)
+        self.validator = get_validator(profile)
+        self.widgets = dict(fields)
+        self.styles = {field: widget.styleSheet() for field, widget in self.widgets.items()}
+        self.order = {field: index for index, field in enumerate(self.validator.fields)}
+        # Поле -> значение, для которого посчитана ошибка
+        self.values = {}
+        # Поле -> текст ошибки, только неверные поля
+        self.errors = {}
+        # Значения полей без строки ввода
+        self.extra = {}
+        self.touched = set()
+        # Поля, правленные после последней проверки
+        self.dirty = set()
+        self.async_checks = {}
+        self.async_results = {}
+        # Поле -> номер последнего запроса фоновой проверки
+        self.requests = {}
+        self.current = 0
+        self.pool = pool or QThreadPool.globalInstance()
+        self.signals = _CheckSignals()
+        self.signals.finished.connect(self._on_async_finished)
+
+        self.timers = {}
+        for field, widget in self.widgets.items():
+            if isinstance(widget, QLineEdit):
+                timer = QTimer(self)
+                timer.setSingleShot(True)
+                timer.setInterval(delay)
+                timer.timeout.connect(partial(self.check_field, field))
+                widget.textEdited.connect(partial(self._on_edited, field))
+                self.timers[field] = timer
+        for field in self.validator.fields:
+            self._check(field, self.value(field))
+
+    def value(self, field):
+        widget = self.widgets.get(field)
+        if isinstance(widget, QLineEdit):
+            return widget.text()
+        return self.extra.get(field)
+
+    def set_value(self, field, value):
+        """Значение поля без строки ввода (путь к выбранному фото), проверяется сразу."""
+        self.extra[field] = value
+        self.check_field(field)
+
+    def add_async_check(self, field, check):
+        """check(значение) -> текст ошибки или None, вызывается в рабочем потоке,
+        если значение прошло проверку формата. Результат запоминается по значению."""
+        self.async_checks[field] = check
+
+    def _on_edited(self, field, text):
+        self.dirty.add(field)
+        self.timers[field].start()
+
+    def check_field(self, field):
+        self.touched.add(field)
+        self.dirty.discard(field)
+        self._check(field, self.value(field))
+        self._mark(field)
+
+    def _check(self, field, value):
+        if field in self.values and self.values[field] == value:
+            return
+        self.values[field] = value
+        message = self.validator.validate_field(field, value)
+        if message is None and field in self.async_checks:
+            key = (field, value)
+            if key in self.async_results:
+                message = self.async_results[key]
+            else:
+                self.current += 1
+                self.requests[field] = self.current
+                self.pool.start(AsyncCheckTask(self.signals, self.current, field, value, self.async_checks[field]))
+        self._set_error(field, message)
+
+    def _set_error(self, field, message):
+        if message:
+            self.errors[field] = message
+        else:
+            self.errors.pop(field, None)
+
+    def _mark(self, field):
+        message = self.errors.get(field, "")
+        widget = self.widgets.get(field)
+        if widget is not None and field in self.touched:
+            widget.setStyleSheet(INVALID_STYLE if message else self.styles[field])
+            widget.setToolTip(message)
+        self.field_checked.emit(field, message)
+
+    def _on_async_finished(self, request_id, field, value, message):
+        if len(self.async_results) >= ASYNC_CACHE_SIZE:
+            self.async_results.clear()
+        self.async_results[(field, value)] = message
+        # Пока шла проверка, значение могли изменить
+        if self.requests.get(field) != request_id or self.values.get(field) != value:
+            return
+        del self.requests[field]
+        self._set_error(field, message)
+        self._mark(field)
+
+    def submit(self):
+        """Проверка перед сохранением: True, если все поля заполнены верно.
+
+        Заново проверяются только поля, правленные после последней проверки.
+        Все ошибки показываются у полей, фокус переходит на первое неверное.
+        Фоновые проверки, которые еще идут, сохранение не задерживают.
+        """
+        for field in list(self.dirty):
+            self.timers[field].stop()
+            self.check_field(field)
+        if not self.touched.issuperset(self.validator.fields):
+            self.touched.update(self.validator.fields)
+            for field in self.errors:
+                self._mark(field)
+        if not self.errors:
+            return True
+        first = min(self.errors, key=lambda field: self.order.get(field, len(self.order)))
+        widget = self.widgets.get(first)
+        if widget is not None:
+            widget.setFocus()
+        return False
+
+    def show_errors(self, errors):
+        """Ошибки реестра по полям — у полей формы. Возвращает ошибки полей, которых в форме нет."""
+        rest = {}
+        for field, message in errors.items():
+            if field not in self.widgets:
+                rest[field] = message
+                continue
+            # Ошибка держится, пока значение поля не изменится
+            self.values[field] = self.value(field)
+            self.requests.pop(field, None)
+            self.touched.add(field)
+            self._set_error(field, message)
+            self._mark(field)
+        return rest
+
+
+def duplicate_check(get_registry, kind, own_id=""):
+    """Фоновая проверка: паспорт или номер ВУ (uniqueness.KINDS) уже занят другим водителем."""
+    def check(value):
+        owner = get_registry().find_owner(kind, value)
+        if owner and owner != own_id:
+            return duplicate_message(kind, value, owner)
+        return None
+    return check
+
+
+def driver_exists_check(get_registry):
+    """Фоновая проверка идентификатора водителя в форме ВУ."""
+    def check(value):
+        from registry import RegistryError
+        try:
+            get_registry().get_driver(value)
+        except RegistryError as e:
+            if e.status == 404:
+                return e.message
+            raise
+        return None
+    return check
@@ -0,0 +1,188 @@
+"""Справочник населенных пунктов и улиц для автодополнения.
+
+Индекс — отсортированный по ключу бинарный файл, который читается через mmap:
+    GZT1 | число записей (uint64) | смещения записей (uint64 * (n + 1)) | записи
+Запись: нормализованный ключ, байт 0x1F, отображаемое название (UTF-8).
+Поиск по префиксу — двоичный поиск по смещениям, в Python-объекты
+превращаются только найденные записи.
+
+Сборка индексов:
+    python gazetteer.py cities cities.txt gazetteer/cities.idx
+    python gazetteer.py streets streets.csv gazetteer/streets.idx
+cities.txt — по одному городу в строке, streets.csv — строки "город;улица".
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"GZT1"
+SEPARATOR = b"\x1f"
+# Разделитель города и улицы в ключе индекса улиц
+CITY_SEPARATOR = "\x1e"
+
+CITIES_PATH = os.path.join("gazetteer", "cities.idx")
+STREETS_PATH = os.path.join("gazetteer", "streets.idx")
+
+# Если индекс городов не собран, используется короткий встроенный список
+DEFAULT_CITIES = ["Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань"]
+
+
+def normalize(text):
+    return text.strip().casefold().replace("ё", "е")
+
+
+def street_key(city, street):
+    return normalize(city) + CITY_SEPARATOR + normalize(street)
+
+
+def build_index(entries, out_path):
+    """Запись индекса из пар (ключ, название). Возвращает число записей."""
+    encoded = sorted({(key.encode("utf-8"), display.encode("utf-8")) for key, display in entries})
+    offsets = array("Q", [0])
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path + ".tmp", "wb") as out:
+        for key, display in encoded:
+            offsets.append(offsets[-1] + len(key) + 1 + len(display))
+        out.write(MAGIC)
+        out.write(struct.pack("<Q", len(encoded)))
+        out.write(offsets.tobytes())
+        for key, display in encoded:
+            out.write(key + SEPARATOR + display)
+    os.replace(out_path + ".tmp", out_path)
+    return len(encoded)
+
+
+class _Keys:
+    """Последовательность ключей индекса для bisect, без копирования всего файла."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, i):
+        return self.index.key_at(i)
+
+
+class Gazetteer:
+    """Префиксный поиск по индексу справочника. Файл открывается при первом запросе."""
+
+    def __init__(self, path, fallback=None):
+        self.path = path
+        self.fallback = fallback
+        self.mm = None
+        self.count = 0
+        self.lock = threading.Lock()
+        self.loaded = False
+
+    def _load(self):
+        with self.lock:
+            if self.loaded:
+                return
+            self.loaded = True
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "rb") as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.mm[:4] != MAGIC:
+                raise ValueError(f"Файл {self.path} не является индексом справочника")
+            self.count = struct.unpack_from("<Q", self.mm, 4)[0]
+            offsets_start = 12
+            self.data_start = offsets_start + 8 * (self.count + 1)
+            self.offsets = memoryview(self.mm)[offsets_start:self.data_start].cast("Q")
+
+    def key_at(self, i):
+        start = self.data_start + self.offsets[i]
+        end = self.data_start + self.offsets[i + 1]
+        return self.mm[start:self.mm.find(SEPARATOR, start, end)]
+
+    def entry_at(self, i):
+        start = self.data_start + self.offsets[i]
+        end = self.data_start + self.offsets[i + 1]
+        key, display = self.mm[start:end].split(SEPARATOR, 1)
+        return key, display.decode("utf-8")
+
+    def complete(self, prefix, limit=20):
+        """До limit названий, ключ которых начинается с нормализованного префикса."""
+        if not self.loaded:
+            self._load()
+        if self.mm is None:
+            if self.fallback is None:
+                return []
+            prefix = normalize(prefix)
+            return [name for name in self.fallback if normalize(name).startswith(prefix)][:limit]
+
+        prefix_bytes = prefix.encode("utf-8")
+        results = []
+        seen = set()
+        i = bisect_left(_Keys(self), prefix_bytes)
+        while i < self.count and len(results) < limit:
+            key, display = self.entry_at(i)
+            if not key.startswith(prefix_bytes):
+                break
+            if display not in seen:
+                seen.add(display)
+                results.append(display)
+            i += 1
+        return results
+
+    def close(self):
+        with self.lock:
+            if self.mm is not None:
+                self.offsets.release()
+                self.mm.close()
+                self.mm = None
+            self.loaded = False
+
+
+cities = Gazetteer(CITIES_PATH, fallback=DEFAULT_CITIES)
+streets = Gazetteer(STREETS_PATH)
+
+
+def complete_city(text, limit=20):
+    return cities.complete(normalize(text), limit)
+
+
+def complete_street(city, text, limit=20):
+    if not city.strip():
+        return []
+    return streets.complete(street_key(city, text), limit)
+
+
+def _read_cities(path):
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            name = line.strip()
+            if name:
+                yield normalize(name), name
+
+
+def _read_streets(path):
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            city, _, street = line.strip().partition(";")
+            if city and street:
+                yield street_key(city, street), street.strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка индекса справочника городов и улиц")
+    parser.add_argument("kind", choices=("cities", "streets"))
+    parser.add_argument("source")
+    parser.add_argument("out")
+    args = parser.parse_args(argv)
+
+    read = _read_cities if args.kind == "cities" else _read_streets
+    count = build_index(read(args.source), args.out)
+    print(f"Записей в индексе: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,54 @@
+import time
+STARTED = time.perf_counter()
+
 import sys
+import math
 import os
+import threading
 import uuid
-import re
-from pillow import Image
-from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout, QMessageBox, QFileDialog,
-    QFormLayout, QCompleter, QTabWidget
+    QFormLayout, QTabWidget
 )
 from PyQt5.QtCore import Qt
+from metrics import timed_slot
+from startup import measure_first_paint, startup_time_requested
+
+# Реестр: локальная база или сервис (SESSIA_SERVICE_URL), создается при первом обращении
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    # Вызывается в том числе из рабочего потока проверки пароля
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            from registry import connect
+            _registry = connect()
+    return _registry
+
+
+class LazyTab(QWidget):
+    """Вкладка, содержимое которой создается при первом показе или обращении."""
+
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self.widget = None
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+    def ensure_built(self):
+        if self.widget is None:
+            self.widget = self.factory()
+            self.layout().addWidget(self.widget)
+        return self.widget
+
+    def showEvent(self, event):
+        self.ensure_built()
+        super().showEvent(event)
 
 
 class MainApp(QWidget):
@@ -21,14 +61,15 @@ class MainApp(QWidget):
         self.resize(600, 400)
 
         # Создание вкладок
+        # При запуске строится только вкладка входа, остальные — при первом показе
         self.tabs = QTabWidget()
         self.login_tab = LoginTab(self)
-        self.menu_tab = MenuTab(self)
-        self.create_driver_tab = CreateDriverWindow()
+        self.menu_lazy_tab = LazyTab(lambda: MenuTab(self))
+        self.create_driver_lazy_tab = LazyTab(CreateDriverWindow)
 
         self.tabs.addTab(self.login_tab, "Логин")
-        self.tabs.addTab(self.menu_tab, "Главное меню")
-        self.tabs.addTab(self.create_driver_tab, "Создание водителя")
+        self.tabs.addTab(self.menu_lazy_tab, "Главное меню")
+        self.tabs.addTab(self.create_driver_lazy_tab, "Создание водителя")
 
         # Блокируем доступ к меню и созданию водителей до логина
         self.tabs.setTabEnabled(1, False)
@@ -39,6 +80,14 @@ class MainApp(QWidget):
         layout.addWidget(self.tabs)
         self.setLayout(layout)
 
+    @property
+    def menu_tab(self):
+        return self.menu_lazy_tab.ensure_built()
+
+    @property
+    def create_driver_tab(self):
+        return self.create_driver_lazy_tab.ensure_built()
+
     def unlock_menu(self):
         """Разблокировка вкладок после успешного логина."""
         self.tabs.setTabEnabled(1, True)
@@ -52,10 +101,6 @@ class LoginTab(QWidget):
         self.main_app = main_app
         self.init_ui()
 
-        # Данные пользователей (для примера)
-        self.users = {"user1": "password1", "user2": "password2"}
-        self.error_count = 0
-
     def init_ui(self):
         self.setWindowTitle("Логин")
 
@@ -71,6 +116,7 @@ class LoginTab(QWidget):
 
         # Сигналы
         self.login_button.clicked.connect(self.handle_login)
+        self.credential_checker = None
 
         # Компоновка
         layout = QVBoxLayout()
@@ -82,16 +128,34 @@ class LoginTab(QWidget):
         layout.addWidget(self.info_label)
         self.setLayout(layout)
 
+    @timed_slot("gui.check_credentials")
     def handle_login(self):
         login = self.login_input.text()
-        password = self.password_input.text()
-
-        if login in self.users and self.users[login] == password:
+        if self.credential_checker is None:
+            from auth_worker import CredentialChecker
+            self.credential_checker = CredentialChecker(get_registry, self)
+            self.credential_checker.finished.connect(self.on_login_checked)
+            self.credential_checker.failed.connect(self.on_login_failed)
+
+        # Пароль проверяется в фоне, кнопка недоступна до ответа
+        self.login_button.setEnabled(False)
+        self.info_label.setText("Проверка...")
+        self.credential_checker.check(login, self.password_input.text())
+
+    def on_login_failed(self, message):
+        self.login_button.setEnabled(True)
+        self.info_label.setText(f"Ошибка проверки: {message}")
+
+    def on_login_checked(self, login, result):
+        self.login_button.setEnabled(True)
+        if result["ok"]:
             self.info_label.setText("Успешный вход!")
+            get_registry().set_actor(login)
             self.main_app.unlock_menu()
+        elif result["locked_for"]:
+            self.info_label.setText(f"Вход заблокирован. Попробуйте через {math.ceil(result['locked_for'])} с.")
         else:
-            self.error_count += 1
-            self.info_label.setText(f"Неверный логин или пароль. Попыток: {3 - self.error_count}")
+            self.info_label.setText(f"Неверный логин или пароль. Попыток: {result['attempts_left']}")
 
 
 class MenuTab(QWidget):
@@ -119,7 +183,9 @@ class MenuTab(QWidget):
         self.main_app.tabs.setCurrentIndex(2)
 
     def view_drivers(self):
-        QMessageBox.information(self, "Информация", "Просмотр водителей пока не реализован.")
+        from driver_table import DriverListWindow
+        self.drivers_window = DriverListWindow(get_registry())
+        self.drivers_window.show()
 
 
 class CreateDriverWindow(QWidget):
@@ -128,6 +194,11 @@ class CreateDriverWindow(QWidget):
         self.init_ui()
 
     def init_ui(self):
+        from address_completer import attach_city_completer, attach_street_completer
+        from form_validation import FormValidator, duplicate_check
+        from photo_loader import PhotoLoader
+        from uniqueness import PASSPORT
+
         self.setWindowTitle("Создание водителя")
 
         # Поля ввода
@@ -163,15 +234,35 @@ class CreateDriverWindow(QWidget):
 
         self.choose_photo_button = QPushButton("Выбрать фото")
         self.choose_photo_button.clicked.connect(self.choose_photo)
+        self.photo_loader = PhotoLoader(self, perceptual_hash=True)
+        self.photo_loader.loaded.connect(self.on_photo_loaded)
+        self.photo_loader.failed.connect(self.on_photo_failed)
+        self.previous_preview = None
 
         self.submit_button = QPushButton("Сохранить")
         self.submit_button.clicked.connect(self.validate_data)
 
-        # Автодополнение для городов
-        cities = ["Москва", "Санкт-Петербург", "Новосибирск", "Екатеринбург", "Казань"]
-        completer = QCompleter(cities)
-        self.registration_city_field.setCompleter(completer)
-        self.living_city_field.setCompleter(completer)
+        # Автодополнение городов и улиц по справочнику
+        attach_city_completer(self.registration_city_field)
+        attach_city_completer(self.living_city_field)
+        attach_street_completer(self.registration_address_field, self.registration_city_field)
+        attach_street_completer(self.living_address_field, self.living_city_field)
+
+        # Поля проверяются по мере ввода, занятость паспорта — в фоне
+        self.form_validator = FormValidator("driver", {
+            "last_name": self.last_name_field,
+            "first_name": self.first_name_field,
+            "middle_name": self.middle_name_field,
+            "passport": self.passport_field,
+            "registration_city": self.registration_city_field,
+            "registration_address": self.registration_address_field,
+            "living_city": self.living_city_field,
+            "living_address": self.living_address_field,
+            "phone": self.phone_field,
+            "email": self.email_field,
+            "photo_path": self.photo_path_label,
+        }, self)
+        self.form_validator.add_async_check("passport", duplicate_check(get_registry, PASSPORT, self.guid_field.text()))
 
         # Компоновка
         form_layout = QFormLayout()
@@ -200,58 +291,71 @@ class CreateDriverWindow(QWidget):
 
         self.setLayout(form_layout)
 
+    @timed_slot("gui.choose_photo")
     def choose_photo(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Выберите фотографию", "", "Images (*.jpg *.png)")
         if file_path:
-            try:
-                image = Image.open(file_path)
-                width, height = image.size
-                file_size = os.path.getsize(file_path)
-
-                if width / height != 3 / 4:
-                    raise ValueError("Соотношение сторон изображения должно быть 3:4.")
-                if height < width:
-                    raise ValueError("Изображение должно быть вертикальным.")
-                if file_size > 2 * 1024 * 1024:
-                    raise ValueError("Размер изображения не должен превышать 2 МБ.")
-
-                self.photo_path_label.setText(f"Фото выбрано: {os.path.basename(file_path)}")
-                self.photo_preview.setPixmap(QPixmap(file_path).scaled(100, 133, Qt.KeepAspectRatio))
-                self.photo_path = file_path
-            except Exception as e:
-                QMessageBox.warning(self, "Ошибка", str(e))
-
+            # Проверка и декодирование идут в фоне, предыдущий незавершенный выбор отменяется
+            self.previous_preview = self.photo_preview.pixmap()
+            self.photo_preview.setText("Загрузка...")
+            self.photo_loader.load(file_path)
+
+    def on_photo_loaded(self, file_path, pixmap):
+        self.photo_path_label.setText(f"Фото выбрано: {os.path.basename(file_path)}")
+        self.photo_preview.setPixmap(pixmap)
+        self.photo_path = file_path
+        self.photo_hash = self.photo_loader.photo_hash
+        self.form_validator.set_value("photo_path", file_path)
+
+    def on_photo_failed(self, file_path, message):
+        if self.previous_preview is not None and not self.previous_preview.isNull():
+            self.photo_preview.setPixmap(self.previous_preview)
+        else:
+            self.photo_preview.clear()
+        QMessageBox.warning(self, "Ошибка", message)
+
+    def collect_data(self):
+        """Данные формы в виде записи для модуля validation."""
+        return {
+            "driver_id": self.guid_field.text(),
+            "last_name": self.last_name_field.text(),
+            "first_name": self.first_name_field.text(),
+            "middle_name": self.middle_name_field.text(),
+            "passport": self.passport_field.text(),
+            "registration_city": self.registration_city_field.text(),
+            "registration_address": self.registration_address_field.text(),
+            "living_city": self.living_city_field.text(),
+            "living_address": self.living_address_field.text(),
+            "workplace": self.workplace_field.text(),
+            "position": self.position_field.text(),
+            "phone": self.phone_field.text(),
+            "email": self.email_field.text(),
+            "photo_path": getattr(self, 'photo_path', None),
+            "notes": self.notes_field.text(),
+            "photo_hash": getattr(self, 'photo_hash', None),
+        }
+
+    @timed_slot("gui.validate_data")
     def validate_data(self):
-        errors = []
-        if not self.last_name_field.text():
-            errors.append("Фамилия обязательна.")
-        if not self.first_name_field.text():
-            errors.append("Имя обязательно.")
-        if not self.middle_name_field.text():
-            errors.append("Отчество обязательно.")
-        if not self.passport_field.text() or not re.match(r"^\d{4}\s\d{6}$", self.passport_field.text()):
-            errors.append("Паспорт должен быть в формате 'XXXX XXXXXX'.")
-        if not self.registration_city_field.text():
-            errors.append("Город регистрации обязателен.")
-        if not self.registration_address_field.text():
-            errors.append("Адрес регистрации обязателен.")
-        if not self.living_city_field.text():
-            errors.append("Город проживания обязателен.")
-        if not self.living_address_field.text():
-            errors.append("Адрес проживания обязателен.")
-        if not self.phone_field.text() or not re.match(r"^\+7\d{10}$", self.phone_field.text()):
-            errors.append("Телефон должен быть в формате '+7XXXXXXXXXX'.")
-        if not self.email_field.text() or not re.match(r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$", self.email_field.text()):
-            errors.append("Email имеет неверный формат.")
-        if not hasattr(self, 'photo_path') or not self.photo_path:
-            errors.append("Фотография обязательна.")
-
-        if errors:
-            QMessageBox.warning(self, "Ошибки", "\n".join(errors))
+        from registry import RegistryError
+
+        # Ошибки полей уже показаны у полей, реестр проверяет запись окончательно
+        if not self.form_validator.submit():
+            return
+        try:
+            get_registry().save_driver(self.collect_data())
+        except RegistryError as e:
+            rest = self.form_validator.show_errors(e.errors)
+            if rest or not e.errors:
+                QMessageBox.warning(self, "Ошибки", "\n".join(rest.values()) or e.message)
         else:
             QMessageBox.information(self, "Успех", "Водитель успешно сохранен!")
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    from stall_watchdog import instrument_gui
+    watchdog = instrument_gui(app)
     main_app = MainApp()
+    if startup_time_requested():
+        measure_first_paint(app, main_app, STARTED)
     main_app.show()
     sys.exit(app.exec_())
@@ -0,0 +1,378 @@
+"""Журнал изменений реестра: только дозапись, контрольные суммы, групповая фиксация.
+
+Каждая запись водителей или ВУ попадает в журнал внутри транзакции SQLite,
+а вызывающий поток после фиксации транзакции ждет, пока запись журнала
+окажется на диске. Записи всех потоков, накопившиеся за время одного fsync,
+сбрасываются на диск следующим fsync одной группой.
+
+Запись в файле: длина данных, CRC32 (номер + данные), номер (struct <IIQ)
+и JSON {"op", "at", "actor", "items"}. Оборванная при сбое запись в конце
+файла отрезается при открытии журнала.
+
+Номера записей, примененных к базе, хранятся в таблице journal_applied
+(storage.py). При запуске recover() применяет записи журнала, которых нет
+в базе, и дописывает в журнал изменения базы, запись которых не успела
+попасть на диск. Сжатие: копия базы (снимок) + перенос старых сегментов
+в архив; сегменты не удаляются — журнал служит журналом аудита.
+
+Номера записей выдает процесс, открывший журнал, поэтому журнал в один
+момент открыт только одним процессом: при открытии берется исключительная
+блокировка файла LOCK_NAME в папке журнала, второй процесс получает
+JournalBusyError. Несколько программ работают с одной базой через сервис.
+
+Пример:
+    python journal.py history <GUID> --db drivers.db
+    python journal.py verify --db drivers.db
+    python journal.py compact --db drivers.db
+    python journal.py restore --db drivers.db
+"""
+import argparse
+import json
+import os
+import shutil
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+_HEADER = struct.Struct("<IIQ")
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+LOCK_NAME = "lock"
+
+# Операции журнала
+DRIVERS = "drivers"
+LICENSES = "licenses"
+ABORT = "abort"  # транзакция с указанными номерами откатилась
+REMOVE = "remove"  # удалены [GUID, номер ВУ] (пустой номер — водитель со всеми ВУ), см. sync.py
+LICENSE_PHOTOS = "license_photos"  # новые фото ВУ [GUID, номер ВУ, photo_path], см. photo_store.py
+
+Record = namedtuple("Record", "seq op at actor items")
+
+
+class JournalBusyError(OSError):
+    """Журнал уже открыт другим процессом (или другим объектом Journal этого процесса)."""
+
+
+def _lock(f):
+    # Блокировка снимается при закрытии файла, в том числе при завершении процесса
+    if os.name == "nt":
+        import msvcrt
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def journal_path(db_path):
+    return db_path + ".journal"
+
+
+def snapshot_path(db_path):
+    return db_path + ".snapshot"
+
+
+def _segment_name(first_seq):
+    return f"{first_seq:020d}.log"
+
+
+def _first_seq(path):
+    return int(os.path.basename(path)[:-4])
+
+
+def _read_segment(path):
+    """Генератор (конец записи, Record) по целым записям сегмента."""
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, checksum, seq = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload, zlib.crc32(data[offset + 8:start])) != checksum:
+            return
+        body = json.loads(payload)
+        offset = start + length
+        yield offset, Record(seq, body["op"], body["at"], body.get("actor"), body["items"])
+
+
+class Journal:
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.archive = os.path.join(directory, "archive")
+        self.segment_bytes = segment_bytes
+        os.makedirs(self.archive, exist_ok=True)
+        self.lock_file = open(os.path.join(directory, LOCK_NAME), "a+b")
+        try:
+            _lock(self.lock_file)
+        except OSError:
+            self.lock_file.close()
+            raise JournalBusyError(
+                f"Журнал {directory} уже открыт другим процессом. Закройте его или работайте через сервис реестра."
+            )
+        # Кто вносит изменения (логин инспектора), записывается в каждую запись.
+        # Сервис задает логин для потока, выполняющего запрос (acting)
+        self.actor = None
+        self.local = threading.local()
+        self.condition = threading.Condition()
+        # Файл сегмента: запись группы и смена сегмента
+        self.file_lock = threading.Lock()
+        self.pending = []
+        self.last_seq = 0
+        self.durable_seq = 0
+        self.groups = 0
+        self.error = None
+        self.closed = False
+        self._open_tail()
+        self.flusher = threading.Thread(target=self._flush_loop, name="journal", daemon=True)
+        self.flusher.start()
+
+    def segments(self, archived=False):
+        """Пути сегментов по возрастанию номеров; с archived=True — сначала архивные."""
+        directories = [self.archive, self.directory] if archived else [self.directory]
+        paths = []
+        for directory in directories:
+            paths.extend(sorted(
+                os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".log")
+            ))
+        return paths
+
+    def _open_tail(self):
+        # Последний сегмент проверяется целиком, оборванная запись отрезается
+        segments = self.segments(archived=True)
+        path = None
+        self.file_size = 0
+        if segments:
+            tail = segments[-1]
+            size = 0
+            self.last_seq = _first_seq(tail) - 1
+            for size, record in _read_segment(tail):
+                self.last_seq = record.seq
+            if size != os.path.getsize(tail):
+                with open(tail, "r+b") as f:
+                    f.truncate(size)
+            if os.path.dirname(tail) == self.directory:
+                path, self.file_size = tail, size
+        if path is None:
+            path = os.path.join(self.directory, _segment_name(self.last_seq + 1))
+        self.file = open(path, "ab")
+        self.durable_seq = self.written_seq = self.last_seq
+
+    # --- Запись ---
+
+    @contextmanager
+    def acting(self, login):
+        """Записи этого потока внутри блока получают actor=login."""
+        previous = getattr(self.local, "actor", None)
+        self.local.actor = login
+        try:
+            yield
+        finally:
+            self.local.actor = previous
+
+    def append(self, op, items):
+        """Поставить запись в очередь на диск. Возвращает ее номер; дождаться — wait()."""
+        with self.condition:
+            if self.error is not None:
+                raise OSError(f"Журнал недоступен: {self.error}")
+            self.last_seq += 1
+            seq = self.last_seq
+            actor = getattr(self.local, "actor", None) or self.actor
+            payload = json.dumps(
+                {"op": op, "at": datetime.now().isoformat(timespec="milliseconds"), "actor": actor,
+                 "items": items},
+                ensure_ascii=False, separators=(",", ":"),
+            ).encode("utf-8")
+            head = struct.pack("<Q", seq)
+            self.pending.append(
+                struct.pack("<II", len(payload), zlib.crc32(payload, zlib.crc32(head))) + head + payload
+            )
+            self.condition.notify_all()
+        return seq
+
+    def wait(self, seq):
+        """Дождаться, пока запись seq окажется на диске."""
+        with self.condition:
+            while self.durable_seq < seq and self.error is None:
+                self.condition.wait()
+            if self.durable_seq < seq:
+                raise OSError(f"Журнал недоступен: {self.error}")
+
+    def _flush_loop(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                group = self.pending
+                self.pending = []
+                last_seq = self.last_seq
+            # Пока идет fsync, новые записи копятся для следующей группы
+            try:
+                with self.file_lock:
+                    self.file.write(b"".join(group))
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                    self.file_size += sum(len(record) for record in group)
+                    self.written_seq = last_seq
+                    if self.file_size >= self.segment_bytes:
+                        self._rotate(last_seq + 1)
+            except OSError as e:
+                with self.condition:
+                    self.error = e
+                    self.condition.notify_all()
+                return
+            with self.condition:
+                self.durable_seq = last_seq
+                self.groups += 1
+                self.condition.notify_all()
+
+    def _rotate(self, first_seq):
+        self.file.close()
+        self.file = open(os.path.join(self.directory, _segment_name(first_seq)), "ab")
+        self.file_size = 0
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.flusher.join()
+        with self.file_lock:
+            self.file.close()
+        self.lock_file.close()
+
+    # --- Чтение ---
+
+    def records(self, after_seq=0, archived=False):
+        segments = self.segments(archived)
+        for number, path in enumerate(segments):
+            # Сегмент целиком до after_seq пропускается без чтения
+            if number + 1 < len(segments) and _first_seq(segments[number + 1]) <= after_seq + 1:
+                continue
+            for _, record in _read_segment(path):
+                if record.seq > after_seq:
+                    yield record
+
+    # --- Сжатие ---
+
+    def archive_until(self, seq):
+        """Перенести в архив сегменты, все записи которых не новее seq."""
+        self.wait(seq)
+        # Текущий сегмент закрывается, чтобы его тоже можно было перенести.
+        # Номер нового сегмента — следующий за уже записанными в файл
+        with self.file_lock:
+            if _first_seq(self.file.name) <= seq:
+                self._rotate(self.written_seq + 1)
+        segments = self.segments()
+        moved = 0
+        for number, path in enumerate(segments[:-1]):
+            if _first_seq(segments[number + 1]) - 1 <= seq:
+                shutil.move(path, os.path.join(self.archive, os.path.basename(path)))
+                moved += 1
+        return moved
+
+
+# --- Восстановление и сжатие ---
+
+def recover(store, journal):
+    """Согласовать базу с журналом после сбоя. Возвращает (применено записей, дописано в журнал)."""
+    state = store.journal_state()
+    applied = store.applied_seqs(state)
+    # Отметка об откате пишется после откаченной записи, поэтому собирается заранее
+    aborted = set()
+    for record in journal.records(state, archived=True):
+        if record.op == ABORT:
+            aborted.update(record.items)
+    replayed = 0
+    for record in journal.records(state, archived=True):
+        if record.op == ABORT or record.seq in applied or record.seq in aborted:
+            continue
+        store.replay(record)
+        replayed += 1
+    # Изменения, зафиксированные в базе, но не дошедшие до журнала
+    orphans = [(seq, op, keys) for seq, op, keys in store.applied_entries(journal.durable_seq)]
+    for seq, op, keys in orphans:
+        store.rejournal(seq, op, keys)
+    return replayed, len(orphans)
+
+
+def compact(store, journal, db_path):
+    """Снимок базы и перенос в архив сегментов, которые он покрывает. Возвращает номер снимка."""
+    seq = store.mark_snapshot(journal)
+    temporary = snapshot_path(db_path) + ".tmp"
+    store.backup(temporary)
+    os.replace(temporary, snapshot_path(db_path))
+    journal.archive_until(seq)
+    return seq
+
+
+def history(journal, driver_id):
+    """Все записи журнала (включая архив) о водителе и его ВУ."""
+    for record in journal.records(archived=True):
+        if record.op in (DRIVERS, LICENSES):
+            for item_id, data in record.items:
+                if item_id == driver_id:
+                    yield record, data
+        elif record.op == REMOVE:
+            for item_id, license_number in record.items:
+                if item_id == driver_id:
+                    yield record, {"license_number": license_number}
+        elif record.op == LICENSE_PHOTOS:
+            for item_id, license_number, photo_path in record.items:
+                if item_id == driver_id:
+                    yield record, {"license_number": license_number, "photo_path": photo_path}
+
+
+def main(argv=None):
+    from storage import DB_PATH, DriverStore
+
+    parser = argparse.ArgumentParser(description="Журнал изменений реестра")
+    parser.add_argument("--db", default=DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    show = commands.add_parser("history", help="История изменений водителя")
+    show.add_argument("driver_id")
+    commands.add_parser("verify", help="Проверить контрольные суммы и согласовать базу с журналом")
+    commands.add_parser("compact", help="Снимок базы и перенос старых сегментов в архив")
+    commands.add_parser("restore", help="Восстановить базу из снимка и журнала")
+    args = parser.parse_args(argv)
+
+    if args.command == "restore":
+        if not os.path.exists(snapshot_path(args.db)):
+            parser.error("снимок базы не найден")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.replace(args.db + suffix, args.db + suffix + ".broken")
+        shutil.copyfile(snapshot_path(args.db), args.db)
+
+    started = time.perf_counter()
+    try:
+        journal = Journal(journal_path(args.db))
+    except JournalBusyError as e:
+        print(e, file=sys.stderr)
+        return 1
+    store = DriverStore(args.db, journal=journal)
+    try:
+        if args.command == "history":
+            for record, data in history(journal, args.driver_id):
+                print(record.seq, record.at, record.actor or "-", record.op, json.dumps(data, ensure_ascii=False))
+        elif args.command == "compact":
+            print(f"Снимок на записи {compact(store, journal, args.db)}")
+        else:
+            # verify и restore: DriverStore уже согласовал базу при открытии
+            count = sum(1 for _ in journal.records(archived=True))
+            print(f"Записей в журнале: {count}, последняя: {journal.last_seq}")
+            print(f"Применено при открытии: {store.recovered[0]}, дописано в журнал: {store.recovered[1]}")
+    finally:
+        store.close()
+        journal.close()
+    print(f"Время: {time.perf_counter() - started:.2f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
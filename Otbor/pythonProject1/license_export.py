@@ -0,0 +1,86 @@
+"""Потоковая выгрузка ВУ по сроку действия для рассылки уведомлений.
+
+Пример:
+    python license_export.py expiring --from 01.02.2025 --to 28.02.2025 --out expiring.csv
+    python license_export.py invalid --out invalid.jsonl --columns driver_id,license_number,phone
+
+Строки идут страницами по индексу срока действия, в памяти одновременно
+находится одна страница. Выгрузка только driver_id и license_number читает
+один покрывающий индекс; контакты водителя требуют обращения к таблице drivers.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+
+from dates import UNKNOWN_DAY, format_day, parse_day, today
+from storage import DB_PATH, EXPIRY_COLUMNS, EXPIRY_KEY_COLUMNS, DriverStore
+
+PAGE_SIZE = 20000
+
+
+def export(rows, columns, path):
+    """Записать строки (id, expiry_day, *columns) в CSV или JSONL. Возвращает число строк."""
+    header = ("expiry",) + tuple(columns)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            for row in rows:
+                f.write(json.dumps(dict(zip(header, (format_day(row[1]),) + row[2:])), ensure_ascii=False))
+                f.write("\n")
+                count += 1
+        else:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow((format_day(row[1]),) + row[2:])
+                count += 1
+    return count
+
+
+def _day(text, parser):
+    day = parse_day(text)
+    if day == UNKNOWN_DAY:
+        parser.error(f"неверная дата: {text}")
+    return day
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка ВУ с истекающим или истекшим сроком действия")
+    parser.add_argument("kind", choices=("expiring", "invalid"))
+    parser.add_argument("--from", dest="first", help="Начало периода (expiring)")
+    parser.add_argument("--to", dest="last", help="Конец периода включительно (expiring)")
+    parser.add_argument("--on", help="Дата проверки действительности (invalid), по умолчанию сегодня")
+    parser.add_argument("--columns", default=",".join(EXPIRY_KEY_COLUMNS),
+                        help="Столбцы через запятую: " + ",".join(EXPIRY_COLUMNS))
+    parser.add_argument("--out", required=True, help="Файл .csv или .jsonl")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args(argv)
+
+    columns = tuple(filter(None, args.columns.split(",")))
+    unknown = set(columns) - set(EXPIRY_COLUMNS)
+    if unknown:
+        parser.error(f"неизвестные столбцы: {', '.join(sorted(unknown))}")
+    if args.kind == "expiring":
+        if not args.first or not args.last:
+            parser.error("для expiring нужны --from и --to")
+        first, last = _day(args.first, parser), _day(args.last, parser)
+    else:
+        # Недействительные: срок истек до даты проверки или не указан
+        first, last = UNKNOWN_DAY, (_day(args.on, parser) if args.on else today()) - 1
+
+    started = time.perf_counter()
+    store = DriverStore(args.db)
+    try:
+        count = export(store.iter_licenses_by_expiry(first, last, columns, PAGE_SIZE), columns, args.out)
+    finally:
+        store.close()
+    seconds = time.perf_counter() - started
+    print(f"Выгружено: {count} ({args.out})")
+    print(f"Время: {seconds:.2f} с, {int(count / seconds) if seconds else count} строк/с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Кеш чтения с вытеснением давно не использованных записей (LRU) и сроком жизни (TTL).
+
+При промахе значение загружается переданной функцией (read-through), при
+записи соответствующие ключи удаляются (invalidate), поэтому повторные
+чтения в сеансе инспектора не обращаются к базе или сервису. Изменения,
+внесенные другим процессом, видны не позже чем через ttl секунд.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LookupCache:
+    def __init__(self, max_items=10000, ttl=300.0):
+        self.max_items = max_items
+        self.ttl = ttl
+        # Ключ -> (момент устаревания, значение); порядок — от давно читанных к недавним
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        # Растет при каждой инвалидации: значение, загрузка которого началась
+        # до записи, в кеш не попадает
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key, load):
+        """Значение из кеша или load(key). None от load не кешируется, исключения пробрасываются."""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.items.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self.items[key]
+                self.expired += 1
+            self.misses += 1
+            version = self.version
+        value = load(key)
+        if value is not None:
+            self.put(key, value, version)
+        return value
+
+    def put(self, key, value, version=None):
+        with self.lock:
+            if version is not None and version != self.version:
+                return
+            self.items[key] = (time.monotonic() + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys):
+        with self.lock:
+            self.version += 1
+            for key in keys:
+                if self.items.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            self.items.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.items),
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,352 @@
+"""Замеры времени горячих путей: гистограммы задержек и выгрузка для Prometheus или в JSON.
+
+Замеры выключены, пока не задана переменная SESSIA_METRICS=1; выключенный
+замер — одна проверка флага. Включенный стоит 0,3-0,4 мкс на вызов
+(python metrics.py bench), поэтому замеряются только операции от ~50 мкс,
+где это меньше 1%: слоты окон, запись, поиск и вход через реестр, запросы
+к сервису. Быстрые чтения (карточка из кеша, владелец номера) отдельно не
+замеряются, их время видно по запросам к сервису.
+
+    SESSIA_METRICS=1 SESSIA_METRICS_PORT=9464 python hash.py      # http://127.0.0.1:9464/metrics
+    SESSIA_METRICS=1 SESSIA_METRICS_JSON=metrics.json python hash.py
+
+Сервис отдает те же данные по GET /metrics. Зависания GUI-потока отмечает
+stall_watchdog.py.
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from threading import get_ident
+
+ENABLED_ENV = "SESSIA_METRICS"
+PORT_ENV = "SESSIA_METRICS_PORT"
+JSON_ENV = "SESSIA_METRICS_JSON"
+INTERVAL_ENV = "SESSIA_METRICS_INTERVAL"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Корзина k — время до 2**k мкс (точнее, 1024 * 2**k нс): от 1 мкс до ~34 с.
+# Номер корзины — длина числа в битах, без поиска по границам
+BUCKET_COUNT = 26
+BUCKET_BOUNDS = tuple((1024 << k) / 1e9 for k in range(BUCKET_COUNT))
+# Флаг кода функции с *args (inspect.CO_VARARGS; inspect не импортируется ради запуска окон)
+_CO_VARARGS = 0x04
+# Событий каждого вида, которые хранятся с подробностями (стек зависания и т. п.)
+EVENTS_KEPT = 20
+
+
+class Histogram:
+    """Гистограмма времени одной операции.
+
+    Каждый поток пишет в свою строку счетчиков, поэтому замер обходится без
+    блокировки; строки складываются при выгрузке.
+    """
+
+    __slots__ = ("shards",)
+
+    def __init__(self):
+        # Поток -> [корзины..., сумма нс, максимум нс]; последняя корзина — дольше BUCKET_BOUNDS[-1]
+        self.shards = {}
+
+    def observe_ns(self, elapsed):
+        shard = self.shards.get(get_ident())
+        if shard is None:
+            shard = self.shards[get_ident()] = [0] * (BUCKET_COUNT + 3)
+        index = (elapsed >> 10).bit_length()
+        shard[index if index < BUCKET_COUNT else BUCKET_COUNT] += 1
+        shard[-2] += elapsed
+        if elapsed > shard[-1]:
+            shard[-1] = elapsed
+
+    def snapshot(self):
+        counts = [0] * (BUCKET_COUNT + 1)
+        total_ns = max_ns = 0
+        for shard in tuple(self.shards.values()):
+            for index in range(BUCKET_COUNT + 1):
+                counts[index] += shard[index]
+            total_ns += shard[-2]
+            max_ns = max(max_ns, shard[-1])
+        count = sum(counts)
+        return {
+            "count": count,
+            "sum_seconds": total_ns / 1e9,
+            "max_seconds": max_ns / 1e9,
+            "p50_seconds": _quantile(counts, count, 0.5, max_ns),
+            "p95_seconds": _quantile(counts, count, 0.95, max_ns),
+            "p99_seconds": _quantile(counts, count, 0.99, max_ns),
+            "buckets": counts,
+        }
+
+
+def _quantile(counts, count, share, max_ns):
+    """Верхняя граница корзины, в которую попадает доля share замеров (секунды)."""
+    rank = share * count
+    seen = 0
+    for index, bucket in enumerate(counts):
+        seen += bucket
+        if bucket and seen >= rank:
+            return BUCKET_BOUNDS[index] if index < BUCKET_COUNT else max_ns / 1e9
+    return 0.0
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe_ns(time.perf_counter_ns() - self.started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Гистограммы времени по операциям и счетчики событий одного процесса."""
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+        self.event_counts = {}
+        self.events = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def histogram(self, operation):
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(operation, Histogram())
+        return histogram
+
+    def observe(self, operation, seconds):
+        if self.enabled:
+            self.histogram(operation).observe_ns(int(seconds * 1e9))
+
+    def timer(self, operation):
+        """Контекст замера: with metrics.timer("service.get_driver"): ..."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(operation))
+
+    def event(self, kind, details=None):
+        """Счетчик событий вида kind; details последних EVENTS_KEPT событий хранятся для выгрузки в JSON."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.event_counts[kind] = self.event_counts.get(kind, 0) + 1
+            if details is not None:
+                self.events.setdefault(kind, deque(maxlen=EVENTS_KEPT)).append(details)
+
+    def snapshot(self):
+        with self.lock:
+            histograms = dict(self.histograms)
+            event_counts = dict(self.event_counts)
+            events = {kind: list(items) for kind, items in self.events.items()}
+        return {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "bucket_bounds_seconds": BUCKET_BOUNDS,
+            "operations": {operation: histograms[operation].snapshot() for operation in sorted(histograms)},
+            "event_counts": event_counts,
+            "events": events,
+        }
+
+    def prometheus_text(self):
+        """Текстовый формат Prometheus 0.0.4."""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP sessia_operation_seconds Время слотов окон, операций реестра и запросов к сервису.",
+            "# TYPE sessia_operation_seconds histogram",
+        ]
+        for operation, data in snapshot["operations"].items():
+            label = f'operation="{_escape(operation)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKET_BOUNDS, data["buckets"]):
+                cumulative += count
+                lines.append(f'sessia_operation_seconds_bucket{{{label},le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'sessia_operation_seconds_bucket{{{label},le="+Inf"}} {data["count"]}')
+            lines.append(f"sessia_operation_seconds_sum{{{label}}} {data['sum_seconds']:.9f}")
+            lines.append(f"sessia_operation_seconds_count{{{label}}} {data['count']}")
+        lines.append("# HELP sessia_events_total События: зависания GUI-потока и т. п.")
+        lines.append("# TYPE sessia_events_total counter")
+        for kind, count in sorted(snapshot["event_counts"].items()):
+            lines.append(f'sessia_events_total{{kind="{_escape(kind)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path):
+        """Снимок в файл; файл заменяется целиком, читатель не увидит половину записи."""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(temporary, path)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Общие замеры процесса
+metrics = Metrics()
+
+
+def timed(operation):
+    """Декоратор: время каждого вызова функции в гистограмму operation."""
+    def decorator(function):
+        histogram = metrics.histogram(operation)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe_ns(time.perf_counter_ns() - started)
+        return wrapper
+    return decorator
+
+
+def timed_slot(operation):
+    """timed для слотов Qt.
+
+    Сигнал передает слоту свои аргументы (clicked — флаг checked). PyQt сам
+    отбрасывает лишние, если слот их не принимает, но у обертки (*args) это
+    не получается, поэтому лишние аргументы отбрасывает она.
+    """
+    def decorator(function):
+        code = function.__code__
+        accepted = None if code.co_flags & _CO_VARARGS else code.co_argcount
+        measured = timed(operation)(function)
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            return measured(*args[:accepted])
+        return wrapper
+    return decorator
+
+
+def serve(port, host="127.0.0.1"):
+    """Локальная точка /metrics (Prometheus) и /metrics.json в фоновом потоке."""
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = metrics.prometheus_text().encode("utf-8")
+                content_type = PROMETHEUS_CONTENT_TYPE
+            elif self.path == "/metrics.json":
+                body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+                content_type = "application/json; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def dump_periodically(path, interval=30.0):
+    """Снимок в JSON каждые interval секунд и при выходе из процесса."""
+    import atexit
+
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            metrics.dump_json(path)
+
+    def final_dump():
+        stop.set()
+        metrics.dump_json(path)
+
+    threading.Thread(target=loop, name="metrics-dump", daemon=True).start()
+    atexit.register(final_dump)
+    return stop
+
+
+def start_from_env():
+    """Включить замеры и выгрузку по переменным окружения. True, если замеры включены."""
+    if os.environ.get(ENABLED_ENV, "") in ("", "0"):
+        return False
+    metrics.enabled = True
+    port = os.environ.get(PORT_ENV)
+    if port:
+        try:
+            serve(int(port))
+        except OSError as e:
+            print(f"Не удалось открыть порт замеров {port}: {e}", file=sys.stderr)
+    path = os.environ.get(JSON_ENV)
+    if path:
+        dump_periodically(path, float(os.environ.get(INTERVAL_ENV) or 30.0))
+    return True
+
+
+# --- Замер накладных расходов ---
+
+def benchmark(calls=1000000):
+    def operation():
+        pass
+
+    measured = timed("bench.operation")(operation)
+    results = {}
+    for enabled in (False, True):
+        metrics.enabled = enabled
+        started = time.perf_counter()
+        for _ in range(calls):
+            measured()
+        results[enabled] = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(calls):
+        operation()
+    bare = time.perf_counter() - started
+    metrics.enabled = False
+    for enabled, title in ((False, "выключен"), (True, "включен")):
+        print(f"Замер {title}: {(results[enabled] - bare) / calls * 1e9:.0f} нс на вызов")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры времени горячих путей")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench = commands.add_parser("bench", help="Накладные расходы замера на вызов")
+    bench.add_argument("--calls", type=int, default=1000000)
+    args = parser.parse_args(argv)
+    benchmark(args.calls)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""Нечеткий поиск водителей по ФИО.
+
+Имена приводятся к одному написанию: нижний регистр, ё -> е, латиница
+переводится в кириллицу (Ivanov, Iwanow -> иванов), остаются только буквы.
+Для каждого поля ФИО хранится словарь различных имен с триграммным
+индексом: запрос находит в словаре имена на малом расстоянии
+редактирования (опечатки, пропущенные и переставленные буквы), а водители
+берутся из списков водителей этих имен. Различных имен намного меньше, чем
+водителей, поэтому время запроса почти не зависит от размера реестра.
+
+Пример:
+    python name_index.py search "Иванов Петр" --db drivers.db
+    python name_index.py bench --drivers 1000000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from array import array
+from collections import Counter
+from heapq import heappush, heapreplace
+from operator import itemgetter
+
+NAME_FIELDS = ("last_name", "first_name", "middle_name")
+
+# Транслитерация: сначала сочетания букв, затем одиночные буквы
+_LATIN = {
+    "shch": "щ", "sch": "щ", "zh": "ж", "kh": "х", "ts": "ц", "tc": "ц", "ch": "ч", "sh": "ш",
+    "yu": "ю", "iu": "ю", "ya": "я", "ia": "я", "yo": "е", "ye": "е",
+    "a": "а", "b": "б", "c": "к", "d": "д", "e": "е", "f": "ф", "g": "г", "h": "х", "i": "и", "j": "й",
+    "k": "к", "l": "л", "m": "м", "n": "н", "o": "о", "p": "п", "q": "к", "r": "р", "s": "с", "t": "т",
+    "u": "у", "v": "в", "w": "в", "x": "кс", "y": "ы", "z": "з",
+}
+_LATIN_RE = re.compile("|".join(sorted(_LATIN, key=len, reverse=True)))
+# y после гласной — й (Sergey, Dmitriy)
+_SHORT_I_RE = re.compile("(?<=[аеиоуыэюя])ы")
+_NOT_LETTER_RE = re.compile("[^а-я]")
+
+_PAD = "^^{}$$"
+
+
+def normalize_name(text):
+    """Имя в едином написании для сравнения: 'Семёнов', 'Semenov' -> 'семенов'."""
+    text = text.lower().replace("ё", "е")
+    text = _LATIN_RE.sub(lambda match: _LATIN[match.group()], text)
+    return _NOT_LETTER_RE.sub("", _SHORT_I_RE.sub("й", text))
+
+
+def split_full_name(text):
+    """'Иванов Петр Сергеевич' -> (фамилия, имя, отчество); недостающие части пустые."""
+    parts = text.split()[:3]
+    return tuple(parts + [""] * (3 - len(parts)))
+
+
+def max_distance(word):
+    """Допустимое число правок: короткие имена — только точно или с одной опечаткой."""
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def _trigrams(word):
+    padded = _PAD.format(word)
+    return {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Расстояние Дамерау — Левенштейна (с перестановкой соседних букв); limit + 1, если больше limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Общие начало и конец не влияют на расстояние, у похожих имен они длинные
+    start = 0
+    shortest = min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    tail = 0
+    while tail < shortest - start and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+    a = a[start:len(a) - tail]
+    b = b[start:len(b) - tail]
+    if not a or not b:
+        return len(a) + len(b) if len(a) + len(b) <= limit else limit + 1
+    # Считается только полоса |i - j| <= limit, ячейки вне ее больше limit
+    big = limit + 1
+    before = None
+    previous = [j if j <= limit else big for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        char = a[i - 1]
+        current = [big] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        best = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            other = b[j - 1]
+            value = previous[j - 1] + (char != other)
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == other and before[j - 2] + 1 < value:
+                value = before[j - 2] + 1
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return big
+        before, previous = previous, current
+    return min(previous[-1], big)
+
+
+class _Field:
+    """Словарь различных имен одного поля ФИО и водители каждого имени."""
+
+    def __init__(self):
+        self.words = [""]  # номер имени -> имя; 0 — поле не заполнено
+        self.word_ids = {"": 0}
+        self.raw_ids = {}  # строка из базы -> номер имени (нормализация один раз на строку)
+        self.grams = {}  # триграмма -> array номеров имен
+        self.drivers = [array("I")]  # номер имени -> array id водителей
+        self.by_driver = array("I")  # id водителя -> номер имени
+
+    def word_id(self, raw):
+        word_id = self.raw_ids.get(raw)
+        if word_id is None:
+            word = normalize_name(raw)
+            word_id = self.word_ids.get(word)
+            if word_id is None:
+                word_id = len(self.words)
+                self.words.append(word)
+                self.word_ids[word] = word_id
+                self.drivers.append(array("I"))
+                for gram in _trigrams(word):
+                    postings = self.grams.get(gram)
+                    if postings is None:
+                        self.grams[gram] = array("I", (word_id,))
+                    else:
+                        postings.append(word_id)
+            self.raw_ids[raw] = word_id
+        return word_id
+
+    def set(self, driver_no, raw):
+        word_id = self.word_id(raw or "")
+        if driver_no >= len(self.by_driver):
+            self.by_driver.frombytes(bytes(4 * (driver_no + 1 - len(self.by_driver))))
+        previous = self.by_driver[driver_no]
+        if previous == word_id:
+            return
+        if previous:
+            self.drivers[previous].remove(driver_no)
+        if word_id:
+            self.drivers[word_id].append(driver_no)
+        self.by_driver[driver_no] = word_id
+
+    def match(self, word, limit):
+        """{номер имени: расстояние не больше limit} для имен словаря, близких к word."""
+        grams = _trigrams(word)
+        counts = Counter()
+        for gram in grams:
+            postings = self.grams.get(gram)
+            if postings is not None:
+                counts.update(postings)
+        # Правка меняет не больше трех триграмм, перестановка соседних букв — четырех
+        need = max(1, len(grams) - 4 * limit)
+        words = self.words
+        size = len(word)
+        found = {}
+        for word_id in [word_id for word_id, count in counts.items() if count >= need]:
+            other = words[word_id]
+            if abs(len(other) - size) <= limit:
+                distance = edit_distance(word, other, limit)
+                if distance <= limit:
+                    found[word_id] = distance
+        return found
+
+
+class NameIndex:
+    """ФИО водителей по id записи с нечетким поиском лучших совпадений."""
+
+    def __init__(self):
+        self.watermark = 0  # наибольший id, дочитанный из базы
+        self.fields = [_Field() for _ in NAME_FIELDS]
+
+    def add(self, driver_no, last_name, first_name, middle_name):
+        """Внести или обновить ФИО водителя."""
+        for field, raw in zip(self.fields, (last_name, first_name, middle_name)):
+            field.set(driver_no, raw)
+
+    def search(self, last_name="", first_name="", middle_name="", limit=10):
+        """Пары (оценка, id) по возрастанию оценки — суммы расстояний по заполненным полям запроса.
+
+        Сначала ищутся имена не дальше одной правки: у остальных водителей
+        оценка не меньше 2, и если найдено limit водителей с оценкой до 1,
+        поиск с двумя правками (он медленнее) не нужен.
+        """
+        query = []
+        for field, raw in zip(self.fields, (last_name, first_name, middle_name)):
+            word = normalize_name(raw or "")
+            if word:
+                query.append((field, word, max_distance(word)))
+        if not query or limit <= 0:
+            return []
+        result = self._search([(field, word, min(distance, 1)) for field, word, distance in query], limit)
+        if all(distance <= 1 for _, _, distance in query) or (len(result) == limit and result[-1][0] < 2):
+            return result
+        return self._search(query, limit)
+
+    def _search(self, query, limit):
+        matches = []
+        for field, word, distance in query:
+            found = field.match(word, distance)
+            if not found:
+                return []
+            matches.append((field, found))
+        # Перебираются водители поля с самыми короткими списками, остальные поля
+        # проверяются по номеру имени водителя
+        matches.sort(key=lambda match: sum(len(match[0].drivers[word_id]) for word_id in match[1]))
+        (lead, lead_found), others = matches[0], matches[1:]
+        heap = []  # (-оценка, -id): в вершине худший из лучших
+        for word_id, distance in sorted(lead_found.items(), key=itemgetter(1)):
+            if len(heap) >= limit and distance > -heap[0][0]:
+                break
+            candidates = lead.drivers[word_id]
+            for field, found in others:
+                by_driver = field.by_driver
+                candidates = [driver_no for driver_no in candidates if by_driver[driver_no] in found]
+            for driver_no in candidates:
+                score = distance
+                for field, found in others:
+                    score += found[field.by_driver[driver_no]]
+                item = (-score, -driver_no)
+                if len(heap) < limit:
+                    heappush(heap, item)
+                elif item > heap[0]:
+                    heapreplace(heap, item)
+        return sorted((-score, -driver_no) for score, driver_no in heap)
+
+    def refresh(self, store, page_size=200000):
+        """Дочитать ФИО водителей, добавленных в базу после последнего обновления."""
+        added = 0
+        while True:
+            rows = store.full_names(self.watermark, page_size)
+            if not rows:
+                return added
+            for row in rows:
+                self.add(*row)
+            self.watermark = rows[-1][0]
+            added += len(rows)
+
+
+# --- Замеры ---
+
+_ROOTS = "бел вол гор зай кар кос куз лис мак мор нов пет рыб сем смир сок тар фед чер шув".split()
+_MIDDLES = "а о е и у".split()
+_ENDINGS = "ов ев ин ский енко ук ых".split()
+_FIRST_NAMES = (
+    "Александр", "Сергей", "Дмитрий", "Андрей", "Алексей", "Максим", "Иван", "Евгений", "Михаил", "Артём",
+    "Елена", "Ольга", "Наталья", "Татьяна", "Ирина", "Анна", "Юлия", "Мария", "Светлана", "Екатерина",
+)
+_CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "",
+    "э": "e", "ю": "yu", "я": "ya",
+}
+
+
+def _sample_last_name(generator):
+    # Составные фамилии дают десятки тысяч различных, частые корни — повторы
+    root = generator.choice(_ROOTS) + generator.choice(_MIDDLES) + generator.choice(_ROOTS)
+    return (root + generator.choice(_ENDINGS)).capitalize()
+
+
+def _typo(generator, text):
+    position = generator.randrange(1, len(text))
+    kind = generator.randrange(3)
+    if kind == 0:
+        return text[:position] + text[position + 1:]
+    if kind == 1:
+        return text[:position] + generator.choice("аеиоу") + text[position:]
+    return text[:position - 1] + text[position] + text[position - 1] + text[position + 1:]
+
+
+def _to_latin(text):
+    return "".join(_CYRILLIC_TO_LATIN.get(char, char) for char in text.lower()).capitalize()
+
+
+def benchmark(count, queries=1000, seed=1):
+    generator = random.Random(seed)
+    index = NameIndex()
+    names = []
+    started = time.perf_counter()
+    for number in range(1, count + 1):
+        first_name = generator.choice(_FIRST_NAMES)
+        middle_name = generator.choice(_FIRST_NAMES[:10]) + "ович"
+        last_name = _sample_last_name(generator)
+        index.add(number, last_name, first_name, middle_name)
+        names.append((last_name, first_name, middle_name))
+    last_names = len(index.fields[0].words) - 1
+    print(f"Водителей: {count}, различных фамилий: {last_names}, построение: {time.perf_counter() - started:.1f} с")
+
+    for title, change in (("точно", lambda text: text), ("с опечаткой", lambda text: _typo(generator, text)),
+                          ("латиницей", _to_latin)):
+        found = 0
+        elapsed = []
+        for _ in range(queries):
+            number = generator.randrange(count)
+            last_name, first_name, _ = names[number]
+            query = change(last_name), change(first_name)
+            started = time.perf_counter()
+            result = index.search(*query, limit=10)
+            elapsed.append(time.perf_counter() - started)
+            # Найден сам водитель или десять водителей, совпадающих с запросом не хуже него
+            expected = sum(edit_distance(normalize_name(text), normalize_name(name), 2)
+                           for text, name in zip(query, (last_name, first_name)))
+            found += any(driver_no == number + 1 for _, driver_no in result) or (
+                len(result) == 10 and result[-1][0] <= expected)
+        elapsed.sort()
+        print(f"Фамилия и имя {title}: медиана {elapsed[len(elapsed) // 2] * 1000:.2f} мс, "
+              f"95% {elapsed[int(len(elapsed) * 0.95)] * 1000:.2f} мс, найдено {found} из {queries}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нечеткий поиск водителей по ФИО")
+    commands = parser.add_subparsers(dest="command", required=True)
+    search = commands.add_parser("search", help="Найти водителей по ФИО")
+    search.add_argument("full_name", help="Фамилия [Имя [Отчество]]")
+    search.add_argument("--db", default=None)
+    search.add_argument("--limit", type=int, default=10)
+    bench = commands.add_parser("bench", help="Замеры на синтетических ФИО")
+    bench.add_argument("--drivers", type=int, default=1000000)
+    bench.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.drivers, seed=args.seed)
+        return 0
+    from registry import Registry
+    from storage import DB_PATH
+
+    registry = Registry(args.db or DB_PATH)
+    try:
+        started = time.perf_counter()
+        rows = registry.search_drivers(*split_full_name(args.full_name), limit=args.limit)
+        for row in rows:
+            print(row["score"], row["driver_id"], row["last_name"], row["first_name"], row["middle_name"])
+        print(f"Найдено: {len(rows)}, {(time.perf_counter() - started) * 1000:.1f} мс (с построением индекса)")
+    finally:
+        registry.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
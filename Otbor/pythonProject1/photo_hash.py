@@ -0,0 +1,307 @@
+"""Перцептивные хеши фотографий водителей и поиск похожих фото.
+
+dHash: фото уменьшается до 9x8 в оттенках серого, каждый из 64 битов
+показывает, светлее ли пиксель соседа справа. Пересжатие, уменьшение и
+смена формата меняют лишь несколько битов, поэтому одно и то же фото у
+двух водителей находится по малому расстоянию Хэмминга между хешами.
+
+Поиск по расстоянию — многоиндексное хеширование: хеш делится на 4 части
+по 16 бит, и если хеши отличаются не более чем на k битов, то хотя бы одна
+часть отличается не более чем на k // 4 битов. Кандидаты берутся из таблиц
+частей и проверяются полным сравнением.
+
+Пример:
+    python photo_hash.py scan /архив/фото --report similar.csv --workers 8
+    python photo_hash.py index --db drivers.db
+    python photo_hash.py bench --photos 1000000
+"""
+import argparse
+import csv
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtGui import QImage, QImageReader
+
+from photo_probe import iter_photos
+
+HASH_WIDTH = 8
+HASH_HEIGHT = 8
+HASH_MASK = (1 << 64) - 1
+
+# Фото с расстоянием не больше этого считаются одним и тем же снимком
+PHOTO_DISTANCE = 6
+
+# Перед уменьшением до 9x8 JPEG декодируется сразу в малый размер
+_DECODE_SIZE = QSize(48, 64)
+
+_PARTS = 4
+_PART_BITS = 64 // _PARTS
+_PART_MASK = (1 << _PART_BITS) - 1
+
+
+def dhash(file_path):
+    """64-битный dHash фото (0 <= хеш < 2**64)."""
+    reader = QImageReader(file_path)
+    reader.setAutoTransform(True)
+    if reader.size().isValid():
+        reader.setScaledSize(_DECODE_SIZE)
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Не удалось загрузить изображение: {reader.errorString()}")
+    # Сглаживающее масштабирование возвращает 32-битное изображение,
+    # поэтому перевод в оттенки серого — после него
+    image = image.scaled(
+        HASH_WIDTH + 1, HASH_HEIGHT, Qt.IgnoreAspectRatio, Qt.SmoothTransformation
+    ).convertToFormat(QImage.Format_Grayscale8)
+    line = image.bytesPerLine()
+    pixels = image.constBits().asstring(line * HASH_HEIGHT)
+    value = 0
+    for y in range(HASH_HEIGHT):
+        row = pixels[y * line:y * line + HASH_WIDTH + 1]
+        for x in range(HASH_WIDTH):
+            value = value << 1 | (row[x] < row[x + 1])
+    return value
+
+
+def hamming(a, b):
+    return ((a ^ b) & HASH_MASK).bit_count()
+
+
+def to_signed(value):
+    """Хеш для столбца INTEGER SQLite (знаковое 64-битное число)."""
+    value &= HASH_MASK
+    return value - (1 << 64) if value >> 63 else value
+
+
+def parse_hash(value):
+    """Хеш из числа или строки из 16 шестнадцатеричных цифр; None — хеша нет."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = int(value, 16)
+        except ValueError:
+            raise ValueError(f"Неверный хеш фото: {value}")
+    return value & HASH_MASK
+
+
+def format_hash(value):
+    return f"{value & HASH_MASK:016x}"
+
+
+def _parts(value):
+    return [(value >> (number * _PART_BITS)) & _PART_MASK for number in range(_PARTS)]
+
+
+def _neighbours(part, radius):
+    """Все 16-битные значения на расстоянии не больше radius от part."""
+    values = [part]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(_PART_BITS), distance):
+            flip = 0
+            for bit in bits:
+                flip |= 1 << bit
+            values.append(part ^ flip)
+    return values
+
+
+class PhotoHashIndex:
+    """Хеши фото по id записи с поиском всех хешей в пределах расстояния."""
+
+    def __init__(self):
+        self.watermark = 0  # наибольший id, дочитанный из базы
+        self.hashes = {}
+        self.tables = [{} for _ in range(_PARTS)]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, item_id, value):
+        value &= HASH_MASK
+        if item_id in self.hashes:
+            if self.hashes[item_id] == value:
+                return
+            self.discard(item_id)
+        self.hashes[item_id] = value
+        for table, part in zip(self.tables, _parts(value)):
+            bucket = table.get(part)
+            if bucket is None:
+                table[part] = [item_id]
+            else:
+                bucket.append(item_id)
+
+    def discard(self, item_id):
+        value = self.hashes.pop(item_id, None)
+        if value is None:
+            return
+        for table, part in zip(self.tables, _parts(value)):
+            bucket = table[part]
+            bucket.remove(item_id)
+            if not bucket:
+                del table[part]
+
+    def search(self, value, distance=PHOTO_DISTANCE):
+        """Пары (расстояние, id) по возрастанию расстояния."""
+        value &= HASH_MASK
+        radius = distance // _PARTS
+        hashes = self.hashes
+        found = {}
+        for table, part in zip(self.tables, _parts(value)):
+            for neighbour in _neighbours(part, radius):
+                for item_id in table.get(neighbour, ()):
+                    if item_id not in found:
+                        found[item_id] = (hashes[item_id] ^ value).bit_count()
+        return sorted((found_distance, item_id) for item_id, found_distance in found.items()
+                      if found_distance <= distance)
+
+    def refresh(self, store, page_size=200000):
+        """Дочитать хеши водителей, добавленных в базу после последнего обновления."""
+        added = 0
+        while True:
+            rows = store.photo_hashes(self.watermark, page_size)
+            if not rows:
+                return added
+            for item_id, value in rows:
+                self.add(item_id, value)
+            self.watermark = rows[-1][0]
+            added += len(rows)
+
+
+# --- Пакетный режим ---
+
+def _hash_one(file_path):
+    try:
+        return file_path, dhash(file_path), None
+    except (OSError, ValueError) as e:
+        return file_path, None, str(e)
+
+
+def hash_files(paths, workers=None):
+    """Генератор (путь, хеш или None, ошибка) по файлам, хеши считаются пулом процессов."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_hash_one, paths, chunksize=256)
+
+
+def scan_directory(directory, report_path, distance=PHOTO_DISTANCE, workers=None):
+    """Найти в архиве пары похожих фото. Возвращает (фото, ошибок, пар)."""
+    index = PhotoHashIndex()
+    paths = []
+    failed = pairs = 0
+    with open(report_path, "w", encoding="utf-8", newline="") as report:
+        writer = csv.writer(report)
+        writer.writerow(["path", "similar_path", "distance"])
+        for file_path, value, error in hash_files(iter_photos(directory), workers):
+            if value is None:
+                failed += 1
+                writer.writerow([file_path, "", error])
+                continue
+            # Каждое фото сравнивается с уже просмотренными, пара выводится один раз
+            for found_distance, number in index.search(value, distance):
+                writer.writerow([paths[number], file_path, found_distance])
+                pairs += 1
+            index.add(len(paths), value)
+            paths.append(file_path)
+    return len(paths), failed, pairs
+
+
+def fill_missing(store, photo_dir, workers=None, page_size=5000):
+    """Посчитать хеши фото водителей, у которых их еще нет. Возвращает (посчитано, ошибок).
+
+    Ключи фото в photo_path разрешаются в папке хранилища photo_dir.
+    """
+    from photo_store import photo_file
+
+    done = failed = 0
+    after = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = store.drivers_without_photo_hash(after, page_size)
+            if not rows:
+                return done, failed
+            updates = []
+            results = pool.map(_hash_one, [photo_file(photo_dir, photo_path) for _, photo_path in rows], chunksize=64)
+            for (item_id, _), (_, value, _) in zip(rows, results):
+                if value is None:
+                    failed += 1
+                else:
+                    updates.append((to_signed(value), item_id))
+            store.set_photo_hashes(updates)
+            done += len(updates)
+            after = rows[-1][0]
+
+
+# --- Замеры ---
+
+def benchmark(count, distance=PHOTO_DISTANCE, queries=1000, seed=1):
+    generator = random.Random(seed)
+    index = PhotoHashIndex()
+    started = time.perf_counter()
+    for number in range(count):
+        index.add(number, generator.getrandbits(64))
+    print(f"Хешей: {count}, построение: {time.perf_counter() - started:.1f} с")
+
+    # Запросы — хеши из индекса с несколькими измененными битами (пересжатые копии)
+    targets = [generator.randrange(count) for _ in range(queries)]
+    started = time.perf_counter()
+    hits = 0
+    for number in targets:
+        value = index.hashes[number]
+        for bit in generator.sample(range(64), distance):
+            value ^= 1 << bit
+        hits += any(item_id == number for _, item_id in index.search(value, distance))
+    elapsed = time.perf_counter() - started
+    print(f"Поиск на расстоянии {distance}: {elapsed / queries * 1000:.2f} мс на запрос, найдено {hits} из {queries}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Поиск похожих фотографий водителей")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", help="Найти похожие фото в папке")
+    scan.add_argument("directory")
+    scan.add_argument("--report", default="similar_photos.csv")
+    scan.add_argument("--distance", type=int, default=PHOTO_DISTANCE)
+    scan.add_argument("--workers", type=int, default=None)
+    index = commands.add_parser("index", help="Посчитать недостающие хеши фото водителей в базе")
+    index.add_argument("--db", default=None)
+    index.add_argument("--workers", type=int, default=None)
+    bench = commands.add_parser("bench", help="Замеры поиска на случайных хешах")
+    bench.add_argument("--photos", type=int, default=1000000)
+    bench.add_argument("--distance", type=int, default=PHOTO_DISTANCE)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == "bench":
+        benchmark(args.photos, args.distance)
+        return 0
+    if args.command == "scan":
+        photos, failed, pairs = scan_directory(args.directory, args.report, args.distance, args.workers)
+        print(f"Фото: {photos}, не прочитано: {failed}")
+        print(f"Пар похожих фото: {pairs} (см. {args.report})")
+    else:
+        from journal import Journal, JournalBusyError, journal_path
+        from photo_store import store_path
+        from storage import DB_PATH, DriverStore
+
+        db_path = args.db or DB_PATH
+        try:
+            journal = Journal(journal_path(db_path))
+        except JournalBusyError as e:
+            print(e, file=sys.stderr)
+            return 1
+        store = DriverStore(db_path, journal=journal)
+        try:
+            done, failed = fill_missing(store, store_path(db_path), args.workers)
+        finally:
+            store.close()
+            journal.close()
+        print(f"Посчитано хешей: {done}, не прочитано фото: {failed}")
+    print(f"Время: {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
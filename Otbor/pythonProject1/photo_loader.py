@@ -0,0 +1,163 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+from photo_hash import dhash
+from photo_probe import check_photo
+from photo_store import photo_key
+from thumb_cache import thumbnails
+
+
+class _TaskSignals(QObject):
+    # номер запроса, путь, ключ превью, изображение, перцептивный хеш или None
+    loaded = pyqtSignal(int, str, str, QImage, object)
+    # номер запроса, путь, текст ошибки
+    failed = pyqtSignal(int, str, str)
+
+
+class PhotoLoadTask(QRunnable):
+    """Проверка и декодирование фото в рабочем потоке.
+
+    Перед каждым тяжелым шагом задача проверяет, не устарел ли запрос,
+    и молча завершается, если инспектор уже выбрал другой файл.
+    """
+
+    def __init__(self, loader, request_id, file_path):
+        super().__init__()
+        self.loader = loader
+        self.request_id = request_id
+        self.file_path = file_path
+
+    def run(self):
+        loader = self.loader
+        try:
+            if loader.is_stale(self.request_id):
+                return
+            if loader.check:
+                check_photo(self.file_path)
+            if loader.is_stale(self.request_id):
+                return
+            key, image = loader.cache.load_image(self.file_path)
+            photo_hash = None
+            if loader.perceptual_hash and not loader.is_stale(self.request_id):
+                photo_hash = dhash(self.file_path)
+        except Exception as e:
+            if not loader.is_stale(self.request_id):
+                loader.signals.failed.emit(self.request_id, self.file_path, str(e))
+            return
+        if not loader.is_stale(self.request_id):
+            loader.signals.loaded.emit(self.request_id, self.file_path, key, image, photo_hash)
+
+
+class PhotoLoader(QObject):
+    """Асинхронная загрузка превью для одного поля фото формы.
+
+    Сигналы приходят в GUI-поток и только для последнего запроса.
+    С perceptual_hash=True в том же рабочем потоке считается хеш фото
+    для поиска похожих (photo_hash.py), он доступен в атрибуте photo_hash.
+    """
+
+    loaded = pyqtSignal(str, QPixmap)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, parent=None, check=True, cache=thumbnails, pool=None, perceptual_hash=False):
+        super().__init__(parent)
+        self.check = check
+        self.perceptual_hash = perceptual_hash
+        self.photo_hash = None
+        self.cache = cache
+        self.pool = pool or QThreadPool.globalInstance()
+        self.current = 0
+        self.signals = _TaskSignals()
+        self.signals.loaded.connect(self._on_loaded)
+        self.signals.failed.connect(self._on_failed)
+
+    def is_stale(self, request_id):
+        return request_id != self.current
+
+    def load(self, file_path):
+        self.current += 1
+        self.pool.start(PhotoLoadTask(self, self.current, file_path))
+
+    def cancel(self):
+        self.current += 1
+
+    def _on_loaded(self, request_id, file_path, key, image, photo_hash):
+        if self.is_stale(request_id):
+            return
+        self.photo_hash = photo_hash
+        pixmap = self.cache.cached_pixmap(key)
+        if pixmap is None:
+            pixmap = self.cache.put_pixmap(key, image)
+        self.loaded.emit(file_path, pixmap)
+
+    def _on_failed(self, request_id, file_path, message):
+        if not self.is_stale(request_id):
+            self.failed.emit(file_path, message)
+
+
+class _ThumbnailTask(QRunnable):
+    def __init__(self, loader, file_path):
+        super().__init__()
+        self.loader = loader
+        self.file_path = file_path
+
+    def run(self):
+        loader = self.loader
+        # Запрос мог быть снят, пока задача ждала в очереди
+        if self.file_path not in loader.pending:
+            return
+        try:
+            key = photo_key(self.file_path)
+            if key is not None and loader.fetch is not None:
+                key, image = loader.cache.load_data(key, loader.fetch)
+            else:
+                key, image = loader.cache.load_image(self.file_path)
+        except Exception as e:
+            loader.signals.failed.emit(0, self.file_path, str(e))
+            return
+        loader.signals.loaded.emit(0, self.file_path, key, image, None)
+
+
+class ThumbnailLoader(QObject):
+    """Фоновая загрузка превью для многих строк сразу (списки водителей).
+
+    Повторные запросы одного файла не ставятся в очередь, файлы с ошибкой
+    больше не запрашиваются. Фото хранилища (photo_path с ключом) читаются
+    через fetch(key) -> bytes, обычно Registry.photo_bytes или
+    RegistryClient.photo_bytes.
+    """
+
+    ready = pyqtSignal(str, QPixmap)
+
+    def __init__(self, parent=None, cache=thumbnails, pool=None, fetch=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.fetch = fetch
+        self.pool = pool or QThreadPool.globalInstance()
+        self.pending = set()
+        self.broken = set()
+        self.signals = _TaskSignals()
+        self.signals.loaded.connect(self._on_loaded)
+        self.signals.failed.connect(self._on_failed)
+
+    def request(self, file_path):
+        if file_path in self.pending or file_path in self.broken:
+            return
+        self.pending.add(file_path)
+        self.pool.start(_ThumbnailTask(self, file_path))
+
+    def clear(self):
+        self.pending.clear()
+
+    def _on_loaded(self, _, file_path, key, image, photo_hash):
+        if file_path not in self.pending:
+            return
+        self.pending.discard(file_path)
+        pixmap = self.cache.cached_pixmap(key)
+        if pixmap is None:
+            pixmap = self.cache.put_pixmap(key, image)
+        self.ready.emit(file_path, pixmap)
+
+    def _on_failed(self, _, file_path, message):
+        self.pending.discard(file_path)
+        self.broken.add(file_path)
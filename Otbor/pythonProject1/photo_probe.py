@@ -0,0 +1,145 @@
+"""Проверка фотографий водителей по заголовкам JPEG/PNG без декодирования пикселей.
+
+Пакетный режим:
+    python photo_probe.py /путь/к/папке --report report.csv --workers 8
+"""
+import argparse
+import csv
+import os
+import struct
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+MAX_PHOTO_SIZE = 2 * 1024 * 1024
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Маркеры SOF, в которых записаны размеры кадра (C4, C8 и CC — это DHT, JPG и DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Маркеры без поля длины
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+PhotoInfo = namedtuple("PhotoInfo", "width height file_size")
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Файл изображения поврежден.")
+    return data
+
+
+def _jpeg_size(f):
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b"\xff":
+            raise ValueError("Файл изображения поврежден.")
+        marker = _read_exact(f, 1)[0]
+        # Между сегментами допускаются байты-заполнители 0xFF
+        while marker == 0xFF:
+            marker = _read_exact(f, 1)[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            # Конец файла или начало данных до кадра — размеров нет
+            raise ValueError("Не удалось определить размер изображения.")
+        length = struct.unpack(">H", _read_exact(f, 2))[0]
+        if length < 2:
+            raise ValueError("Файл изображения поврежден.")
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", _read_exact(f, 5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def probe(file_path):
+    """Ширина, высота и размер файла. Читаются только заголовки."""
+    file_size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        head = f.read(24)
+        if head.startswith(PNG_SIGNATURE) and head[12:16] == b"IHDR":
+            width, height = struct.unpack(">II", head[16:24])
+        elif head.startswith(b"\xff\xd8"):
+            f.seek(2)
+            width, height = _jpeg_size(f)
+        else:
+            raise ValueError("Поддерживаются только изображения JPEG и PNG.")
+    if not width or not height:
+        raise ValueError("Не удалось определить размер изображения.")
+    return PhotoInfo(width, height, file_size)
+
+
+def photo_errors(info):
+    """Все нарушенные правила для фотографии водителя."""
+    errors = []
+    if info.width * 4 != info.height * 3:
+        errors.append("Соотношение сторон изображения должно быть 3:4.")
+    if info.height < info.width:
+        errors.append("Изображение должно быть вертикальным.")
+    if info.file_size > MAX_PHOTO_SIZE:
+        errors.append("Размер изображения не должен превышать 2 МБ.")
+    return errors
+
+
+def check_photo(file_path):
+    """Проверка фото для формы: ValueError с первой ошибкой, как в choose_photo."""
+    info = probe(file_path)
+    errors = photo_errors(info)
+    if errors:
+        raise ValueError(errors[0])
+    return info
+
+
+def _check_one(file_path):
+    try:
+        info = probe(file_path)
+    except (OSError, ValueError) as e:
+        return file_path, None, [str(e)]
+    return file_path, info, photo_errors(info)
+
+
+def iter_photos(directory):
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(PHOTO_EXTENSIONS):
+                    yield entry.path
+
+
+def check_directory(directory, report_path, workers=None):
+    """Проверка всех фото в папке пулом процессов. Возвращает (прошло, не прошло)."""
+    passed = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(report_path, "w", encoding="utf-8", newline="") as report:
+        writer = csv.writer(report)
+        writer.writerow(["path", "width", "height", "file_size", "ok", "errors"])
+        for file_path, info, errors in pool.map(_check_one, iter_photos(directory), chunksize=256):
+            width, height, file_size = info if info else ("", "", "")
+            writer.writerow([file_path, width, height, file_size, int(not errors), "; ".join(errors)])
+            if errors:
+                failed += 1
+            else:
+                passed += 1
+    return passed, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная проверка фотографий водителей")
+    parser.add_argument("directory")
+    parser.add_argument("--report", default="photo_report.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    passed, failed = check_directory(args.directory, args.report, args.workers)
+    print(f"Прошли проверку: {passed}")
+    print(f"Не прошли: {failed}")
+    print(f"Отчет: {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
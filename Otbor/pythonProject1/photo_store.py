@@ -0,0 +1,342 @@
+"""Хранилище фотографий с адресацией по содержимому.
+
+При приеме фото обрезается по центру до 3:4, приводится к 600x800 и
+сохраняется в JPEG с одним качеством. Имя файла — хеш полученного JPEG:
+photo_store/ab/ab12...ef.jpg, поэтому одинаковые фото лежат в одном файле.
+В photo_path записи хранится только ключ (хеш), а не путь: он не зависит
+ни от папки, из которой запущена программа, ни от того, где лежит
+хранилище — на этом компьютере или у сервиса. Содержимое по ключу отдает
+Registry.photo_bytes (или RegistryClient.photo_bytes).
+Повторная загрузка того же исходника узнается по его хешу без декодирования.
+
+Файлы читаются через mmap: сервис отдает фото в сокет без копирования
+в память процесса, превью строятся из файла хранилища.
+
+Пример:
+    python photo_store.py --db drivers.db import --workers 8
+    python photo_store.py add photo.jpg
+    python photo_store.py stats
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QRect, Qt
+from PyQt5.QtGui import QImage, QImageReader
+
+PHOTO_STORE_DIR = "photo_store"
+
+# Стандартный размер и качество фото в хранилище
+PHOTO_WIDTH = 600
+PHOTO_HEIGHT = 800
+JPEG_QUALITY = 85
+
+KEY_RE = re.compile(r"[0-9a-f]{32}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Принятые исходники: хеш исходного файла -> фото в хранилище
+CREATE TABLE IF NOT EXISTS sources (
+    source_hash TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    uploads INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def store_path(db_path):
+    """Папка хранилища фото рядом с базой реестра."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), PHOTO_STORE_DIR)
+
+
+def photo_key(value):
+    """Ключ фото хранилища из photo_path записи, None — путь к файлу вне хранилища.
+
+    Кроме ключа узнаются и пути вида photo_store/ab/<ключ>.jpg, которые
+    записывались раньше.
+    """
+    if not value:
+        return None
+    if KEY_RE.fullmatch(value):
+        return value
+    name, extension = os.path.splitext(os.path.basename(value))
+    shard = os.path.dirname(value)
+    if (extension == ".jpg" and KEY_RE.fullmatch(name) and os.path.basename(shard) == name[:2]
+            and os.path.basename(os.path.dirname(shard)) == PHOTO_STORE_DIR):
+        return name
+    return None
+
+
+def photo_file(directory, value):
+    """Путь к файлу фото: ключ разрешается в папке хранилища, иной путь возвращается как есть."""
+    key = photo_key(value)
+    if key is None:
+        return value
+    return os.path.join(directory, key[:2], key + ".jpg")
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def normalize(data):
+    """Исходник JPEG/PNG -> JPEG 600x800 стандартного качества."""
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.ReadOnly)
+    reader = QImageReader(buffer)
+    reader.setAutoTransform(True)
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Не удалось загрузить изображение: {reader.errorString()}")
+    # Обрезка по центру до 3:4
+    width, height = image.width(), image.height()
+    if width * 4 > height * 3:
+        crop = height * 3 // 4
+        image = image.copy(QRect((width - crop) // 2, 0, crop, height))
+    elif width * 4 < height * 3:
+        crop = width * 4 // 3
+        image = image.copy(QRect(0, (height - crop) // 2, width, crop))
+    image = image.scaled(PHOTO_WIDTH, PHOTO_HEIGHT, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    image = image.convertToFormat(QImage.Format_RGB888)
+    output = QBuffer()
+    output.open(QIODevice.WriteOnly)
+    if not image.save(output, "JPG", JPEG_QUALITY):
+        raise ValueError("Не удалось сохранить изображение.")
+    return bytes(output.data())
+
+
+def prepare(file_path):
+    """Чтение и нормализация исходника (можно в другом процессе).
+
+    Возвращает (путь, хеш исходника, размер исходника, JPEG или None, ошибка).
+    """
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        return file_path, content_hash(data), len(data), normalize(data), None
+    except (OSError, ValueError) as e:
+        return file_path, None, 0, None, str(e)
+
+
+class PhotoStore:
+    def __init__(self, directory=PHOTO_STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            os.path.join(directory, "index.db"), check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".jpg")
+
+    def resolve(self, value):
+        return photo_file(self.directory, value)
+
+    def key_of(self, path):
+        """Ключ, если путь указывает на фото этого хранилища, иначе None."""
+        name, extension = os.path.splitext(os.path.basename(path))
+        if extension != ".jpg" or not KEY_RE.fullmatch(name):
+            return None
+        if os.path.abspath(path) != os.path.abspath(self.path(name)) or not os.path.exists(path):
+            return None
+        return name
+
+    def __contains__(self, key):
+        return bool(KEY_RE.fullmatch(key)) and os.path.exists(self.path(key))
+
+    # --- Прием ---
+
+    def add_file(self, file_path):
+        """Принять фото из файла. Возвращает ключ."""
+        key = self.key_of(file_path)
+        if key is not None:
+            return key
+        with open(file_path, "rb") as f:
+            return self.add_bytes(f.read())
+
+    def add_bytes(self, data):
+        source_hash = content_hash(data)
+        key = self._known_source(source_hash)
+        if key is not None:
+            return key
+        return self.add_prepared(source_hash, len(data), normalize(data))
+
+    def _known_source(self, source_hash):
+        # Тот же исходник уже принимался — только учет загрузки
+        with self.lock:
+            row = self.conn.execute("SELECT key FROM sources WHERE source_hash = ?", (source_hash,)).fetchone()
+            if row is None or not os.path.exists(self.path(row[0])):
+                return None
+            self.conn.execute("UPDATE sources SET uploads = uploads + 1 WHERE source_hash = ?", (source_hash,))
+        return row[0]
+
+    def add_prepared(self, source_hash, source_size, photo):
+        """Записать нормализованное фото (результат prepare). Возвращает ключ."""
+        key = content_hash(photo)
+        path = self.path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(photo)
+            os.replace(temporary, path)
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?)", (key, len(photo)))
+                self.conn.execute(
+                    "INSERT INTO sources VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(source_hash) DO UPDATE SET key = excluded.key, uploads = uploads + 1",
+                    (source_hash, key, source_size),
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return key
+
+    # --- Чтение ---
+
+    @contextmanager
+    def view(self, key):
+        """memoryview содержимого фото через mmap, действует внутри блока with."""
+        if not KEY_RE.fullmatch(key):
+            raise KeyError(key)
+        with open(self.path(key), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(mapped)
+        try:
+            yield data
+        finally:
+            data.release()
+            mapped.close()
+
+    def stats(self):
+        """Сколько места сэкономили нормализация и устранение повторов."""
+        with self.lock:
+            uploads, source_bytes = self.conn.execute(
+                "SELECT COALESCE(SUM(uploads), 0), COALESCE(SUM(size * uploads), 0) FROM sources"
+            ).fetchone()
+            blobs, stored_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        return {
+            "uploads": uploads,
+            "blobs": blobs,
+            "duplicates": uploads - blobs,
+            "source_bytes": source_bytes,
+            "stored_bytes": stored_bytes,
+            "saved_bytes": source_bytes - stored_bytes,
+            "saved_ratio": (source_bytes - stored_bytes) / source_bytes if source_bytes else 0.0,
+        }
+
+
+def print_stats(stats):
+    megabyte = 1024 * 1024
+    print(f"Загрузок: {stats['uploads']}, фото в хранилище: {stats['blobs']}, повторов: {stats['duplicates']}")
+    print(f"Исходники: {stats['source_bytes'] / megabyte:.1f} МБ, хранится: {stats['stored_bytes'] / megabyte:.1f} МБ")
+    print(f"Экономия: {stats['saved_bytes'] / megabyte:.1f} МБ ({stats['saved_ratio']:.0%})")
+
+
+def import_photos(photo_store, store, workers=None, page_size=1000):
+    """Перенести фото водителей и ВУ из путей инспекторов в хранилище.
+
+    Нормализация идет пулом процессов, photo_path записей заменяется ключом
+    фото в хранилище. Возвращает (перенесено, ошибок).
+    """
+    moved = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for table in ("drivers", "licenses"):
+            after = 0
+            while True:
+                rows = store.photo_paths(table, after, page_size)
+                if not rows:
+                    break
+                after = rows[-1][0]
+                updates = []
+                sources = []
+                for item_id, path in rows:
+                    key = photo_key(path)
+                    if key is None:
+                        sources.append((item_id, path))
+                    elif key != path:
+                        # Старый путь в хранилище — заменяется ключом без повторной нормализации
+                        updates.append((key, item_id))
+                results = pool.map(prepare, [path for _, path in sources], chunksize=16)
+                for (item_id, _), (_, source_hash, size, photo, _) in zip(sources, results):
+                    if photo is None:
+                        failed += 1
+                        continue
+                    updates.append((photo_store.add_prepared(source_hash, size, photo), item_id))
+                store.set_photo_paths(table, updates)
+                moved += len(updates)
+    return moved, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Хранилище фотографий водителей")
+    parser.add_argument("--db", default=None, help="База реестра; хранилище лежит в папке рядом с ней")
+    parser.add_argument("--store", default=None, help="Папка хранилища, если не рядом с базой")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Принять фото из файлов")
+    add.add_argument("files", nargs="+")
+    migrate = commands.add_parser("import", help="Перенести фото из базы реестра в хранилище")
+    migrate.add_argument("--workers", type=int, default=None)
+    commands.add_parser("stats", help="Объем хранилища и экономия места")
+    args = parser.parse_args(argv)
+
+    from journal import Journal, JournalBusyError, journal_path
+    from storage import DB_PATH, DriverStore
+
+    db_path = args.db or DB_PATH
+    photo_store = PhotoStore(args.store or store_path(db_path))
+    try:
+        if args.command == "add":
+            for file_path in args.files:
+                try:
+                    print(file_path, photo_store.path(photo_store.add_file(file_path)))
+                except (OSError, ValueError) as e:
+                    print(file_path, f"ошибка: {e}")
+        elif args.command == "import":
+            started = time.perf_counter()
+            # Новые пути — обычная правка: с журналом изменений и записями для синхронизации
+            try:
+                journal = Journal(journal_path(db_path))
+            except JournalBusyError as e:
+                print(e, file=sys.stderr)
+                return 1
+            store = DriverStore(db_path, journal=journal)
+            try:
+                moved, failed = import_photos(photo_store, store, args.workers)
+            finally:
+                store.close()
+                journal.close()
+            print(f"Перенесено фото: {moved}, не прочитано: {failed}, {time.perf_counter() - started:.1f} с")
+        print_stats(photo_store.stats())
+    finally:
+        photo_store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
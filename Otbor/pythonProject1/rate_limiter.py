@@ -0,0 +1,135 @@
+import sqlite3
+import threading
+import time
+
+LIMITS_PATH = "login_limits.db"
+
+MAX_FAILURES = 3
+# За одним адресом (NAT, прокси) работает целый отдел: порог клиента заметно выше порога
+# пользователя, чтобы опечатки одних инспекторов не блокировали вход всем остальным
+CLIENT_MAX_FAILURES = 50
+WINDOW_SECONDS = 60
+LOCK_SECONDS = 60
+
+# Просроченные записи удаляются каждые PURGE_EVERY операций
+PURGE_EVERY = 1000
+
+
+class RateLimiter:
+    """Блокировка входа после серии неудачных попыток.
+
+    Счетчики (скользящее окно) лежат в общем файле SQLite, поэтому блокировка
+    переживает перезапуск и видна всем процессам, работающим с этим файлом.
+    Ключ — строка вида "user:<логин>" или "client:<адрес>"; каждая проверка —
+    одно обращение по первичному ключу. У ключей клиентов свой порог
+    client_max_failures.
+    """
+
+    def __init__(self, path=LIMITS_PATH, max_failures=MAX_FAILURES,
+                 window=WINDOW_SECONDS, lock_seconds=LOCK_SECONDS, client_max_failures=CLIENT_MAX_FAILURES):
+        self.max_failures = max_failures
+        self.client_max_failures = client_max_failures
+        self.window = window
+        self.lock_seconds = lock_seconds
+        self.lock = threading.Lock()
+        self.operations = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS login_limits (
+                key TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL,
+                window_start REAL NOT NULL,
+                locked_until REAL NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_login_limits_expires ON login_limits(expires_at);
+        """)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def check(self, key, now=None):
+        """Сколько секунд осталось до снятия блокировки (0 — вход разрешен)."""
+        now = time.time() if now is None else now
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT locked_until FROM login_limits WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] <= now:
+            return 0
+        return row[0] - now
+
+    def register_failure(self, key, now=None, max_failures=None):
+        """Учесть неудачную попытку. Возвращает (секунд блокировки, осталось попыток).
+
+        max_failures — порог для этого ключа, по умолчанию общий.
+        """
+        now = time.time() if now is None else now
+        max_failures = max_failures or self.max_failures
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT failures, window_start, locked_until FROM login_limits WHERE key = ?", (key,)
+                ).fetchone()
+                failures, window_start, locked_until = row if row else (0, now, 0.0)
+                if locked_until > now:
+                    self.conn.execute("COMMIT")
+                    return locked_until - now, 0
+                if now - window_start >= self.window:
+                    failures, window_start = 0, now
+                failures += 1
+                if failures >= max_failures:
+                    failures, window_start, locked_until = 0, now, now + self.lock_seconds
+                expires_at = max(locked_until, window_start + self.window)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO login_limits VALUES (?, ?, ?, ?, ?)",
+                    (key, failures, window_start, locked_until, expires_at),
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self._maybe_purge(now)
+        if locked_until > now:
+            return locked_until - now, 0
+        return 0, max_failures - failures
+
+    def reset(self, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM login_limits WHERE key = ?", (key,))
+
+    def purge(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self.conn.execute("DELETE FROM login_limits WHERE expires_at <= ?", (now,))
+
+    def _maybe_purge(self, now):
+        self.operations += 1
+        if self.operations % PURGE_EVERY == 0:
+            self.conn.execute("DELETE FROM login_limits WHERE expires_at <= ?", (now,))
+
+    # --- Вход: ключи по логину и, если известен, по клиенту ---
+
+    @staticmethod
+    def login_keys(username, client=None):
+        keys = ["user:" + username]
+        if client:
+            keys.append("client:" + client)
+        return keys
+
+    def check_login(self, username, client=None):
+        return max(self.check(key) for key in self.login_keys(username, client))
+
+    def login_failed(self, username, client=None):
+        results = [self.register_failure("user:" + username)]
+        if client:
+            results.append(self.register_failure("client:" + client, max_failures=self.client_max_failures))
+        return max(locked for locked, _ in results), min(left for _, left in results)
+
+    def login_succeeded(self, username, client=None):
+        # Успешный вход сбрасывает только счетчик пользователя: клиент мог перебирать чужие логины
+        self.reset("user:" + username)
@@ -0,0 +1,243 @@
+"""Компактные записи водителей и ВУ в памяти.
+
+Записи с __slots__ вместо словарей строк: у объекта нет своего словаря
+атрибутов, GUID хранится 16 байтами, даты — числами ГГГГММДД (dates.py),
+категории — битовой маской (categories.py). ФИО, названия городов и органов,
+выдавших ВУ, интернируются: одна строка на все записи с одним значением.
+Текстовый вид полей (driver_id, dob, expiry_date...) — свойства, поэтому
+записи читаются теми же именами полей, что и строки базы.
+
+Пример:
+    python records.py --drivers 1000000
+"""
+import argparse
+import gc
+import random
+import sys
+import time
+import uuid
+
+from categories import CATEGORIES, format_categories, parse_categories
+from dates import format_day, parse_day
+from storage import DRIVER_FIELDS, LICENSE_FIELDS
+
+# Текстовые поля водителя, которые хранятся как есть
+_DRIVER_TEXT = (
+    "passport", "registration_address", "living_address", "workplace", "position", "phone", "email",
+    "photo_path", "notes",
+)
+# Поля с малым числом различных значений, которые интернируются
+_SHARED_TEXT = ("last_name", "first_name", "middle_name", "registration_city", "living_city")
+
+
+def pack_guid(text):
+    """GUID -> 16 байт. Строка не в каноническом виде GUID остается строкой."""
+    try:
+        value = uuid.UUID(text)
+    except (TypeError, ValueError, AttributeError):
+        return text or ""
+    return value.bytes if str(value) == text else text
+
+
+def unpack_guid(value):
+    return str(uuid.UUID(bytes=value)) if isinstance(value, bytes) else value
+
+
+def _intern(text):
+    return sys.intern(text) if text else ""
+
+
+class LicenseRecord:
+    __slots__ = (
+        "id", "guid", "license_number", "issue_day", "expiry_day", "issuing_authority", "categories", "photo_path",
+    )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Из строки базы (get_licenses) или данных формы ВУ."""
+        record = cls()
+        record.id = data.get("id") or 0
+        record.guid = pack_guid(data.get("driver_id"))
+        record.license_number = data.get("license_number") or ""
+        # В строке базы даты и маска уже посчитаны
+        record.issue_day = data.get("issue_day") or parse_day(data.get("issue_date"))
+        record.expiry_day = data.get("expiry_day") or parse_day(data.get("expiry_date"))
+        record.issuing_authority = _intern(data.get("issuing_authority"))
+        categories = data.get("categories")
+        if categories is None:
+            categories = parse_categories(data.get("vehicle_categories") or "", strict=False)
+        record.categories = categories
+        record.photo_path = data.get("photo_path") or ""
+        return record
+
+    @property
+    def driver_id(self):
+        return unpack_guid(self.guid)
+
+    @property
+    def issue_date(self):
+        return format_day(self.issue_day)
+
+    @property
+    def expiry_date(self):
+        return format_day(self.expiry_day)
+
+    @property
+    def vehicle_categories(self):
+        return format_categories(self.categories)
+
+    def to_dict(self):
+        """Словарь в виде строки базы (для JSON сервиса)."""
+        data = {field: getattr(self, field) for field in LICENSE_FIELDS}
+        data.update(id=self.id, issue_day=self.issue_day, expiry_day=self.expiry_day, categories=self.categories)
+        return data
+
+    def __repr__(self):
+        return f"LicenseRecord({self.license_number!r}, {self.driver_id!r})"
+
+
+class DriverRecord:
+    __slots__ = ("id", "guid", "dob_day", "photo_hash", "licenses") + _SHARED_TEXT + _DRIVER_TEXT
+
+    @classmethod
+    def from_dict(cls, data):
+        """Из строки базы (get_driver) с необязательным списком ВУ в data["licenses"].
+
+        Поля, которых нет в data (страница списка водителей), остаются пустыми.
+        """
+        record = cls()
+        record.id = data.get("id") or 0
+        record.guid = pack_guid(data.get("driver_id"))
+        record.dob_day = parse_day(data.get("dob"))
+        record.photo_hash = data.get("photo_hash")
+        record.licenses = tuple(LicenseRecord.from_dict(license) for license in data.get("licenses") or ())
+        for license in record.licenses:
+            # ВУ ссылаются на те же 16 байт GUID, что и водитель
+            if license.guid == record.guid:
+                license.guid = record.guid
+        for field in _DRIVER_TEXT:
+            setattr(record, field, data.get(field) or "")
+        for field in _SHARED_TEXT:
+            setattr(record, field, _intern(data.get(field)))
+        return record
+
+    @classmethod
+    def from_page_row(cls, columns, row):
+        """Из строки page_drivers: (id, значение сортировки, *columns)."""
+        return cls.from_dict(dict(zip(columns, row[2:]), id=row[0]))
+
+    @property
+    def driver_id(self):
+        return unpack_guid(self.guid)
+
+    @property
+    def dob(self):
+        return format_day(self.dob_day)
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def to_dict(self):
+        """Словарь в виде строки базы с ВУ в "licenses" (для JSON сервиса)."""
+        data = {field: getattr(self, field) for field in DRIVER_FIELDS}
+        data.update(id=self.id, photo_hash=self.photo_hash, licenses=[license.to_dict() for license in self.licenses])
+        return data
+
+    def __repr__(self):
+        return f"DriverRecord({self.driver_id!r}, {self.last_name!r})"
+
+
+# --- Замеры ---
+
+_LAST_NAMES = ("Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов")
+_FIRST_NAMES = ("Александр", "Сергей", "Дмитрий", "Андрей", "Алексей", "Максим", "Иван", "Петр")
+_CITIES = ("Москва", "Санкт-Петербург", "Казань", "Новосибирск", "Екатеринбург", "Нижний Новгород", "Самара")
+_AUTHORITIES = ("ГИБДД 7701", "ГИБДД 7702", "ГИБДД 7801", "ГИБДД 1601", "ГИБДД 5401")
+
+
+def _sample_driver(generator, number):
+    # Как при чтении из базы или JSON: каждая строка — отдельный объект
+    def text(values):
+        return values[generator.randrange(len(values))].encode("utf-8").decode("utf-8")
+
+    day = generator.randint(1, 28)
+    month = generator.randint(1, 12)
+    city = text(_CITIES)
+    driver_id = str(uuid.UUID(int=generator.getrandbits(128), version=4))
+    return {
+        "id": number + 1,
+        "driver_id": driver_id,
+        "last_name": text(_LAST_NAMES),
+        "first_name": text(_FIRST_NAMES),
+        "middle_name": text(_FIRST_NAMES) + "ович",
+        "dob": f"{day:02d}.{month:02d}.{generator.randint(1950, 2004)}",
+        "passport": f"{generator.randint(1000, 9999)} {generator.randint(100000, 999999)}",
+        "registration_city": city,
+        "registration_address": f"ул. Ленина, д. {generator.randint(1, 200)}",
+        "living_city": city.encode("utf-8").decode("utf-8"),
+        "living_address": f"ул. Мира, д. {generator.randint(1, 200)}",
+        "workplace": "",
+        "position": "",
+        "phone": f"+7999{generator.randint(1000000, 9999999)}",
+        "email": f"driver{number}@mail.ru",
+        "photo_path": "",
+        "notes": "",
+        "photo_hash": generator.getrandbits(63),
+        "licenses": [{
+            "driver_id": driver_id,
+            "license_number": f"{generator.randint(1000, 9999)} {generator.randint(100000, 999999)}",
+            "issue_date": f"{day:02d}.{month:02d}.2015",
+            "expiry_date": f"{day:02d}.{month:02d}.2025",
+            "issuing_authority": text(_AUTHORITIES),
+            "vehicle_categories": ", ".join(generator.sample(CATEGORIES[:8], 2)),
+            "photo_path": "",
+        }],
+    }
+
+
+def deep_size(root):
+    """Байты всех объектов, достижимых из root; общие объекты считаются один раз."""
+    seen = set()
+    stack = [root]
+    size = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, type):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        stack.extend(gc.get_referents(item))
+    return size
+
+
+def benchmark(count, seed=1):
+    """Байт на водителя с одним ВУ: словари строк против записей."""
+    generator = random.Random(seed)
+    started = time.perf_counter()
+    drivers = [_sample_driver(generator, number) for number in range(count)]
+    print(f"Водителей: {count}, создание словарей: {time.perf_counter() - started:.1f} с")
+    dict_bytes = deep_size(drivers)
+
+    started = time.perf_counter()
+    for number, data in enumerate(drivers):
+        drivers[number] = DriverRecord.from_dict(data)
+    print(f"Перевод в записи: {time.perf_counter() - started:.1f} с")
+    record_bytes = deep_size(drivers)
+
+    megabyte = 2 ** 20
+    print(f"Словари: {dict_bytes / count:.0f} байт на водителя, всего {dict_bytes / megabyte:.0f} МБ")
+    print(f"Записи:  {record_bytes / count:.0f} байт на водителя, всего {record_bytes / megabyte:.0f} МБ")
+    print(f"Экономия: {1 - record_bytes / dict_bytes:.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Память на записи водителей: словари и записи со __slots__")
+    parser.add_argument("--drivers", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    benchmark(args.drivers, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
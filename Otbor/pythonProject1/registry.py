@@ -0,0 +1,637 @@
+"""Операции реестра водителей без привязки к интерфейсу.
+
+Registry работает с локальной базой напрямую. RegistryClient (client.py)
+предоставляет те же методы поверх HTTP-сервиса (service.py). Окна получают
+нужный вариант через connect().
+"""
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+from category_index import index_path
+from dates import UNKNOWN_DAY, parse_day, today
+from lookup_cache import LookupCache
+from metrics import timed
+from records import DriverRecord
+from storage import DB_PATH, EXPIRY_KEY_COLUMNS, StorePool
+from uniqueness import KINDS, LICENSE, PASSPORT, BloomFilter, DuplicateKeyError, duplicate_message, find_duplicates, key_hash
+from validation import get_validator
+
+# Столбцы результатов запросов по категориям по умолчанию
+DRIVER_CATEGORY_COLUMNS = ("driver_id", "last_name", "first_name", "middle_name")
+LICENSE_CATEGORY_COLUMNS = ("driver_id", "license_number", "vehicle_categories")
+
+# Фото, похожее на фото другого водителя (photo_hash.py)
+PHOTO_DUPLICATE_MESSAGE = "Это фото уже прикреплено к водителю {owner}."
+
+# Адрес сервиса; если не задан, окна работают с локальной базой
+SERVICE_URL_ENV = "SESSIA_SERVICE_URL"
+
+
+class RegistryError(Exception):
+    """Ошибка операции реестра: текст, ошибки по полям и HTTP-статус для сервиса."""
+
+    def __init__(self, message, errors=None, status=400):
+        super().__init__(message)
+        self.message = message
+        self.errors = errors or {}
+        self.status = status
+
+
+class Registry:
+    is_local = True
+
+    def __init__(self, db_path=DB_PATH, pool_size=1, credentials_path=None, limits_path=None):
+        self.pool = StorePool(db_path, pool_size)
+        self.credentials_path = credentials_path
+        self.limits_path = limits_path
+        self.lock = threading.Lock()
+        self._credentials = None
+        self._limiter = None
+        self._category_index = None
+        self.category_lock = threading.Lock()
+        self.category_unsaved = 0
+        # Фильтр Блума занятых номеров для пакетной записи, строится при первой пачке
+        self._bloom = None
+        self.bloom_lock = threading.Lock()
+        # Хеши фото водителей для поиска похожих, читаются из базы при первой записи
+        self._photo_index = None
+        self.photo_lock = threading.Lock()
+        self._photo_store = None
+        # ФИО для нечеткого поиска, читаются из базы при первом поиске
+        self._name_index = None
+        self.name_lock = threading.Lock()
+        # Карточки водителей с ВУ; сбрасываются при записи водителя или его ВУ
+        self.driver_cache = LookupCache()
+
+    def close(self):
+        with self.category_lock:
+            if self.category_unsaved:
+                self._category_index.save(index_path(self.pool.path))
+        self.pool.close()
+        if self._credentials is not None:
+            self._credentials.close()
+        if self._limiter is not None:
+            self._limiter.close()
+        if self._photo_store is not None:
+            self._photo_store.close()
+
+    # Хранилища паролей и счетчиков открываются только при первом входе
+
+    @property
+    def credentials(self):
+        with self.lock:
+            if self._credentials is None:
+                from credentials import CREDENTIALS_PATH, CredentialStore
+                self._credentials = CredentialStore(self.credentials_path or CREDENTIALS_PATH)
+            return self._credentials
+
+    @property
+    def limiter(self):
+        with self.lock:
+            if self._limiter is None:
+                from rate_limiter import LIMITS_PATH, RateLimiter
+                self._limiter = RateLimiter(self.limits_path or LIMITS_PATH)
+            return self._limiter
+
+    @property
+    def photo_store(self):
+        """Хранилище фото (photo_store.py) в папке рядом с базой."""
+        with self.lock:
+            if self._photo_store is None:
+                from photo_store import PhotoStore, store_path
+                self._photo_store = PhotoStore(store_path(self.pool.path))
+            return self._photo_store
+
+    # --- Журнал изменений (journal.py) ---
+
+    def set_actor(self, login):
+        """Логин инспектора, который записывается в журнал при каждом изменении."""
+        if self.pool.journal is not None:
+            self.pool.journal.actor = login
+
+    @contextmanager
+    def acting(self, login):
+        """Изменения из этого потока внутри блока записываются в журнал от имени login.
+
+        Нужен сервису: один реестр обслуживает запросы разных инспекторов.
+        """
+        if self.pool.journal is None:
+            yield
+            return
+        with self.pool.journal.acting(login):
+            yield
+
+    def compact_journal(self):
+        """Снимок базы и перенос покрытых им сегментов журнала в архив. Возвращает номер снимка."""
+        from journal import compact
+        with self.pool.connection() as store:
+            return compact(store, self.pool.journal, self.pool.path)
+
+    # --- Синхронизация узлов (sync.py) ---
+
+    def sync_state(self, peer=""):
+        """{"node": идентификатор узла, "received": номер последнего принятого изменения узла peer}."""
+        with self.pool.connection() as store:
+            return {"node": store.sync_node(), "received": store.sync_received(peer) if peer else 0}
+
+    def sync_changes(self, after=0, peer="", limit=None):
+        """Сжатая пачка изменений с номером больше after для узла peer (sync.export_changes)."""
+        from sync import BATCH_SIZE, export_changes
+        with self.pool.connection() as store:
+            return export_changes(store, after, peer, limit or BATCH_SIZE)
+
+    @timed("registry.apply_sync_changes")
+    def apply_sync_changes(self, payload):
+        """Применить пачку изменений другого узла. Возвращает итоги sync.apply_changes без списка водителей."""
+        from sync import SyncError, apply_changes
+        with self.pool.connection() as store:
+            try:
+                result = apply_changes(store, payload)
+            except SyncError as e:
+                raise RegistryError(str(e))
+            drivers = result.pop("drivers")
+            photos = store.driver_photo_hashes(drivers)
+            names = store.driver_full_names(drivers)
+        self.driver_cache.invalidate(drivers)
+        self._index_photos(photos)
+        self._index_names(names)
+        if result["removed"]:
+            # Индексы ФИО и фото пропускают удаленных водителей сами, индекс категорий строится заново
+            self._forget_categories()
+        return result
+
+    def sync_conflicts(self, after=0, limit=100):
+        """Записи, проигравшие конфликт номеров при синхронизации, по возрастанию id."""
+        with self.pool.connection() as store:
+            return store.sync_conflicts(after, limit)
+
+    def _forget_categories(self):
+        with self.category_lock:
+            self._category_index = None
+            self.category_unsaved = 0
+            path = index_path(self.pool.path)
+            if os.path.exists(path):
+                os.remove(path)
+
+    # --- Водители ---
+
+    @timed("registry.save_driver")
+    def save_driver(self, data, profile="driver"):
+        errors = get_validator(profile).validate(data)
+        if errors:
+            raise RegistryError("Данные водителя заполнены неверно.", errors)
+        driver_id = data.get("driver_id") or str(uuid.uuid4())
+        data = self._store_photo(data)
+        photo_hash = self._photo_hash(data)
+        if photo_hash is not None:
+            similar = self.similar_photos(photo_hash, exclude=driver_id)
+            if similar:
+                message = PHOTO_DUPLICATE_MESSAGE.format(owner=similar[0]["driver_id"])
+                raise RegistryError(message, {"photo_path": message}, status=409)
+        data = dict(data, photo_hash=photo_hash)
+        with self.pool.connection() as store:
+            try:
+                store.save_driver(driver_id, data)
+            except DuplicateKeyError as e:
+                raise RegistryError(str(e), {"passport": str(e)}, status=409)
+            photos = store.driver_photo_hashes([driver_id])
+            names = store.driver_full_names([driver_id])
+        self.driver_cache.invalidate([driver_id])
+        self._index_photos(photos)
+        self._index_names(names)
+        self._remember(PASSPORT, [data.get("passport")])
+        return driver_id
+
+    @timed("registry.save_drivers")
+    def save_drivers(self, items, profile="driver"):
+        """Пакетное сохранение. Невалидные записи, дубликаты паспортов и фото пропускаются и возвращаются в errors."""
+        invalid = dict(get_validator(profile).validate_batch(items))
+        candidates = []
+        for index, data in enumerate(items):
+            if index not in invalid:
+                candidates.append((index, data.get("driver_id") or str(uuid.uuid4()), data))
+        candidates = self._check_photos(candidates, invalid)
+        filters = (self.bloom(), None)
+        with self.pool.connection() as store:
+            # Проверка и запись в одной транзакции: номер не займут между ними.
+            # Если фильтр устарел (номер записан другим процессом), запись
+            # остановит база, и пачка проверяется заново без фильтра
+            for bloom in filters:
+                errors = dict(invalid)
+                saved = {}
+                try:
+                    with store.transaction():
+                        with_passport = [entry for entry in candidates if entry[2].get("passport")]
+                        duplicates = find_duplicates(
+                            store, PASSPORT, [(data["passport"], driver_id) for _, driver_id, data in with_passport],
+                            bloom,
+                        )
+                        for position, owner in duplicates.items():
+                            index, _, data = with_passport[position]
+                            errors[index] = {"passport": duplicate_message(PASSPORT, data["passport"], owner)}
+                        rows = []
+                        for index, driver_id, data in candidates:
+                            if index not in errors:
+                                rows.append((driver_id, data))
+                                saved[index] = driver_id
+                        if rows:
+                            store.save_drivers(rows, bloom)
+                    break
+                except DuplicateKeyError:
+                    if bloom is None:
+                        raise
+            photos = store.driver_photo_hashes([driver_id for driver_id, _ in rows])
+            names = store.driver_full_names([driver_id for driver_id, _ in rows])
+        self.driver_cache.invalidate(saved.values())
+        self._index_photos(photos)
+        self._index_names(names)
+        self._remember(PASSPORT, [data.get("passport") for _, data in rows])
+        return {"saved": saved, "errors": errors}
+
+    def get_driver(self, driver_id):
+        driver = self.driver_cache.get(driver_id, self._load_driver)
+        if driver is None:
+            raise RegistryError("Водитель с таким ID не найден.", status=404)
+        return driver
+
+    def _load_driver(self, driver_id):
+        with self.pool.connection() as store:
+            driver = store.get_driver(driver_id)
+            if driver is None:
+                return None
+            driver["licenses"] = store.get_licenses(driver_id)
+        return DriverRecord.from_dict(driver)
+
+    def cache_stats(self):
+        return {"drivers": self.driver_cache.stats()}
+
+    @timed("registry.page_drivers")
+    def page_drivers(self, columns, sort="last_name", descending=False, after=None, limit=200, last_name_prefix=""):
+        with self.pool.connection() as store:
+            return store.page_drivers(columns, sort, descending, after, limit, last_name_prefix)
+
+    # --- Поиск по ФИО ---
+
+    def name_index(self):
+        """Индекс ФИО; дочитывает водителей, добавленных другими процессами."""
+        with self.name_lock:
+            with self.pool.connection() as store:
+                if self._name_index is None:
+                    from name_index import NameIndex
+                    self._name_index = NameIndex()
+                self._name_index.refresh(store)
+            return self._name_index
+
+    def _index_names(self, rows):
+        # Как _index_photos: сохраненные водители [(id, фамилия, имя, отчество)]
+        # вносятся сразу, в том числе с исправленным ФИО
+        with self.name_lock:
+            if self._name_index is None:
+                return
+            for row in rows:
+                self._name_index.add(*row)
+
+    @timed("registry.search_drivers")
+    def search_drivers(self, last_name="", first_name="", middle_name="", limit=20):
+        """Водители с ФИО, близким к запросу (опечатки, латиница, ё/е).
+
+        Возвращает [{"driver_id", "last_name", "first_name", "middle_name", "score"}]
+        по возрастанию score — суммы числа правок по заполненным полям запроса.
+        """
+        if not (last_name or first_name or middle_name):
+            raise RegistryError("Укажите фамилию, имя или отчество.")
+        index = self.name_index()
+        with self.name_lock:
+            found = index.search(last_name, first_name, middle_name, limit)
+        columns = ("driver_id", "last_name", "first_name", "middle_name")
+        with self.pool.connection() as store:
+            rows = {row[0]: row[1:] for row in store.drivers_by_ids([item_id for _, item_id in found], columns)}
+        return [
+            dict(zip(columns, rows[item_id]), score=score)
+            for score, item_id in found
+            if item_id in rows
+        ]
+
+    # --- Похожие фото ---
+
+    def _photo_hash(self, data):
+        """Хеш фото, принятого в хранилище; None — фото нет или его не прочитать.
+
+        Хеш считается здесь по файлу хранилища, а присланный с данными не
+        используется: иначе проверку похожих фото можно обойти, подставив
+        произвольное значение.
+        """
+        from photo_hash import dhash, to_signed
+        from photo_store import photo_key
+
+        key = photo_key(data.get("photo_path"))
+        if key is None or key not in self.photo_store:
+            return None
+        try:
+            return to_signed(dhash(self.photo_store.resolve(key)))
+        except (OSError, ValueError):
+            return None
+
+    def _check_photos(self, candidates, errors):
+        """Кандидаты пачки [(индекс, GUID, данные)] с посчитанными хешами фото.
+
+        Фото, похожие на фото другого водителя в базе или раньше в пачке,
+        записываются в errors и из пачки исключаются.
+        """
+        from photo_hash import PhotoHashIndex
+
+        batch = PhotoHashIndex()
+        owners = []
+        checked = []
+        for index, driver_id, data in candidates:
+            try:
+                data = self._store_photo(data)
+            except RegistryError as e:
+                errors[index] = e.errors
+                continue
+            photo_hash = self._photo_hash(data)
+            if photo_hash is not None:
+                similar = [entry["driver_id"] for entry in self.similar_photos(photo_hash, exclude=driver_id)]
+                similar += [owners[number] for _, number in batch.search(photo_hash) if owners[number] != driver_id]
+                if similar:
+                    message = PHOTO_DUPLICATE_MESSAGE.format(owner=similar[0])
+                    errors[index] = {"photo_path": message}
+                    continue
+                batch.add(len(owners), photo_hash)
+                owners.append(driver_id)
+            checked.append((index, driver_id, dict(data, photo_hash=photo_hash)))
+        return checked
+
+    def _store_photo(self, data):
+        """Данные с ключом фото в хранилище вместо пути к исходнику инспектора."""
+        path = data.get("photo_path")
+        if not path or not os.path.isfile(path):
+            return data
+        try:
+            key = self.photo_store.add_file(path)
+        except (OSError, ValueError) as e:
+            raise RegistryError(str(e), {"photo_path": str(e)})
+        return dict(data, photo_path=key)
+
+    @timed("registry.add_photo")
+    def add_photo(self, content):
+        """Принять фото (содержимое файла). Возвращает {"key"} — значение для photo_path."""
+        try:
+            key = self.photo_store.add_bytes(content)
+        except ValueError as e:
+            raise RegistryError(str(e), {"photo_path": str(e)})
+        return {"key": key}
+
+    def photo_view(self, key):
+        """Контекст с memoryview содержимого фото из хранилища (mmap).
+
+        key — ключ фото или photo_path записи со старым путем в хранилище.
+        """
+        from photo_store import photo_key
+
+        key = photo_key(key)
+        if key is None or key not in self.photo_store:
+            raise RegistryError("Фото не найдено.", status=404)
+        return self.photo_store.view(key)
+
+    def photo_bytes(self, key):
+        with self.photo_view(key) as data:
+            return bytes(data)
+
+    def photo_savings(self):
+        return self.photo_store.stats()
+
+    def photo_index(self):
+        """Индекс хешей фото; дочитывает водителей, добавленных другими процессами."""
+        with self.photo_lock:
+            with self.pool.connection() as store:
+                if self._photo_index is None:
+                    from photo_hash import PhotoHashIndex
+                    self._photo_index = PhotoHashIndex()
+                self._photo_index.refresh(store)
+            return self._photo_index
+
+    def _index_photos(self, photos):
+        # Сохраненные через этот реестр водители [(id, GUID, хеш)] вносятся
+        # в индекс сразу, в том числе со смененным или удаленным фото.
+        # Вызывается без занятого соединения: photo_index() берет соединение под photo_lock
+        with self.photo_lock:
+            if self._photo_index is None:
+                return
+            for item_id, _, photo_hash in photos:
+                if photo_hash is None:
+                    self._photo_index.discard(item_id)
+                else:
+                    self._photo_index.add(item_id, photo_hash)
+
+    def similar_photos(self, photo_hash, distance=None, exclude=None):
+        """Водители с похожим фото: [{"driver_id", "distance"}] по возрастанию расстояния.
+
+        photo_hash — число или 16 шестнадцатеричных цифр; exclude — GUID, который не учитывается.
+        """
+        from photo_hash import PHOTO_DISTANCE, parse_hash
+
+        try:
+            value = parse_hash(photo_hash)
+        except ValueError as e:
+            raise RegistryError(str(e))
+        if value is None:
+            raise RegistryError("Не указан хеш фото.")
+        index = self.photo_index()
+        with self.photo_lock:
+            found = index.search(value, PHOTO_DISTANCE if distance is None else distance)
+        with self.pool.connection() as store:
+            owners = dict(store.drivers_by_ids([item_id for _, item_id in found], ("driver_id",)))
+        return [
+            {"driver_id": owners[item_id], "distance": found_distance}
+            for found_distance, item_id in found
+            if item_id in owners and owners[item_id] != exclude
+        ]
+
+    # --- Водительские удостоверения ---
+
+    @timed("registry.register_license")
+    def register_license(self, data):
+        errors = get_validator("license").validate(data)
+        if errors:
+            if all(data.get(field) for field in errors):
+                raise RegistryError("\n".join(errors.values()), errors)
+            raise RegistryError("Все поля должны быть заполнены!", errors)
+        # Проверка до взятия соединения: при промахе кеш сам берет соединение из пула
+        if self.driver_cache.get(data["driver_id"], self._load_driver) is None:
+            raise RegistryError("Водитель с таким ID не найден. Добавьте его в систему.", status=404)
+        data = self._store_photo(data)
+        with self.pool.connection() as store:
+            try:
+                store.add_license(data["driver_id"], data)
+            except DuplicateKeyError as e:
+                raise RegistryError(str(e), {"license_number": str(e)}, status=409)
+        self.driver_cache.invalidate([data["driver_id"]])
+        self._remember(LICENSE, [data["license_number"]])
+
+    @timed("registry.register_licenses")
+    def register_licenses(self, items):
+        invalid = dict(get_validator("license").validate_batch(items))
+        items = list(items)
+        for index, data in enumerate(items):
+            if index not in invalid:
+                try:
+                    items[index] = self._store_photo(data)
+                except RegistryError as e:
+                    invalid[index] = e.errors
+        filters = (self.bloom(), None)
+        with self.pool.connection() as store:
+            for bloom in filters:
+                errors = dict(invalid)
+                try:
+                    with store.transaction():
+                        known = store.existing_driver_ids(
+                            data["driver_id"] for index, data in enumerate(items) if index not in errors
+                        )
+                        found = []
+                        for index, data in enumerate(items):
+                            if index in errors:
+                                continue
+                            if data["driver_id"] not in known:
+                                errors[index] = {"driver_id": "Водитель с таким ID не найден."}
+                                continue
+                            found.append((index, data))
+                        duplicates = find_duplicates(
+                            store, LICENSE, [(data["license_number"], data["driver_id"]) for _, data in found], bloom
+                        )
+                        rows = []
+                        for position, (index, data) in enumerate(found):
+                            owner = duplicates.get(position)
+                            if owner:
+                                message = duplicate_message(LICENSE, data["license_number"], owner)
+                                errors[index] = {"license_number": message}
+                                continue
+                            rows.append((data["driver_id"], data))
+                        if rows:
+                            store.add_licenses(rows, bloom)
+                    break
+                except DuplicateKeyError:
+                    if bloom is None:
+                        raise
+        self.driver_cache.invalidate({driver_id for driver_id, _ in rows})
+        self._remember(LICENSE, [data["license_number"] for _, data in rows])
+        return {"saved": len(rows), "errors": errors}
+
+    # --- Уникальность номеров ---
+
+    def find_owner(self, kind, value):
+        """GUID водителя, за которым уже зарегистрирован паспорт или номер ВУ (None — свободен)."""
+        if kind not in KINDS:
+            raise RegistryError(f"Неизвестный вид номера: {kind}")
+        with self.pool.connection() as store:
+            return store.key_owner(kind, value)
+
+    def bloom(self):
+        with self.bloom_lock:
+            if self._bloom is None:
+                with self.pool.connection() as store:
+                    self._bloom = BloomFilter.from_store(store)
+            return self._bloom
+
+    def _remember(self, kind, values):
+        # Фильтр пополняется номерами, записанными через этот реестр. Номера,
+        # записанные другими процессами, ловит проверка в самой базе
+        with self.bloom_lock:
+            if self._bloom is not None:
+                for value in values:
+                    if value:
+                        self._bloom.add_hash(key_hash(kind, value))
+
+    def licenses_expiring(self, first, last, columns=EXPIRY_KEY_COLUMNS, after=None, limit=1000):
+        """ВУ, срок действия которых заканчивается с first по last включительно.
+
+        Даты — строки ДД.ММ.ГГГГ / ГГГГ-ММ-ДД или числа ГГГГММДД. Страница строк
+        (id, expiry_day, *columns); after — (expiry_day, id) последней строки.
+        """
+        with self.pool.connection() as store:
+            return store.licenses_by_expiry(_day(first), _day(last), columns, after, limit)
+
+    def invalid_licenses(self, on=None, columns=EXPIRY_KEY_COLUMNS, after=None, limit=1000):
+        """ВУ, недействительные на дату on (по умолчанию сегодня): срок истек или не указан."""
+        day = _day(on) if on is not None else today()
+        with self.pool.connection() as store:
+            return store.licenses_by_expiry(UNKNOWN_DAY, day - 1, columns, after, limit)
+
+    # --- Категории ---
+
+    def _query_categories(self, expression, level):
+        # Индекс читается из файла при первом запросе и дочитывает новые ВУ
+        # из базы перед каждым запросом, в том числе записанные другими процессами
+        with self.category_lock:
+            with self.pool.connection() as store:
+                if self._category_index is None:
+                    from category_index import CategoryIndex
+                    self._category_index = CategoryIndex.open(store, index_path(self.pool.path))
+                else:
+                    self.category_unsaved += self._category_index.refresh(store)
+            try:
+                return self._category_index.query(expression, level)
+            except ValueError as e:
+                raise RegistryError(str(e))
+
+    def drivers_by_categories(self, expression, columns=DRIVER_CATEGORY_COLUMNS, after=0, limit=200):
+        """Водители, у которых есть ВУ с категориями по выражению ("C & CE & !D").
+
+        Возвращает {"count": всего найдено, "rows": [(id, *columns)]}; after — id
+        последней строки предыдущей страницы.
+        """
+        found = self._query_categories(expression, "drivers")
+        with self.pool.connection() as store:
+            rows = store.drivers_by_ids(found.page(after, limit), columns)
+        return {"count": len(found), "rows": rows}
+
+    def licenses_by_categories(self, expression, columns=LICENSE_CATEGORY_COLUMNS, after=0, limit=200):
+        found = self._query_categories(expression, "licenses")
+        with self.pool.connection() as store:
+            rows = store.licenses_by_ids(found.page(after, limit), columns)
+        return {"count": len(found), "rows": rows}
+
+    # --- Вход ---
+
+    @timed("registry.authenticate")
+    def authenticate(self, login, password, client=None):
+        """Проверка пароля с учетом блокировки.
+
+        checked=False означает, что пароль не проверялся из-за действующей блокировки.
+        Учетные записи создаются только командой credentials.py add.
+        """
+        if not len(self.credentials):
+            raise RegistryError("Нет ни одной учетной записи. Добавьте инспектора: python credentials.py add <логин>",
+                                status=503)
+        limiter = self.limiter
+        remaining = limiter.check_login(login, client)
+        if remaining:
+            return {"ok": False, "checked": False, "locked_for": remaining, "attempts_left": 0}
+        if self.credentials.verify(login, password):
+            limiter.login_succeeded(login, client)
+            return {"ok": True, "checked": True, "locked_for": 0, "attempts_left": limiter.max_failures}
+        locked_for, attempts_left = limiter.login_failed(login, client)
+        return {"ok": False, "checked": True, "locked_for": locked_for, "attempts_left": attempts_left}
+
+
+def _day(value):
+    if isinstance(value, int):
+        return value
+    day = parse_day(value)
+    if day == UNKNOWN_DAY:
+        raise RegistryError(f"Неверная дата: {value}")
+    return day
+
+
+def connect(url=None, **local_options):
+    """Клиент сервиса, если задан адрес (аргументом или SESSIA_SERVICE_URL), иначе локальный реестр.
+
+    local_options передаются в Registry и для удаленного сервиса не используются.
+    """
+    url = url or os.environ.get(SERVICE_URL_ENV)
+    if url:
+        from client import RegistryClient
+        return RegistryClient(url)
+    return Registry(**local_options)
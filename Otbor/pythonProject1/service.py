@@ -0,0 +1,436 @@
+"""HTTP/JSON-сервис реестра на asyncio.
+
+    python service.py --host 127.0.0.1 --port 8765 --workers 8
+
+Все маршруты с данными реестра требуют токен сессии из ответа /auth/login
+в заголовке Authorization: Bearer <токен>. Без входа доступны только
+/health, /auth/login и /metrics с /cache/stats: в них лишь счетчики и
+времена, без данных водителей, и их должен читать сборщик замеров.
+
+Маршруты:
+    GET  /health
+    POST /auth/login        {"login", "password"}   {"ok", ..., "token" при успехе}
+    POST /drivers           {"data", "profile"?}
+    POST /drivers/batch     {"items", "profile"?}
+    GET  /drivers           ?columns=&sort=&descending=&limit=&prefix=&after=
+    GET  /drivers/<GUID>
+    GET  /photos/similar    ?hash=<16 hex>&distance=&exclude=<GUID>
+    POST /photos            содержимое файла фото (image/jpeg, image/png)   {"key"}
+    GET  /photos/savings
+    GET  /photos/<key>      фото из хранилища (image/jpeg)
+    POST /licenses          {"data"}
+    POST /licenses/batch    {"items"}
+    GET  /licenses/expiring ?from=&to=&columns=&after=&limit=
+    GET  /licenses/invalid  ?on=&columns=&after=&limit=
+    GET  /unique/<passport|license>?value=   {"owner": GUID или null}
+    GET  /drivers/by-categories   ?q=C%20%26%20CE%20%26%20!D&columns=&after=&limit=
+    GET  /licenses/by-categories  ?q=&columns=&after=&limit=
+    GET  /metrics           замеры в формате Prometheus (?format=json — в JSON), см. metrics.py
+    GET  /sync/state        ?peer=<узел>   {"node", "received"}
+    GET  /sync/changes      ?after=&peer=&limit=   сжатая пачка изменений (sync.py)
+    POST /sync/changes      сжатая пачка изменений другого узла   итоги применения
+
+Окна подключаются к сервису, если задана переменная SESSIA_SERVICE_URL.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import re
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.parse import parse_qs, urlsplit
+
+from metrics import PROMETHEUS_CONTENT_TYPE, metrics, start_from_env
+from registry import DRIVER_CATEGORY_COLUMNS, LICENSE_CATEGORY_COLUMNS, Registry, RegistryError
+from storage import DB_PATH
+
+MAX_BODY = 64 * 1024 * 1024
+
+# Срок сессии после входа — рабочая смена
+SESSION_TTL = 12 * 3600
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class FileResponse:
+    """Ответ не в JSON: memoryview содержимого, его тип и закрытие источника после отправки."""
+
+    def __init__(self, view, content_type, close=None):
+        self.view = view
+        self.content_type = content_type
+        self.close = close
+
+
+class Sessions:
+    """Токены сессий, выданные при входе: токен -> (логин, срок действия).
+
+    Используется только из цикла событий, поэтому без блокировок.
+    """
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self.tokens = {}
+
+    def issue(self, login):
+        now = time.monotonic()
+        # Истекшие сессии убираются при выдаче новых
+        self.tokens = {token: item for token, item in self.tokens.items() if item[1] > now}
+        token = secrets.token_urlsafe(32)
+        self.tokens[token] = (login, now + self.ttl)
+        return token
+
+    def login_for(self, authorization):
+        """Логин по заголовку Authorization: Bearer <токен>; None — сессии нет или она истекла."""
+        scheme, _, token = (authorization or "").partition(" ")
+        item = self.tokens.get(token.strip()) if scheme.lower() == "bearer" else None
+        if item is None or item[1] <= time.monotonic():
+            return None
+        return item[0]
+
+
+class RegistryService:
+    def __init__(self, registry, workers=8, auth_workers=2):
+        self.registry = registry
+        self.sessions = Sessions()
+        # Маршруты, доступные без входа
+        self.public = {self.health, self.cache_stats, self.export_metrics, self.login}
+        # Операции с базой и медленный KDF идут в разных пулах,
+        # чтобы наплыв входов не задерживал сохранение и чтение
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="registry")
+        self.auth_executor = ThreadPoolExecutor(max_workers=auth_workers, thread_name_prefix="auth")
+        self.routes = [
+            ("GET", re.compile(r"/health"), self.health),
+            ("GET", re.compile(r"/cache/stats"), self.cache_stats),
+            ("GET", re.compile(r"/metrics"), self.export_metrics),
+            ("POST", re.compile(r"/auth/login"), self.login),
+            ("POST", re.compile(r"/drivers/batch"), self.save_drivers),
+            ("POST", re.compile(r"/drivers"), self.save_driver),
+            ("GET", re.compile(r"/drivers"), self.page_drivers),
+            ("GET", re.compile(r"/unique/(passport|license)"), self.find_owner),
+            ("GET", re.compile(r"/photos/similar"), self.similar_photos),
+            ("POST", re.compile(r"/photos"), self.add_photo),
+            ("GET", re.compile(r"/photos/savings"), self.photo_savings),
+            ("GET", re.compile(r"/photos/([0-9a-f]{32})"), self.get_photo),
+            ("GET", re.compile(r"/drivers/by-categories"), self.drivers_by_categories),
+            ("GET", re.compile(r"/drivers/search"), self.search_drivers),
+            ("GET", re.compile(r"/drivers/([0-9a-fA-F-]+)"), self.get_driver),
+            ("POST", re.compile(r"/licenses/batch"), self.register_licenses),
+            ("POST", re.compile(r"/licenses"), self.register_license),
+            ("GET", re.compile(r"/licenses/expiring"), self.licenses_expiring),
+            ("GET", re.compile(r"/licenses/invalid"), self.invalid_licenses),
+            ("GET", re.compile(r"/licenses/by-categories"), self.licenses_by_categories),
+            ("GET", re.compile(r"/sync/state"), self.sync_state),
+            ("GET", re.compile(r"/sync/changes"), self.sync_changes),
+            ("POST", re.compile(r"/sync/changes"), self.apply_sync_changes),
+        ]
+
+    def close(self):
+        self.executor.shutdown()
+        self.auth_executor.shutdown()
+
+    async def run_blocking(self, function, *args, executor=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor or self.executor, functools.partial(function, *args))
+
+    async def run_as(self, request, function, *args):
+        """run_blocking для изменений: в журнал пишется логин из сессии запроса."""
+        def call():
+            with self.registry.acting(request["login"]):
+                return function(*args)
+
+        return await self.run_blocking(call)
+
+    # --- Обработчики ---
+
+    async def health(self, request):
+        return {"status": "ok"}
+
+    async def cache_stats(self, request):
+        return self.registry.cache_stats()
+
+    async def export_metrics(self, request):
+        if request["query"].get("format") == "json":
+            return metrics.snapshot()
+        return FileResponse(memoryview(metrics.prometheus_text().encode("utf-8")), PROMETHEUS_CONTENT_TYPE)
+
+    async def login(self, request):
+        body = request["json"]
+        result = await self.run_blocking(
+            self.registry.authenticate, body["login"], body["password"], request["client"],
+            executor=self.auth_executor,
+        )
+        if result["ok"]:
+            result["token"] = self.sessions.issue(body["login"])
+        return result
+
+    async def save_driver(self, request):
+        body = request["json"]
+        driver_id = await self.run_as(request, self.registry.save_driver, body["data"], body.get("profile", "driver"))
+        return {"driver_id": driver_id}
+
+    async def save_drivers(self, request):
+        body = request["json"]
+        return await self.run_as(request, self.registry.save_drivers, body["items"], body.get("profile", "driver"))
+
+    async def get_driver(self, request, driver_id):
+        driver = await self.run_blocking(self.registry.get_driver, driver_id)
+        return driver.to_dict()
+
+    async def page_drivers(self, request):
+        query = request["query"]
+        after = json.loads(query["after"]) if query.get("after") else None
+        rows = await self.run_blocking(
+            self.registry.page_drivers,
+            tuple(filter(None, query.get("columns", "last_name").split(","))),
+            query.get("sort", "last_name"),
+            query.get("descending") == "1",
+            tuple(after) if after else None,
+            min(int(query.get("limit", 200)), 5000),
+            query.get("prefix", ""),
+        )
+        return {"rows": rows}
+
+    async def register_license(self, request):
+        await self.run_as(request, self.registry.register_license, request["json"]["data"])
+        return {"status": "ok"}
+
+    async def register_licenses(self, request):
+        return await self.run_as(request, self.registry.register_licenses, request["json"]["items"])
+
+    async def licenses_expiring(self, request):
+        query = request["query"]
+        rows = await self.run_blocking(
+            self.registry.licenses_expiring, query["from"], query["to"], *_expiry_page(query)
+        )
+        return {"rows": rows}
+
+    async def invalid_licenses(self, request):
+        query = request["query"]
+        rows = await self.run_blocking(self.registry.invalid_licenses, query.get("on"), *_expiry_page(query))
+        return {"rows": rows}
+
+    async def find_owner(self, request, kind):
+        owner = await self.run_blocking(self.registry.find_owner, kind, request["query"]["value"])
+        return {"owner": owner}
+
+    async def similar_photos(self, request):
+        query = request["query"]
+        distance = int(query["distance"]) if query.get("distance") else None
+        rows = await self.run_blocking(self.registry.similar_photos, query.get("hash"), distance, query.get("exclude"))
+        return {"rows": rows}
+
+    async def add_photo(self, request):
+        return await self.run_blocking(self.registry.add_photo, request["body"])
+
+    async def photo_savings(self, request):
+        return await self.run_blocking(self.registry.photo_savings)
+
+    async def get_photo(self, request, key):
+        # Проверка, открытие файла и mmap идут в пуле потоков,
+        # в цикле событий остается только отправка
+        view, close = await self.run_blocking(self._open_photo, key)
+        return FileResponse(view, "image/jpeg", close)
+
+    def _open_photo(self, key):
+        stack = ExitStack()
+        return stack.enter_context(self.registry.photo_view(key)), stack.close
+
+    async def drivers_by_categories(self, request):
+        return await self.run_blocking(
+            self.registry.drivers_by_categories, *_categories_page(request["query"], DRIVER_CATEGORY_COLUMNS)
+        )
+
+    async def search_drivers(self, request):
+        query = request["query"]
+        rows = await self.run_blocking(
+            self.registry.search_drivers,
+            query.get("last_name", ""),
+            query.get("first_name", ""),
+            query.get("middle_name", ""),
+            min(int(query.get("limit", 20)), 200),
+        )
+        return {"rows": rows}
+
+    async def licenses_by_categories(self, request):
+        return await self.run_blocking(
+            self.registry.licenses_by_categories, *_categories_page(request["query"], LICENSE_CATEGORY_COLUMNS)
+        )
+
+    async def sync_state(self, request):
+        return await self.run_blocking(self.registry.sync_state, request["query"].get("peer", ""))
+
+    async def sync_changes(self, request):
+        query = request["query"]
+        payload = await self.run_blocking(
+            self.registry.sync_changes, int(query.get("after", 0)), query.get("peer", ""),
+            min(int(query.get("limit", 1000)), 10000),
+        )
+        return FileResponse(memoryview(payload), "application/octet-stream")
+
+    async def apply_sync_changes(self, request):
+        return await self.run_as(request, self.registry.apply_sync_changes, request["body"])
+
+    # --- HTTP ---
+
+    async def dispatch(self, method, target, body, client, content_type="application/json", authorization=None):
+        url = urlsplit(target)
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(url.path)
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            login = None
+            if handler not in self.public:
+                login = self.sessions.login_for(authorization)
+                if login is None:
+                    return 401, {"error": "Требуется вход: сессия не найдена или истекла."}
+            request = {
+                "query": {key: values[-1] for key, values in parse_qs(url.query).items()},
+                "json": json.loads(body) if body and content_type.startswith("application/json") else {},
+                "body": body,
+                "client": client,
+                "login": login,
+            }
+            with metrics.timer(f"service.{handler.__name__}"):
+                return 200, await handler(request, *match.groups())
+        if allowed:
+            return 405, {"error": "Метод не поддерживается."}
+        return 404, {"error": "Маршрут не найден."}
+
+    async def handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        client = peer[0] if peer else None
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {"error": "Неверный заголовок Content-Length."}, close=True)
+                    break
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": "Слишком большой запрос."}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = await self.dispatch(
+                        method, target, body, client, headers.get("content-type", "application/json"),
+                        headers.get("authorization"),
+                    )
+                except RegistryError as e:
+                    status, payload = e.status, {"error": e.message, "errors": e.errors}
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload = 400, {"error": f"Неверный запрос: {e}"}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                await self.respond(writer, status, payload, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, close=False):
+        if isinstance(payload, FileResponse):
+            # Содержимое отображенного в память файла передается транспорту
+            # без копирования. Отображение можно закрыть только после отправки
+            # всего буфера, поэтому на время ответа drain() ждет пустого буфера
+            transport = writer.transport
+            low, high = transport.get_write_buffer_limits()
+            transport.set_write_buffer_limits(0)
+            try:
+                data = payload.view
+                writer.write(self.head(status, payload.content_type, len(data), close))
+                writer.write(data)
+                await writer.drain()
+            finally:
+                transport.set_write_buffer_limits(high, low)
+                if payload.close is not None:
+                    payload.close()
+            return
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(self.head(status, "application/json; charset=utf-8", len(data), close) + data)
+        await writer.drain()
+
+    @staticmethod
+    def head(status, content_type, length, close):
+        return (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {length}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        ).encode("latin-1")
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def _expiry_page(query):
+    # columns, after, limit выборок по сроку действия ВУ
+    columns = tuple(filter(None, query.get("columns", "driver_id,license_number").split(",")))
+    after = tuple(json.loads(query["after"])) if query.get("after") else None
+    return columns, after, min(int(query.get("limit", 1000)), 10000)
+
+
+def _categories_page(query, default_columns):
+    # выражение, columns, after, limit запросов по категориям
+    columns = tuple(filter(None, query.get("columns", "").split(","))) or default_columns
+    return query["q"], columns, int(query.get("after", 0)), min(int(query.get("limit", 200)), 10000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP-сервис реестра водителей")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, default=8, help="Потоков и соединений с базой")
+    parser.add_argument("--auth-workers", type=int, default=2, help="Потоков для проверки паролей")
+    args = parser.parse_args(argv)
+
+    # Замеры включаются переменной SESSIA_METRICS=1 (metrics.py)
+    start_from_env()
+    registry = Registry(args.db, pool_size=args.workers)
+    service = RegistryService(registry, args.workers, args.auth_workers)
+    print(f"Сервис реестра: http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        registry.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
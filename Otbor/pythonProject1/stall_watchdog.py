@@ -0,0 +1,92 @@
+"""Обнаружение зависаний GUI-потока Qt.
+
+Таймер в GUI-потоке каждые HEARTBEAT_MS отмечает, что цикл событий жив;
+задержка отметки сверх интервала попадает в гистограмму qt.event_loop_lag.
+Фоновый поток следит за отметкой: если ее нет дольше порога, он снимает
+стек GUI-потока — это код, который держит цикл событий. Когда цикл
+оживает, зависание с этим стеком записывается в события qt_stall
+(metrics.py) и выводится в stderr.
+
+    SESSIA_METRICS=1 SESSIA_STALL_MS=300 python hash.py
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+
+from PyQt5.QtCore import QObject, QTimer
+
+from metrics import metrics, start_from_env
+
+STALL_ENV = "SESSIA_STALL_MS"
+STALL_MS = 200
+HEARTBEAT_MS = 50
+
+
+class StallWatchdog(QObject):
+    """Создается и запускается в GUI-потоке."""
+
+    def __init__(self, parent=None, threshold_ms=STALL_MS, heartbeat_ms=HEARTBEAT_MS):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.interval = heartbeat_ms / 1000
+        self.thread_id = threading.get_ident()
+        self.histogram = metrics.histogram("qt.event_loop_lag")
+        self.last_beat = time.monotonic()
+        # Стек GUI-потока, снятый во время текущего зависания
+        self.stack = None
+        self.stopped = threading.Event()
+        self.timer = QTimer(self)
+        self.timer.setInterval(heartbeat_ms)
+        self.timer.timeout.connect(self._beat)
+
+    def start(self):
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+        self.timer.start()
+        threading.Thread(target=self._watch, name="stall-watchdog", daemon=True).start()
+
+    def stop(self):
+        self.timer.stop()
+        self.stopped.set()
+
+    def _beat(self):
+        now = time.monotonic()
+        lag = max(now - self.last_beat - self.interval, 0.0)
+        self.last_beat = now
+        self.histogram.observe_ns(int(lag * 1e9))
+        if lag > self.threshold:
+            stack, self.stack = self.stack, None
+            self._report(lag, stack)
+
+    def _watch(self):
+        # Стек снимается один раз за зависание — в момент, когда порог превышен
+        captured = None
+        while not self.stopped.wait(self.interval):
+            beat = self.last_beat
+            if beat != captured and time.monotonic() - beat - self.interval > self.threshold:
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    self.stack = "".join(traceback.format_stack(frame))
+                captured = beat
+
+    def _report(self, lag, stack):
+        metrics.event("qt_stall", {
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "seconds": round(lag, 3),
+            "stack": stack or "",
+        })
+        print(f"GUI-поток не отвечал {lag * 1000:.0f} мс", file=sys.stderr)
+        if stack:
+            print(stack, file=sys.stderr, end="")
+
+
+def instrument_gui(app):
+    """Замеры по переменным окружения (metrics.start_from_env) и, если они включены, сторож зависаний."""
+    if not start_from_env():
+        return None
+    watchdog = StallWatchdog(app, int(os.environ.get(STALL_ENV) or STALL_MS))
+    watchdog.start()
+    return watchdog
@@ -0,0 +1,37 @@
+"""Замер времени запуска: от начала работы скрипта до первой отрисовки окна входа.
+
+Запуск: python hash.py --startup-time (или authorization.py)
+"""
+import sys
+import time
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+
+
+def startup_time_requested():
+    return "--startup-time" in sys.argv
+
+
+class _FirstPaint(QObject):
+    def __init__(self, app, started):
+        super().__init__()
+        self.app = app
+        self.started = started
+        self.done = False
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and not self.done:
+            self.done = True
+            elapsed = (time.perf_counter() - self.started) * 1000
+            modules = len(sys.modules)
+            print(f"Первая отрисовка окна входа: {elapsed:.1f} мс (загружено модулей: {modules})")
+            QTimer.singleShot(0, self.app.quit)
+        return False
+
+
+def measure_first_paint(app, window, started):
+    """Выводит время до первой отрисовки window и завершает приложение."""
+    watcher = _FirstPaint(app, started)
+    window.installEventFilter(watcher)
+    window._first_paint_watcher = watcher
+    return watcher
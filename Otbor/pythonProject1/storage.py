@@ -0,0 +1,1095 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from categories import parse_categories
+from dates import parse_day
+from journal import ABORT, DRIVERS, LICENSE_PHOTOS, LICENSES, REMOVE, Journal, journal_path, recover
+from uniqueness import (
+    LICENSE, PASSPORT, DuplicateKeyError, find_duplicates, is_duplicate, key_hash, normalize, registered_owners,
+    unique_key,
+)
+
+# Путь к базе данных по умолчанию
+DB_PATH = "drivers.db"
+
+# Ограничение SQLite на число параметров в одном запросе
+MAX_PARAMS = 500
+
+# Поля водителя в порядке столбцов таблицы
+DRIVER_FIELDS = (
+    "driver_id", "last_name", "first_name", "middle_name", "dob", "passport",
+    "registration_city", "registration_address", "living_city", "living_address",
+    "workplace", "position", "phone", "email", "photo_path", "notes",
+)
+
+# Перцептивный хеш фото водителя (photo_hash.py), считается при выборе фото;
+# NULL — хеш еще не посчитан
+DRIVER_DERIVED_FIELDS = ("photo_hash",)
+
+# Поля водительского удостоверения
+LICENSE_FIELDS = (
+    "driver_id", "license_number", "issue_date", "expiry_date",
+    "issuing_authority", "vehicle_categories", "photo_path",
+)
+
+# Поля ВУ, вычисляемые при записи: даты числами ГГГГММДД (dates.py)
+# и битовая маска категорий (categories.py)
+LICENSE_DERIVED_FIELDS = ("issue_day", "expiry_day", "categories")
+
+# Столбцы выборок по сроку действия по умолчанию
+EXPIRY_KEY_COLUMNS = ("driver_id", "license_number")
+
+# Все допустимые столбцы выборок: поля ВУ и контакты водителя для уведомлений
+EXPIRY_COLUMNS = (
+    "driver_id", "license_number", "issue_date", "expiry_date", "issuing_authority",
+    "vehicle_categories", "last_name", "first_name", "middle_name", "phone", "email",
+)
+
+# Столбцы, по которым список водителей сортируется по индексу
+SORTABLE_COLUMNS = ("last_name", "passport", "phone", "id")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drivers (
+    id INTEGER PRIMARY KEY,
+    driver_id TEXT NOT NULL UNIQUE,
+    last_name TEXT NOT NULL DEFAULT '',
+    first_name TEXT NOT NULL DEFAULT '',
+    middle_name TEXT NOT NULL DEFAULT '',
+    dob TEXT NOT NULL DEFAULT '',
+    passport TEXT NOT NULL DEFAULT '',
+    registration_city TEXT NOT NULL DEFAULT '',
+    registration_address TEXT NOT NULL DEFAULT '',
+    living_city TEXT NOT NULL DEFAULT '',
+    living_address TEXT NOT NULL DEFAULT '',
+    workplace TEXT NOT NULL DEFAULT '',
+    position TEXT NOT NULL DEFAULT '',
+    phone TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    photo_path TEXT NOT NULL DEFAULT '',
+    notes TEXT NOT NULL DEFAULT '',
+    photo_hash INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_drivers_passport ON drivers(passport);
+CREATE INDEX IF NOT EXISTS idx_drivers_last_name ON drivers(last_name);
+CREATE INDEX IF NOT EXISTS idx_drivers_phone ON drivers(phone);
+
+CREATE TABLE IF NOT EXISTS licenses (
+    id INTEGER PRIMARY KEY,
+    driver_id TEXT NOT NULL REFERENCES drivers(driver_id),
+    license_number TEXT NOT NULL,
+    issue_date TEXT NOT NULL DEFAULT '',
+    expiry_date TEXT NOT NULL DEFAULT '',
+    issuing_authority TEXT NOT NULL DEFAULT '',
+    vehicle_categories TEXT NOT NULL DEFAULT '',
+    photo_path TEXT NOT NULL DEFAULT '',
+    issue_day INTEGER NOT NULL DEFAULT 0,
+    expiry_day INTEGER NOT NULL DEFAULT 0,
+    categories INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_licenses_driver ON licenses(driver_id);
+CREATE INDEX IF NOT EXISTS idx_licenses_number ON licenses(license_number);
+
+-- Занятые паспорта и номера ВУ (uniqueness.py): ключ — 64-битный хеш номера
+CREATE TABLE IF NOT EXISTS unique_keys (
+    key_hash INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    driver_id TEXT NOT NULL,
+    PRIMARY KEY (key_hash, key)
+) WITHOUT ROWID;
+
+-- Записи журнала (journal.py), примененные к базе, после последнего снимка.
+-- keys — JSON-список GUID водителей или номеров ВУ записи
+CREATE TABLE IF NOT EXISTS journal_applied (
+    seq INTEGER PRIMARY KEY,
+    op TEXT NOT NULL,
+    keys TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS journal_state (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+-- Синхронизация узлов (sync.py): последняя версия каждого водителя и ВУ.
+-- key — GUID водителя или ключ номера ВУ (uniqueness.unique_key), row_id — id
+-- строки в drivers или licenses, seq — номер изменения на этом узле,
+-- stamp и node — версия (время в мс и узел, где сделано изменение),
+-- created и creator — самая ранняя известная версия записи, via — узел,
+-- от которого изменение получено ('' — сделано здесь)
+CREATE TABLE IF NOT EXISTS sync_log (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL UNIQUE,
+    stamp INTEGER NOT NULL,
+    node TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    creator TEXT NOT NULL,
+    via TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+
+-- node — идентификатор узла, seq — последний номер изменения, stamp — часы узла
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value NOT NULL
+);
+
+-- Номер последнего принятого изменения каждого узла-партнера
+CREATE TABLE IF NOT EXISTS sync_peers (
+    peer TEXT PRIMARY KEY,
+    received INTEGER NOT NULL
+);
+
+-- Записи, проигравшие конфликт номеров при синхронизации: node — узел, где
+-- создана запись, winner — GUID водителя, за которым остался номер, data — JSON записи
+CREATE TABLE IF NOT EXISTS sync_conflicts (
+    id INTEGER PRIMARY KEY,
+    at TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    node TEXT NOT NULL,
+    winner TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+
+-- ВУ, полученные при синхронизации раньше своего водителя (водитель изменен
+-- после ВУ, и его номер в журнале партнера больше); применяются, когда придет водитель
+CREATE TABLE IF NOT EXISTS sync_pending (
+    key TEXT PRIMARY KEY,
+    driver_id TEXT NOT NULL,
+    stamp INTEGER NOT NULL,
+    node TEXT NOT NULL,
+    created INTEGER NOT NULL,
+    creator TEXT NOT NULL,
+    via TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sync_pending_driver ON sync_pending(driver_id);
+
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    source TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    accepted INTEGER NOT NULL,
+    rejected INTEGER NOT NULL
+);
+"""
+
+# Индексы по столбцам, которых может не быть в базах старых версий:
+# создаются после _migrate(). Индекс срока действия покрывающий для
+# EXPIRY_KEY_COLUMNS: выгрузка только этих столбцов не читает саму таблицу.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_licenses_expiry ON licenses(expiry_day, id, driver_id, license_number);
+"""
+
+
+# Запрос id строки записи журнала синхронизации по параметрам из _sync_log
+_SYNC_ROW_QUERIES = {
+    DRIVERS: "SELECT id FROM drivers WHERE driver_id = ?",
+    LICENSES: "SELECT MAX(id) FROM licenses WHERE driver_id = ? AND license_number = ?",
+}
+
+
+def _driver_row(driver_id, data):
+    row = [driver_id]
+    for field in DRIVER_FIELDS[1:]:
+        row.append(data.get(field) or "")
+    row.append(data.get("photo_hash"))
+    return row
+
+
+def _license_row(driver_id, data):
+    row = [driver_id]
+    for field in LICENSE_FIELDS[1:]:
+        row.append(data.get(field) or "")
+    row.append(parse_day(row[2]))
+    row.append(parse_day(row[3]))
+    row.append(parse_categories(row[5], strict=False))
+    return row
+
+
+class DriverStore:
+    """Хранилище водителей и ВУ на SQLite.
+
+    Все таблицы лежат в B-деревьях, поэтому поиск по GUID, номеру ВУ,
+    паспорту, фамилии и телефону выполняется за O(log n).
+
+    С journal каждая запись водителей и ВУ попадает в журнал (journal.py),
+    а транзакция завершается, когда запись журнала на диске. При открытии
+    база согласуется с журналом (recover=False — это делает другое соединение).
+
+    Каждая запись водителей и ВУ получает также номер и версию в журнале
+    синхронизации sync_log (sync.py).
+    """
+
+    def __init__(self, path=DB_PATH, journal=None, recover_journal=True):
+        self.path = path
+        self.journal = journal
+        # Номера записей журнала текущей транзакции
+        self.journal_seqs = []
+        self.replaying = False
+        # Версия применяемого чужого изменения (sync.py); None — изменение этого узла
+        self.incoming = None
+        self.recovered = (0, 0)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        # WAL + synchronous=NORMAL: читатели не блокируются, фиксация не ждет диска. Последние
+        # транзакции при сбое питания могут потеряться; с журналом их восстанавливает recover()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.conn.executescript(SCHEMA)
+        self._migrate(tables)
+        self.conn.executescript(INDEXES)
+        if journal is not None and recover_journal:
+            self.recovered = recover(self, journal)
+
+    def _migrate(self, tables):
+        """Привести базу старой версии к текущей схеме; tables — таблицы до создания схемы."""
+        self.conn.create_function("parse_day", 1, parse_day, deterministic=True)
+        self.conn.create_function(
+            "parse_categories", 1, lambda text: parse_categories(text, strict=False), deterministic=True
+        )
+        self.conn.create_function("unique_key", 2, unique_key, deterministic=True)
+        self.conn.create_function("key_hash", 2, key_hash, deterministic=True)
+
+        # Вычисляемые столбцы ВУ заполняются из сохраненных строк
+        licenses = {row[1] for row in self.conn.execute("PRAGMA table_info(licenses)")}
+        missing = [field for field in LICENSE_DERIVED_FIELDS if field not in licenses]
+        if missing:
+            sources = {
+                "issue_day": "parse_day(issue_date)",
+                "expiry_day": "parse_day(expiry_date)",
+                "categories": "parse_categories(vehicle_categories)",
+            }
+            with self.transaction():
+                for field in missing:
+                    self.conn.execute(f"ALTER TABLE licenses ADD COLUMN {field} INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute(
+                    "UPDATE licenses SET " + ", ".join(f"{field} = {sources[field]}" for field in missing)
+                )
+
+        drivers = {row[1] for row in self.conn.execute("PRAGMA table_info(drivers)")}
+        if "photo_hash" not in drivers:
+            # Хеши фото старых записей считает photo_hash.py index
+            with self.transaction():
+                self.conn.execute("ALTER TABLE drivers ADD COLUMN photo_hash INTEGER")
+
+        # Занятые номера: при повторах в старой базе номер закрепляется за первой записью
+        if "drivers" in tables and "unique_keys" not in tables:
+            with self.transaction():
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO unique_keys "
+                    "SELECT key_hash(?1, passport), unique_key(?1, passport), driver_id "
+                    "FROM drivers WHERE passport != '' ORDER BY id",
+                    (PASSPORT,),
+                )
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO unique_keys "
+                    "SELECT key_hash(?1, license_number), unique_key(?1, license_number), driver_id "
+                    "FROM licenses WHERE license_number != '' ORDER BY id",
+                    (LICENSE,),
+                )
+
+        # Узел синхронизации создается при первом открытии базы
+        if self.conn.execute("SELECT 1 FROM sync_state WHERE name = 'node'").fetchone() is None:
+            with self.transaction():
+                if self.conn.execute("SELECT 1 FROM sync_state WHERE name = 'node'").fetchone() is None:
+                    self._init_sync()
+
+    def _init_sync(self):
+        # Записи, сделанные до этого, попадают в журнал синхронизации с нулевой версией
+        node = uuid.uuid4().hex
+        drivers = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM drivers").fetchone()[0]
+        licenses = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM licenses").fetchone()[0]
+        self.conn.execute(
+            "INSERT INTO sync_log SELECT ?1, driver_id, id, id, 0, ?2, 0, ?2, '' FROM drivers", (DRIVERS, node)
+        )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO sync_log "
+            "SELECT ?1, unique_key(?2, license_number), id, ?3 + id, 0, ?4, 0, ?4, '' "
+            "FROM licenses WHERE license_number != '' ORDER BY id",
+            (LICENSES, LICENSE, drivers, node),
+        )
+        self.conn.executemany(
+            "INSERT INTO sync_state VALUES (?, ?)", (("node", node), ("seq", drivers + licenses), ("stamp", 0))
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def transaction(self):
+        """Контекст одной транзакции: все изменения внутри фиксируются разом."""
+        return _Transaction(self)
+
+    # --- Водители ---
+
+    def save_driver(self, driver_id, data):
+        self.save_drivers([(driver_id, data)])
+
+    def save_drivers(self, items, bloom=None):
+        """Пакетная вставка или обновление водителей одной транзакцией.
+
+        Паспорт должен быть свободен или принадлежать тому же водителю,
+        иначе DuplicateKeyError. bloom — фильтр занятых номеров (uniqueness.py).
+        """
+        rows = [_driver_row(driver_id, data) for driver_id, data in items]
+        columns = ", ".join(DRIVER_FIELDS + DRIVER_DERIVED_FIELDS)
+        placeholders = ", ".join("?" * (len(DRIVER_FIELDS) + len(DRIVER_DERIVED_FIELDS)))
+        updates = ", ".join(f"{field} = excluded.{field}" for field in DRIVER_FIELDS[1:])
+        # Без нового хеша старый сохраняется, если фото не сменилось
+        updates += (
+            ", photo_hash = COALESCE(excluded.photo_hash, "
+            "CASE WHEN excluded.photo_path = drivers.photo_path THEN drivers.photo_hash END)"
+        )
+        passport = DRIVER_FIELDS.index("passport")
+        with self.transaction():
+            # Паспорт, смененный при обновлении, освобождается
+            previous = dict(self._lookup_many(
+                "SELECT driver_id, passport FROM drivers WHERE driver_id IN ({})", (row[0] for row in rows)
+            ))
+            released = [
+                (previous[row[0]], row[0]) for row in rows
+                if previous.get(row[0]) and normalize(PASSPORT, previous[row[0]]) != normalize(PASSPORT, row[passport])
+            ]
+            self._release_keys(PASSPORT, released)
+            self._claim_keys(PASSPORT, [(row[passport], row[0]) for row in rows if row[passport]], bloom)
+            self.conn.executemany(
+                f"INSERT INTO drivers ({columns}) VALUES ({placeholders}) "
+                f"ON CONFLICT(driver_id) DO UPDATE SET {updates}",
+                rows,
+            )
+            fields = DRIVER_FIELDS + DRIVER_DERIVED_FIELDS
+            self._journal(DRIVERS, [(row[0], dict(zip(fields[1:], row[1:]))) for row in rows],
+                          [row[0] for row in rows])
+            self._sync_log(DRIVERS, [(row[0], (row[0],)) for row in rows])
+
+    def get_driver(self, driver_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM drivers WHERE driver_id = ?", (driver_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def has_driver(self, driver_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM drivers WHERE driver_id = ?", (driver_id,)
+            ).fetchone()
+        return row is not None
+
+    def find_by_passport(self, passport):
+        return self._find_drivers("passport", passport)
+
+    def find_by_last_name(self, last_name):
+        return self._find_drivers("last_name", last_name)
+
+    def find_by_phone(self, phone):
+        return self._find_drivers("phone", phone)
+
+    def _find_drivers(self, column, value):
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM drivers WHERE {column} = ?", (value,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def existing_driver_ids(self, driver_ids):
+        return {row[0] for row in self._lookup_many("SELECT driver_id FROM drivers WHERE driver_id IN ({})", driver_ids)}
+
+    def _lookup_many(self, query, values):
+        values = list(set(values))
+        rows = []
+        with self.lock:
+            for start in range(0, len(values), MAX_PARAMS):
+                chunk = values[start:start + MAX_PARAMS]
+                rows.extend(self.conn.execute(query.format(", ".join("?" * len(chunk))), chunk).fetchall())
+        return rows
+
+    # --- Уникальность паспортов и номеров ВУ ---
+
+    def key_owners(self, kind, values):
+        """{нормализованный номер: GUID владельца} для занятых номеров из списка."""
+        wanted = {unique_key(kind, value): value for value in values}
+        hashes = [key_hash(kind, value) for value in wanted.values()]
+        prefix = len(kind) + 1
+        return {
+            key[prefix:]: owner
+            for key, owner in self._lookup_many("SELECT key, driver_id FROM unique_keys WHERE key_hash IN ({})", hashes)
+            if key in wanted
+        }
+
+    def key_owner(self, kind, value):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT driver_id FROM unique_keys WHERE key_hash = ? AND key = ?",
+                (key_hash(kind, value), unique_key(kind, value)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def count_unique_keys(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM unique_keys").fetchone()[0]
+
+    def iter_key_hashes(self, page_size=100000):
+        """Все хеши занятых номеров по возрастанию, постранично."""
+        after = None
+        while True:
+            with self.lock:
+                if after is None:
+                    rows = self.conn.execute(
+                        "SELECT key_hash FROM unique_keys ORDER BY key_hash LIMIT ?", (page_size,)
+                    ).fetchall()
+                else:
+                    rows = self.conn.execute(
+                        "SELECT key_hash FROM unique_keys WHERE key_hash > ? ORDER BY key_hash LIMIT ?",
+                        (after, page_size),
+                    ).fetchall()
+            for row in rows:
+                yield row[0]
+            if len(rows) < page_size:
+                return
+            after = rows[-1][0]
+
+    def _claim_keys(self, kind, items, bloom=None):
+        """Занять номера [(номер, GUID)]; вызывается внутри транзакции записи.
+
+        При дубликате бросает DuplicateKeyError, и транзакция откатывается.
+        С фильтром Блума номера, которых нет в фильтре, вставляются без
+        предварительного поиска; если фильтр устарел, дубликат все равно
+        остановит первичный ключ unique_keys.
+        """
+        owners = registered_owners(self, kind, items, bloom)
+        for index, owner in owners.items():
+            if is_duplicate(kind, owner, items[index][1]):
+                raise DuplicateKeyError(kind, items[index][0], owner)
+        rows = [
+            (key_hash(kind, value), unique_key(kind, value), driver_id)
+            for index, (value, driver_id) in enumerate(items) if index not in owners
+        ]
+        self.conn.execute("SAVEPOINT claim_keys")
+        try:
+            self.conn.executemany("INSERT INTO unique_keys VALUES (?, ?, ?)", rows)
+        except sqlite3.IntegrityError:
+            self.conn.execute("ROLLBACK TO claim_keys")
+            self.conn.execute("RELEASE claim_keys")
+            index, owner = next(iter(find_duplicates(self, kind, items).items()))
+            raise DuplicateKeyError(kind, items[index][0], owner)
+        self.conn.execute("RELEASE claim_keys")
+
+    def _release_keys(self, kind, items):
+        self.conn.executemany(
+            "DELETE FROM unique_keys WHERE key_hash = ? AND key = ? AND driver_id = ?",
+            [(key_hash(kind, value), unique_key(kind, value), driver_id) for value, driver_id in items],
+        )
+
+    # --- Хеши фото ---
+
+    def photo_hashes(self, after_id=0, limit=100000):
+        """Строки (id водителя, хеш фото) с id больше after_id, по возрастанию."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, photo_hash FROM drivers WHERE id > ? AND photo_hash IS NOT NULL ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+
+    def driver_photo_hashes(self, driver_ids):
+        """Строки (id, GUID, хеш фото или None) для указанных водителей."""
+        return self._lookup_many("SELECT id, driver_id, photo_hash FROM drivers WHERE driver_id IN ({})", driver_ids)
+
+    # --- ФИО для поиска ---
+
+    def full_names(self, after_id=0, limit=100000):
+        """Строки (id, фамилия, имя, отчество) водителей с id больше after_id, по возрастанию."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, last_name, first_name, middle_name FROM drivers WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+
+    def driver_full_names(self, driver_ids):
+        """Строки (id, фамилия, имя, отчество) для указанных GUID."""
+        return self._lookup_many(
+            "SELECT id, last_name, first_name, middle_name FROM drivers WHERE driver_id IN ({})", driver_ids
+        )
+
+    def drivers_without_photo_hash(self, after_id=0, limit=5000):
+        """Строки (id, photo_path) водителей с фото, но без хеша."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, photo_path FROM drivers "
+                "WHERE id > ? AND photo_hash IS NULL AND photo_path != '' ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+
+    def set_photo_hashes(self, rows):
+        """Записать хеши [(хеш, id водителя)].
+
+        Хеши попадают в журнал изменений, но не в журнал синхронизации: хеш
+        не передается другим узлам, а новая версия записи перебила бы
+        настоящую правку водителя на другом узле.
+        """
+        with self.transaction():
+            self.conn.executemany("UPDATE drivers SET photo_hash = ? WHERE id = ?", rows)
+            self._log_drivers([item_id for _, item_id in rows], sync=False)
+
+    def _log_drivers(self, ids, sync=True):
+        # Текущее состояние измененных водителей — в журнал и журнал синхронизации
+        rows = self._lookup_many("SELECT * FROM drivers WHERE id IN ({})", ids)
+        fields = DRIVER_FIELDS + DRIVER_DERIVED_FIELDS
+        self._journal(DRIVERS, [(row["driver_id"], {field: row[field] for field in fields[1:]}) for row in rows],
+                      [row["driver_id"] for row in rows])
+        if sync:
+            self._sync_log(DRIVERS, [(row["driver_id"], (row["driver_id"],)) for row in rows])
+
+    def page_drivers(self, columns, sort="last_name", descending=False, after=None, limit=200, last_name_prefix=""):
+        """Страница водителей с пагинацией по ключу (без OFFSET).
+
+        Строка результата: (id, значение столбца сортировки, *columns).
+        after — пара (значение сортировки, id) последней строки предыдущей страницы.
+        """
+        if sort not in SORTABLE_COLUMNS:
+            raise ValueError(f"Сортировка по столбцу {sort} не поддерживается")
+        unknown = set(columns) - set(DRIVER_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы: {', '.join(sorted(unknown))}")
+        order = "DESC" if descending else "ASC"
+        compare = "<" if descending else ">"
+        where = []
+        params = []
+        if last_name_prefix:
+            where.append("last_name >= ? AND last_name < ?")
+            params += [last_name_prefix, last_name_prefix + "\U0010ffff"]
+        if after is not None:
+            if sort == "id":
+                where.append(f"id {compare} ?")
+                params.append(after[1])
+            else:
+                where.append(f"({sort}, id) {compare} (?, ?)")
+                params += list(after)
+        query = f"SELECT id, {sort}, {', '.join(columns)} FROM drivers"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY {sort} {order}, id {order} LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return [tuple(row) for row in self.conn.execute(query, params)]
+
+    def count_drivers(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM drivers").fetchone()[0]
+
+    # --- Водительские удостоверения ---
+
+    def add_license(self, driver_id, data):
+        self.add_licenses([(driver_id, data)])
+
+    def add_licenses(self, items, bloom=None):
+        """Пакетная вставка ВУ одной транзакцией; занятый номер ВУ — DuplicateKeyError."""
+        rows = [_license_row(driver_id, data) for driver_id, data in items]
+        columns = ", ".join(LICENSE_FIELDS + LICENSE_DERIVED_FIELDS)
+        placeholders = ", ".join("?" * (len(LICENSE_FIELDS) + len(LICENSE_DERIVED_FIELDS)))
+        with self.transaction():
+            self._claim_keys(LICENSE, [(row[1], row[0]) for row in rows if row[1]], bloom)
+            self.conn.executemany(
+                f"INSERT INTO licenses ({columns}) VALUES ({placeholders})", rows
+            )
+            self._journal(LICENSES, [(row[0], dict(zip(LICENSE_FIELDS[1:], row[1:]))) for row in rows],
+                          [row[1] for row in rows])
+            self._sync_log(LICENSES, [(unique_key(LICENSE, row[1]), (row[0], row[1])) for row in rows if row[1]])
+
+    def get_licenses(self, driver_id):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM licenses WHERE driver_id = ? ORDER BY id", (driver_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def find_license(self, license_number):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM licenses WHERE license_number = ?", (license_number,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def licenses_by_expiry(self, first_day, last_day, columns=EXPIRY_KEY_COLUMNS, after=None, limit=1000):
+        """Страница ВУ со сроком действия в [first_day, last_day] (числа ГГГГММДД).
+
+        Строки упорядочены по (expiry_day, id) и возвращаются кортежами
+        (id, expiry_day, *columns). after — (expiry_day, id) последней строки
+        предыдущей страницы. Запрос идет по диапазону индекса idx_licenses_expiry,
+        поэтому время зависит от размера страницы, а не от числа ВУ в базе.
+        ВУ с неразобранной датой окончания имеют expiry_day = 0.
+        """
+        unknown = set(columns) - set(EXPIRY_COLUMNS)
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы: {', '.join(sorted(unknown))}")
+        select = "".join(f", l.{column}" if column in LICENSE_FIELDS else f", d.{column}" for column in columns)
+        # Водитель присоединяется, только если нужны его контакты
+        join = ""
+        if any(column not in LICENSE_FIELDS for column in columns):
+            join = "LEFT JOIN drivers AS d ON d.driver_id = l.driver_id "
+        # Нижняя граница — одно условие: при двух SQLite может начать поиск
+        # по индексу с first_day и на каждой странице пропускать уже выданные строки
+        if after is None:
+            where = "l.expiry_day >= ?"
+            params = [first_day]
+        else:
+            where = "(l.expiry_day, l.id) > (?, ?)"
+            params = list(after)
+        params.extend((last_day, limit))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT l.id, l.expiry_day{select} "
+                f"FROM licenses AS l INDEXED BY idx_licenses_expiry {join}"
+                f"WHERE {where} AND l.expiry_day <= ? ORDER BY l.expiry_day, l.id LIMIT ?",
+                params,
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def iter_licenses_by_expiry(self, first_day, last_day, columns=EXPIRY_KEY_COLUMNS, page_size=10000):
+        """Все ВУ диапазона постранично; блокировка соединения снимается между страницами."""
+        after = None
+        while True:
+            rows = self.licenses_by_expiry(first_day, last_day, columns, after, page_size)
+            yield from rows
+            if len(rows) < page_size:
+                return
+            after = rows[-1][1], rows[-1][0]
+
+    def count_licenses_by_expiry(self, first_day, last_day):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM licenses WHERE expiry_day BETWEEN ? AND ?", (first_day, last_day)
+            ).fetchone()[0]
+
+    def license_categories(self, after_id=0, limit=100000):
+        """Строки (id ВУ, id водителя, маска категорий) с id ВУ больше after_id, по возрастанию."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT l.id, d.id, l.categories FROM licenses AS l "
+                "JOIN drivers AS d ON d.driver_id = l.driver_id "
+                "WHERE l.id > ? ORDER BY l.id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+
+    def max_license_id(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM licenses").fetchone()[0]
+
+    def drivers_by_ids(self, ids, columns):
+        """Строки (id, *columns) водителей с указанными внутренними id, по возрастанию id."""
+        return self._rows_by_ids("drivers", DRIVER_FIELDS, ids, columns)
+
+    def licenses_by_ids(self, ids, columns):
+        return self._rows_by_ids("licenses", LICENSE_FIELDS, ids, columns)
+
+    def _rows_by_ids(self, table, fields, ids, columns):
+        unknown = set(columns) - set(fields)
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы: {', '.join(sorted(unknown))}")
+        select = "".join(", " + column for column in columns)
+        rows = []
+        ids = list(ids)
+        with self.lock:
+            for start in range(0, len(ids), MAX_PARAMS):
+                chunk = ids[start:start + MAX_PARAMS]
+                rows.extend(self.conn.execute(
+                    f"SELECT id{select} FROM {table} WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+        rows.sort(key=lambda row: row[0])
+        return [tuple(row) for row in rows]
+
+    # --- Пути к фото ---
+
+    def photo_paths(self, table, after_id=0, limit=1000):
+        """Строки (id, photo_path) водителей или ВУ с фото, по возрастанию id."""
+        if table not in ("drivers", "licenses"):
+            raise ValueError(f"Неизвестная таблица: {table}")
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT id, photo_path FROM {table} WHERE id > ? AND photo_path != '' ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+
+    def set_photo_paths(self, table, rows):
+        """Заменить пути к фото [(путь, id)].
+
+        Как и любая правка, замена попадает в журнал изменений и в журнал
+        синхронизации, чтобы другие узлы получили новые пути.
+        """
+        if table not in ("drivers", "licenses"):
+            raise ValueError(f"Неизвестная таблица: {table}")
+        with self.transaction():
+            if table == "drivers":
+                self.conn.executemany("UPDATE drivers SET photo_path = ? WHERE id = ?", rows)
+                self._log_drivers([item_id for _, item_id in rows])
+                return
+            paths = dict((item_id, path) for path, item_id in rows)
+            licenses = self._lookup_many("SELECT id, driver_id, license_number FROM licenses WHERE id IN ({})", paths)
+            self.set_license_photos([[row[1], row[2], paths[row[0]]] for row in licenses])
+
+    def set_license_photos(self, items):
+        """Заменить фото ВУ: [GUID, номер ВУ, photo_path] (операция журнала LICENSE_PHOTOS)."""
+        with self.transaction():
+            self.conn.executemany(
+                "UPDATE licenses SET photo_path = ? WHERE driver_id = ? AND license_number = ?",
+                [(photo_path, driver_id, license_number) for driver_id, license_number, photo_path in items],
+            )
+            self._journal(LICENSE_PHOTOS, items, [item[:2] for item in items])
+            self._sync_log(LICENSES, [
+                (unique_key(LICENSE, license_number), (driver_id, license_number))
+                for driver_id, license_number, _ in items if license_number
+            ])
+
+    # --- Журнал изменений ---
+
+    def _journal(self, op, items, keys):
+        # Вызывается внутри транзакции: порядок номеров журнала совпадает с порядком фиксаций
+        if self.journal is None or self.replaying or not items:
+            return
+        seq = self.journal.append(op, items)
+        self.conn.execute("INSERT INTO journal_applied VALUES (?, ?, ?)", (seq, op, json.dumps(keys, ensure_ascii=False)))
+        self.journal_seqs.append(seq)
+
+    def journal_state(self):
+        """Номер последней записи журнала, вошедшей в снимок базы."""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM journal_state WHERE name = 'snapshot_seq'").fetchone()
+        return row[0] if row else 0
+
+    def applied_seqs(self, after_seq=0):
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT seq FROM journal_applied WHERE seq > ?", (after_seq,))}
+
+    def applied_entries(self, after_seq):
+        """(номер, операция, ключи) примененных записей с номером больше after_seq."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT seq, op, keys FROM journal_applied WHERE seq > ? ORDER BY seq", (after_seq,)
+            ).fetchall()
+        return [(seq, op, json.loads(keys)) for seq, op, keys in rows]
+
+    def replay(self, record):
+        """Применить запись журнала, которой нет в базе."""
+        if record.op == DRIVERS:
+            keys = [item[0] for item in record.items]
+        elif record.op == LICENSES:
+            keys = [item[1]["license_number"] for item in record.items]
+        elif record.op == LICENSE_PHOTOS:
+            keys = [item[:2] for item in record.items]
+        else:
+            keys = record.items
+        self.replaying = True
+        try:
+            try:
+                with self.transaction():
+                    if record.op == DRIVERS:
+                        self.save_drivers(record.items)
+                    elif record.op == LICENSES:
+                        self.add_licenses(record.items)
+                    elif record.op == REMOVE:
+                        self.remove_records(record.items)
+                    elif record.op == LICENSE_PHOTOS:
+                        self.set_license_photos(record.items)
+                    self._mark_applied(record.seq, record.op, keys)
+            except DuplicateKeyError:
+                # Номер занят записью, примененной раньше: запись отклоняется, как и при работе
+                with self.transaction():
+                    self._mark_applied(record.seq, ABORT, keys)
+        finally:
+            self.replaying = False
+
+    def _mark_applied(self, seq, op, keys):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO journal_applied VALUES (?, ?, ?)", (seq, op, json.dumps(keys, ensure_ascii=False))
+        )
+
+    def rejournal(self, seq, op, keys):
+        """Дописать в журнал текущее состояние записей, изменение которых не дошло до журнала."""
+        with self.transaction():
+            self.conn.execute("DELETE FROM journal_applied WHERE seq = ?", (seq,))
+            if op == DRIVERS:
+                rows = self._lookup_many("SELECT * FROM drivers WHERE driver_id IN ({})", keys)
+                fields = DRIVER_FIELDS + DRIVER_DERIVED_FIELDS
+            elif op == LICENSES:
+                rows = self._lookup_many("SELECT * FROM licenses WHERE license_number IN ({})", keys)
+                fields = LICENSE_FIELDS
+            elif op == REMOVE:
+                # Удаленных строк нет, ключи записи и есть ее содержимое
+                self._journal(REMOVE, keys, keys)
+                return
+            elif op == LICENSE_PHOTOS:
+                items = []
+                for driver_id, license_number in keys:
+                    row = self.conn.execute(
+                        "SELECT photo_path FROM licenses WHERE driver_id = ? AND license_number = ? "
+                        "ORDER BY id DESC LIMIT 1", (driver_id, license_number),
+                    ).fetchone()
+                    if row is not None:
+                        items.append([driver_id, license_number, row[0]])
+                self._journal(LICENSE_PHOTOS, items, keys)
+                return
+            else:
+                return
+            self._journal(op, [(row["driver_id"], {field: row[field] for field in fields[1:]}) for row in rows],
+                          keys)
+
+    def mark_snapshot(self, journal):
+        """Отметить в базе, что все записи журнала до текущей входят в снимок. Возвращает номер."""
+        with self.transaction():
+            # Под блокировкой записи все выданные номера журнала уже зафиксированы или откачены
+            seq = journal.last_seq
+            self.conn.execute("INSERT OR REPLACE INTO journal_state VALUES ('snapshot_seq', ?)", (seq,))
+            self.conn.execute("DELETE FROM journal_applied WHERE seq <= ?", (seq,))
+        return seq
+
+    def backup(self, path):
+        """Согласованная копия базы (снимок) в файл path."""
+        target = sqlite3.connect(path)
+        try:
+            with self.lock:
+                self.conn.backup(target)
+        finally:
+            target.close()
+
+    # --- Синхронизация узлов (sync.py) ---
+
+    def _sync_log(self, kind, items):
+        # Вызывается внутри транзакции записи. items — [(ключ, параметры запроса id строки)].
+        # Версия изменения этого узла — по часам узла, которые не идут назад
+        # и не отстают от уже виденных чужих версий
+        if not items:
+            return
+        state = dict(self.conn.execute("SELECT name, value FROM sync_state").fetchall())
+        seq = state["seq"]
+        if self.incoming is None:
+            stamp = max(int(time.time() * 1000), state["stamp"] + 1)
+            version = (stamp, state["node"], stamp, state["node"], "")
+        else:
+            version = self.incoming
+            stamp = max(state["stamp"], version[0])
+        rows = []
+        for key, params in items:
+            seq += 1
+            rows.append((kind, key, *params, seq, *version))
+        # Время создания — наименьшее из известных, чтобы все узлы пришли к одному
+        self.conn.executemany(
+            f"INSERT INTO sync_log VALUES (?, ?, ({_SYNC_ROW_QUERIES[kind]}), ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(kind, key) DO UPDATE SET row_id = excluded.row_id, seq = excluded.seq, "
+            "stamp = excluded.stamp, node = excluded.node, via = excluded.via, "
+            "creator = CASE WHEN (excluded.created, excluded.creator) < (sync_log.created, sync_log.creator) "
+            "THEN excluded.creator ELSE sync_log.creator END, "
+            "created = MIN(sync_log.created, excluded.created)",
+            rows,
+        )
+        self.conn.executemany("UPDATE sync_state SET value = ? WHERE name = ?", ((seq, "seq"), (stamp, "stamp")))
+
+    def sync_node(self):
+        """Идентификатор узла синхронизации этой базы."""
+        with self.lock:
+            return self.conn.execute("SELECT value FROM sync_state WHERE name = 'node'").fetchone()[0]
+
+    def sync_entries(self, after, peer="", limit=1000):
+        """Записи журнала синхронизации с номером больше after, кроме полученных от peer или сделанных им.
+
+        Возвращает (номер, до которого просмотрен журнал, есть ли еще записи,
+        [(seq, kind, key, row_id, stamp, node, created, creator)]).
+        """
+        where = "seq > ? AND seq <= ?"
+        if peer:
+            where += " AND via != ? AND node != ?"
+        with self.lock:
+            # Номер читается до записей: изменения, зафиксированные между запросами, войдут в следующую пачку
+            last = self.conn.execute("SELECT value FROM sync_state WHERE name = 'seq'").fetchone()[0]
+            params = [after, last] + ([peer, peer] if peer else []) + [limit]
+            rows = self.conn.execute(
+                "SELECT seq, kind, key, row_id, stamp, node, created, creator FROM sync_log "
+                f"WHERE {where} ORDER BY seq LIMIT ?",
+                params,
+            ).fetchall()
+        rows = [tuple(row) for row in rows]
+        more = len(rows) == limit
+        return (rows[-1][0] if more else last), more, rows
+
+    def sync_version(self, kind, key):
+        """(stamp, node, created, creator) записи или None, если ее нет в журнале синхронизации."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT stamp, node, created, creator FROM sync_log WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def sync_received(self, peer):
+        with self.lock:
+            row = self.conn.execute("SELECT received FROM sync_peers WHERE peer = ?", (peer,)).fetchone()
+        return row[0] if row else 0
+
+    def set_sync_received(self, peer, seq):
+        with self.transaction():
+            self.conn.execute("INSERT OR REPLACE INTO sync_peers VALUES (?, ?)", (peer, seq))
+
+    def add_sync_conflict(self, kind, key, node, winner, data):
+        with self.transaction():
+            self.conn.execute(
+                "INSERT INTO sync_conflicts (at, kind, key, node, winner, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), kind, key, node, winner,
+                 json.dumps(data, ensure_ascii=False)),
+            )
+
+    def hold_sync_change(self, key, driver_id, version, data):
+        """Отложить ВУ до прихода водителя; из двух версий одной ВУ остается новая."""
+        with self.transaction():
+            self.conn.execute(
+                "INSERT INTO sync_pending VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET driver_id = excluded.driver_id, stamp = excluded.stamp, "
+                "node = excluded.node, created = excluded.created, creator = excluded.creator, "
+                "via = excluded.via, data = excluded.data "
+                "WHERE (excluded.stamp, excluded.node) > (sync_pending.stamp, sync_pending.node)",
+                (key, driver_id, *version, json.dumps(data, ensure_ascii=False)),
+            )
+
+    def held_sync_changes(self, driver_id):
+        """Отложенные ВУ водителя: [(ключ, версия, данные)]."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, stamp, node, created, creator, via, data FROM sync_pending WHERE driver_id = ?",
+                (driver_id,),
+            ).fetchall()
+        return [(row[0], tuple(row[1:6]), json.loads(row[6])) for row in rows]
+
+    def release_sync_changes(self, keys):
+        with self.transaction():
+            self.conn.executemany("DELETE FROM sync_pending WHERE key = ?", [(key,) for key in keys])
+
+    def sync_conflicts(self, after_id=0, limit=100):
+        """Строки конфликтов с id больше after_id: словари с разобранным data."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM sync_conflicts WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+            ).fetchall()
+        return [dict(row, data=json.loads(row["data"])) for row in rows]
+
+    def remove_records(self, items):
+        """Удалить водителей со всеми ВУ или отдельные ВУ: [(GUID, номер ВУ или '')].
+
+        Номера освобождаются, записи уходят из журнала синхронизации.
+        """
+        items = [list(item) for item in items]
+        with self.transaction():
+            for driver_id, license_number in items:
+                licenses = self.conn.execute(
+                    "SELECT id, license_number FROM licenses WHERE driver_id = ?", (driver_id,)
+                ).fetchall()
+                if license_number:
+                    wanted = normalize(LICENSE, license_number)
+                    licenses = [row for row in licenses if normalize(LICENSE, row[1]) == wanted]
+                self.conn.executemany("DELETE FROM licenses WHERE id = ?", [(row[0],) for row in licenses])
+                self._release_keys(LICENSE, [(row[1], driver_id) for row in licenses])
+                self.conn.executemany(
+                    "DELETE FROM sync_log WHERE kind = ? AND key = ?",
+                    [(LICENSES, unique_key(LICENSE, row[1])) for row in licenses],
+                )
+                if license_number:
+                    continue
+                row = self.conn.execute("SELECT passport FROM drivers WHERE driver_id = ?", (driver_id,)).fetchone()
+                if row is None:
+                    continue
+                if row[0]:
+                    self._release_keys(PASSPORT, [(row[0], driver_id)])
+                self.conn.execute("DELETE FROM drivers WHERE driver_id = ?", (driver_id,))
+                self.conn.execute("DELETE FROM sync_log WHERE kind = ? AND key = ?", (DRIVERS, driver_id))
+            self._journal(REMOVE, items, items)
+
+    # --- Контрольные точки массовой загрузки ---
+
+    def get_checkpoint(self, source):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT position, accepted, rejected FROM import_checkpoints WHERE source = ?", (source,)
+            ).fetchone()
+        return tuple(row) if row else (0, 0, 0)
+
+    def set_checkpoint(self, source, position, accepted, rejected):
+        with self.transaction():
+            self.conn.execute(
+                "INSERT OR REPLACE INTO import_checkpoints VALUES (?, ?, ?, ?)",
+                (source, position, accepted, rejected),
+            )
+
+    def clear_checkpoint(self, source):
+        with self.transaction():
+            self.conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
+
+
+class StorePool:
+    """Пул соединений с базой: каждое соединение в один момент занято одним потоком."""
+
+    def __init__(self, path=DB_PATH, size=4, journal=True):
+        self.path = path
+        # Один журнал на все соединения; согласование с базой — при открытии первого
+        self.journal = Journal(journal_path(path)) if journal else None
+        self.stores = [DriverStore(path, self.journal, number == 0) for number in range(size)]
+        self.free = queue.Queue()
+        for store in self.stores:
+            self.free.put(store)
+
+    @contextmanager
+    def connection(self):
+        store = self.free.get()
+        try:
+            yield store
+        finally:
+            self.free.put(store)
+
+    def close(self):
+        for store in self.stores:
+            store.close()
+        if self.journal is not None:
+            self.journal.close()
+
+
+class _Transaction:
+    def __init__(self, store):
+        self.store = store
+        self.nested = False
+
+    def __enter__(self):
+        self.store.lock.acquire()
+        self.nested = self.store.conn.in_transaction
+        if not self.nested:
+            self.store.conn.execute("BEGIN IMMEDIATE")
+        return self.store.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        seqs = []
+        try:
+            if not self.nested:
+                seqs, self.store.journal_seqs = self.store.journal_seqs, []
+                committed = False
+                try:
+                    if exc_type is None:
+                        self.store.conn.execute("COMMIT")
+                        committed = True
+                    else:
+                        self.store.conn.execute("ROLLBACK")
+                finally:
+                    if seqs and not committed:
+                        self.store.journal.append(ABORT, seqs)
+                        seqs = []
+        finally:
+            self.store.lock.release()
+        # Ожидание диска — без блокировки соединения, чтобы записи других
+        # потоков успели войти в ту же группу журнала
+        if seqs:
+            self.store.journal.wait(seqs[-1])
+        return False
@@ -0,0 +1,357 @@
+"""Синхронизация рабочих мест, работающих без связи, с центральным реестром.
+
+Каждое изменение водителя или ВУ получает номер, растущий на каждом узле
+отдельно, и версию: время в мс по часам узла (не меньше уже виденных
+версий) и идентификатор узла. Журнал синхронизации (sync_log в storage.py)
+хранит только последнюю версию каждой записи, поэтому обмен после дня без
+связи передает записи, измененные за этот день, по одному разу, сколько
+бы их ни правили, а не весь реестр.
+
+Обмен идет пачками сжатого JSON (zlib): узел отдает изменения с номером
+больше принятого партнером, кроме полученных от самого партнера или
+сделанных им. Пачка применяется одной транзакцией вместе с номером
+принятого, поэтому при обрыве связи пачка просто передается заново —
+повторное применение ничего не меняет.
+
+Конфликты разрешаются одинаково на всех узлах:
+- одна запись (водитель с тем же GUID, ВУ с тем же номером у того же
+  водителя) изменена на двух узлах — остается версия с большими
+  (время, узел);
+- разные водители с одним паспортом или один номер ВУ у разных водителей —
+  номер остается за записью, созданной раньше (время создания, узел, GUID);
+  проигравшая запись удаляется (водитель — со всеми ВУ) и сохраняется
+  в sync_conflicts для разбора инспектором.
+
+Журнал отдает изменения по номерам, поэтому ВУ может прийти раньше своего
+водителя (водитель изменен после добавления ВУ). Такая ВУ откладывается
+в sync_pending и применяется, когда водитель придет.
+
+Фото передаются путями, сами файлы фото обмен не переносит.
+
+    python sync.py run drivers.db central.db              # две локальные базы
+    python sync.py run drivers.db http://10.0.0.5:8765 --login ivanov   # с центральным сервисом
+    python sync.py conflicts --db drivers.db
+    python sync.py check                                  # проверка на двух временных базах
+"""
+import argparse
+import getpass
+import json
+import sys
+import time
+import zlib
+
+from journal import DRIVERS, LICENSES
+from storage import DB_PATH, DRIVER_FIELDS, LICENSE_FIELDS
+from uniqueness import LICENSE, PASSPORT, normalize
+
+FORMAT_VERSION = 1
+BATCH_SIZE = 1000
+# Предел распакованной пачки: 1000 записей занимают ~0,3 МБ
+MAX_BATCH_BYTES = 64 * 1024 * 1024
+
+
+class SyncError(ValueError):
+    """Пачка изменений не читается, другого формата или не продолжает принятые."""
+
+
+# --- Выдача ---
+
+def export_changes(store, after=0, peer="", limit=BATCH_SIZE):
+    """Сжатая пачка изменений узла с номером больше after для узла peer."""
+    last, more, entries = store.sync_entries(after, peer, limit)
+    drivers = store.drivers_by_ids([entry[3] for entry in entries if entry[1] == DRIVERS], DRIVER_FIELDS)
+    licenses = store.licenses_by_ids([entry[3] for entry in entries if entry[1] == LICENSES], LICENSE_FIELDS)
+    rows = {
+        DRIVERS: (DRIVER_FIELDS, {row[0]: row[1:] for row in drivers}),
+        LICENSES: (LICENSE_FIELDS, {row[0]: row[1:] for row in licenses}),
+    }
+    changes = []
+    for seq, kind, key, row_id, stamp, node, created, creator in entries:
+        fields, found = rows[kind]
+        # Строку могли удалить после чтения журнала: удаление одинаково на всех узлах
+        if row_id in found:
+            changes.append([kind, key, stamp, node, created, creator, dict(zip(fields, found[row_id]))])
+    batch = {
+        "format": FORMAT_VERSION, "node": store.sync_node(), "after": after, "last": last, "more": more,
+        "changes": changes,
+    }
+    return zlib.compress(json.dumps(batch, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(payload):
+    inflater = zlib.decompressobj()
+    try:
+        data = inflater.decompress(payload, MAX_BATCH_BYTES)
+    except zlib.error as e:
+        raise SyncError(f"Пачка изменений не читается: {e}")
+    if inflater.unconsumed_tail:
+        raise SyncError("Пачка изменений слишком большая.")
+    try:
+        batch = json.loads(data)
+    except ValueError as e:
+        raise SyncError(f"Пачка изменений не читается: {e}")
+    if not isinstance(batch, dict) or batch.get("format") != FORMAT_VERSION:
+        raise SyncError("Неизвестный формат пачки изменений.")
+    return batch
+
+
+# --- Применение ---
+
+def apply_changes(store, payload):
+    """Применить пачку export_changes() другого узла.
+
+    Возвращает {"node", "last", "more", "changes", "applied", "skipped",
+    "held", "conflicts", "removed", "drivers"}: skipped — изменения не новее
+    уже известных, held — ВУ, отложенные до прихода водителя, removed —
+    удаленные записи этого узла, drivers — GUID водителей, чьи карточки изменились.
+    """
+    batch = _decode(payload)
+    peer = batch["node"]
+    if peer == store.sync_node():
+        raise SyncError("Пачка изменений этого же узла.")
+    result = {"node": peer, "last": batch["last"], "more": batch["more"], "changes": len(batch["changes"]),
+              "applied": 0, "skipped": 0, "held": 0, "conflicts": 0, "removed": 0, "drivers": set()}
+    with store.transaction():
+        received = store.sync_received(peer)
+        if batch["after"] > received:
+            raise SyncError(f"Пропущены изменения узла {peer}: принято до {received}, пачка после {batch['after']}.")
+        for kind, key, stamp, node, created, creator, data in batch["changes"]:
+            version = (stamp, node, created, creator, peer)
+            if kind == DRIVERS:
+                _apply_driver(store, key, version, data, result)
+            elif kind == LICENSES:
+                _apply_license(store, key, version, data, result)
+        store.set_sync_received(peer, max(received, batch["last"]))
+    result["drivers"] = sorted(result["drivers"])
+    return result
+
+
+def _is_newer(store, kind, key, version):
+    local = store.sync_version(kind, key)
+    return local is None or tuple(version[:2]) > tuple(local[:2])
+
+
+def _created_earlier(store, kind, key, owner, version, driver_id):
+    """Создана ли пришедшая запись раньше записи owner, которой принадлежит номер."""
+    local = store.sync_version(kind, key)
+    # Запись без версии появилась раньше синхронизации
+    theirs = (local[2], local[3], owner) if local else (-1, "", owner)
+    return (version[2], version[3], driver_id) < theirs
+
+
+def _apply_driver(store, driver_id, version, data, result):
+    if not _is_newer(store, DRIVERS, driver_id, version):
+        result["skipped"] += 1
+        return
+    passport = data.get("passport")
+    owner = store.key_owner(PASSPORT, passport) if passport else None
+    if owner and owner != driver_id:
+        if not _created_earlier(store, DRIVERS, owner, owner, version, driver_id):
+            _reject(store, DRIVERS, driver_id, version, owner, data, result)
+            return
+        _remove_driver(store, owner, driver_id, result)
+    store.incoming = version
+    try:
+        store.save_drivers([(driver_id, data)])
+    finally:
+        store.incoming = None
+    result["applied"] += 1
+    result["drivers"].add(driver_id)
+    held = store.held_sync_changes(driver_id)
+    if held:
+        store.release_sync_changes([key for key, _, _ in held])
+        for key, held_version, held_data in held:
+            _apply_license(store, key, held_version, held_data, result)
+
+
+def _apply_license(store, key, version, data, result):
+    driver_id = data["driver_id"]
+    owner = store.key_owner(LICENSE, data["license_number"])
+    # Версии сравниваются только у ВУ того же водителя, номер у разных водителей решает время создания
+    if owner in (None, driver_id) and not _is_newer(store, LICENSES, key, version):
+        result["skipped"] += 1
+        return
+    if not store.has_driver(driver_id):
+        # Водитель еще не пришел или проиграл конфликт паспорта: ВУ ждет его
+        # следующей версии, а в записи конфликта водителя видна инспектору
+        store.hold_sync_change(key, driver_id, version, data)
+        result["held"] += 1
+        return
+    if owner and owner != driver_id:
+        if not _created_earlier(store, LICENSES, key, owner, version, driver_id):
+            _reject(store, LICENSES, key, version, owner, data, result)
+            return
+        store.add_sync_conflict(LICENSES, key, _creator(store, LICENSES, key), driver_id,
+                                [item for item in store.get_licenses(owner) if _same_number(item, data)])
+        result["conflicts"] += 1
+        result["removed"] += 1
+        result["drivers"].add(owner)
+    if owner:
+        # Та же ВУ в новой версии или ВУ проигравшего водителя: строка заменяется
+        store.remove_records([(owner, data["license_number"])])
+    store.incoming = version
+    try:
+        store.add_licenses([(driver_id, data)])
+    finally:
+        store.incoming = None
+    result["applied"] += 1
+    result["drivers"].add(driver_id)
+
+
+def _same_number(item, data):
+    return normalize(LICENSE, item["license_number"]) == normalize(LICENSE, data["license_number"])
+
+
+def _creator(store, kind, key):
+    local = store.sync_version(kind, key)
+    return local[3] if local else ""
+
+
+def _remove_driver(store, driver_id, winner, result):
+    driver = store.get_driver(driver_id)
+    driver["licenses"] = store.get_licenses(driver_id)
+    store.add_sync_conflict(DRIVERS, driver_id, _creator(store, DRIVERS, driver_id), winner, driver)
+    store.remove_records([(driver_id, "")])
+    result["conflicts"] += 1
+    result["removed"] += 1
+    result["drivers"].add(driver_id)
+
+
+def _reject(store, kind, key, version, winner, data, result):
+    if kind == DRIVERS:
+        data = dict(data, licenses=[held for _, _, held in store.held_sync_changes(key)])
+    store.add_sync_conflict(kind, key, version[3], winner, data)
+    result["conflicts"] += 1
+
+
+# --- Обмен ---
+
+def _send(source, target, limit):
+    """Все изменения source, которых еще нет у target. Возвращает итоги передачи."""
+    source_node = source.sync_state()["node"]
+    target_state = target.sync_state(source_node)
+    after = target_state["received"]
+    totals = {"batches": 0, "changes": 0, "bytes": 0, "applied": 0, "skipped": 0, "held": 0, "conflicts": 0}
+    while True:
+        payload = source.sync_changes(after, target_state["node"], limit)
+        result = target.apply_sync_changes(payload)
+        totals["batches"] += 1
+        totals["bytes"] += len(payload)
+        for name in ("changes", "applied", "skipped", "held", "conflicts"):
+            totals[name] += result[name]
+        after = result["last"]
+        if not result["more"]:
+            return totals
+
+
+def synchronize(local, remote, limit=BATCH_SIZE):
+    """Двусторонний обмен изменениями; local и remote — Registry или RegistryClient.
+
+    Возвращает {"sent": итоги, "received": итоги}.
+    """
+    sent = _send(local, remote, limit)
+    received = _send(remote, local, limit)
+    return {"sent": sent, "received": received}
+
+
+# --- Проверка на двух локальных базах ---
+
+def check():
+    """Сценарии обмена между двумя временными базами. Возвращает список ошибок."""
+    import os
+    import tempfile
+
+    from registry import Registry
+    from synthetic import DriverGenerator
+
+    generator = DriverGenerator(1)
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="sessia-sync-") as directory:
+        first = Registry(os.path.join(directory, "first.db"))
+        second = Registry(os.path.join(directory, "second.db"))
+        try:
+            # ВУ добавлена, затем изменен водитель: ВУ идет в журнале раньше водителя.
+            # Пачки по одному изменению — ВУ и водитель приходят в разных пачках
+            driver = generator.driver(1)
+            licenses = driver.pop("licenses")
+            driver_id = first.save_driver(driver, profile="driver_no_city")
+            first.register_licenses([dict(item, driver_id=driver_id) for item in licenses])
+            first.save_driver(dict(driver, driver_id=driver_id, notes="изменен после ВУ"), profile="driver_no_city")
+            synchronize(first, second, limit=1)
+            expected = sorted(item.license_number for item in first.get_driver(driver_id).licenses)
+            received = sorted(item.license_number for item in second.get_driver(driver_id).licenses)
+            if received != expected:
+                failures.append(f"ВУ, добавленная до изменения водителя: ожидались {expected}, получены {received}")
+            if second.sync_conflicts():
+                failures.append("ВУ, добавленная до изменения водителя, попала в конфликты")
+
+            # Повторный обмен ничего не передает
+            totals = synchronize(first, second)
+            if totals["sent"]["changes"] or totals["received"]["changes"]:
+                failures.append(f"Повторный обмен передал изменения: {totals}")
+        finally:
+            first.close()
+            second.close()
+    return failures
+
+
+def main(argv=None):
+    from registry import Registry, connect
+
+    parser = argparse.ArgumentParser(description="Синхронизация реестров водителей")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Обмен изменениями двух реестров")
+    run.add_argument("local", help="Файл базы")
+    run.add_argument("remote", help="Файл базы или адрес сервиса (http://...)")
+    run.add_argument("--batch", type=int, default=BATCH_SIZE)
+    run.add_argument("--login", default=None, help="Логин инспектора для входа в сервис (пароль запрашивается)")
+    conflicts = commands.add_parser("conflicts", help="Записи, проигравшие конфликт номеров")
+    conflicts.add_argument("--db", default=DB_PATH)
+    conflicts.add_argument("--after", type=int, default=0)
+    conflicts.add_argument("--limit", type=int, default=100)
+    commands.add_parser("check", help="Проверить обмен на двух временных базах")
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        failures = check()
+        for failure in failures:
+            print(failure)
+        print("Ошибок нет" if not failures else f"Ошибок: {len(failures)}")
+        return 1 if failures else 0
+
+    if args.command == "conflicts":
+        registry = Registry(args.db)
+        try:
+            for row in registry.sync_conflicts(args.after, args.limit):
+                print(row["id"], row["at"], row["kind"], row["key"], f"узел {row['node']}",
+                      f"уступила {row['winner'] or '-'}", json.dumps(row["data"], ensure_ascii=False))
+        finally:
+            registry.close()
+        return 0
+
+    started = time.perf_counter()
+    remote_is_service = args.remote.startswith("http://")
+    if remote_is_service and not args.login:
+        print("Для обмена с сервисом нужен --login", file=sys.stderr)
+        return 1
+    local = Registry(args.local)
+    remote = connect(args.remote) if remote_is_service else Registry(args.remote)
+    try:
+        if remote_is_service and not remote.authenticate(args.login, getpass.getpass("Пароль: "))["ok"]:
+            print("Неверный логин или пароль", file=sys.stderr)
+            return 1
+        totals = synchronize(local, remote, args.batch)
+    finally:
+        local.close()
+        remote.close()
+    for direction, title in (("sent", "Отправлено"), ("received", "Получено")):
+        item = totals[direction]
+        print(f"{title}: изменений {item['changes']} ({item['bytes']:,} байт, пачек {item['batches']}), "
+              f"применено {item['applied']}, уже было {item['skipped']}, отложено {item['held']}, "
+              f"конфликтов {item['conflicts']}")
+    print(f"Время: {time.perf_counter() - started:.2f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Воспроизводимые синтетические водители, ВУ и фотографии для замеров.
+
+Одно и то же зерно (seed) дает одни и те же записи, поэтому замеры разных
+версий идут на одинаковых данных. Записи порождаются потоком, в памяти
+одновременно находится одна, так что объем ограничен только диском:
+
+    python synthetic.py drivers drivers.jsonl --count 10000000 --licenses licenses.jsonl
+    python synthetic.py photos photos/ --count 200
+
+Файлы JSONL загружаются в базу bulk_import.py. Паспорта, номера ВУ,
+телефоны и email у всех записей различны и проходят проверки validation.py,
+фото — JPEG 3:4, которые проходят photo_probe.check_photo.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+
+# (мужская форма, женская форма)
+_LAST_NAMES = (
+    ("Иванов", "Иванова"), ("Смирнов", "Смирнова"), ("Кузнецов", "Кузнецова"), ("Попов", "Попова"),
+    ("Васильев", "Васильева"), ("Петров", "Петрова"), ("Соколов", "Соколова"), ("Михайлов", "Михайлова"),
+    ("Новиков", "Новикова"), ("Федоров", "Федорова"), ("Морозов", "Морозова"), ("Волков", "Волкова"),
+    ("Алексеев", "Алексеева"), ("Лебедев", "Лебедева"), ("Семенов", "Семенова"), ("Егоров", "Егорова"),
+    ("Павлов", "Павлова"), ("Козлов", "Козлова"), ("Степанов", "Степанова"), ("Николаев", "Николаева"),
+    ("Орлов", "Орлова"), ("Андреев", "Андреева"), ("Макаров", "Макарова"), ("Никитин", "Никитина"),
+    ("Захаров", "Захарова"), ("Зайцев", "Зайцева"), ("Соловьев", "Соловьева"), ("Борисов", "Борисова"),
+    ("Яковлев", "Яковлева"), ("Григорьев", "Григорьева"), ("Романов", "Романова"), ("Воробьев", "Воробьева"),
+    ("Белоусов", "Белоусова"), ("Ковалев", "Ковалева"), ("Ильин", "Ильина"), ("Гусев", "Гусева"),
+    ("Титов", "Титова"), ("Кузьмин", "Кузьмина"), ("Кудрявцев", "Кудрявцева"), ("Баранов", "Баранова"),
+    ("Куликов", "Куликова"), ("Алексеенко", "Алексеенко"), ("Шевченко", "Шевченко"), ("Коваленко", "Коваленко"),
+    ("Черных", "Черных"), ("Седых", "Седых"), ("Толстой", "Толстая"), ("Белый", "Белая"),
+)
+_MALE_NAMES = (
+    "Александр", "Сергей", "Дмитрий", "Андрей", "Алексей", "Максим", "Иван", "Петр", "Михаил", "Евгений",
+    "Владимир", "Николай", "Артем", "Роман", "Павел", "Юрий", "Виктор", "Олег", "Игорь", "Константин",
+    "Денис", "Никита", "Кирилл", "Егор", "Илья", "Антон", "Василий", "Григорий", "Федор", "Тимур",
+)
+_FEMALE_NAMES = (
+    "Анна", "Мария", "Елена", "Ольга", "Наталья", "Татьяна", "Ирина", "Екатерина", "Светлана", "Юлия",
+    "Анастасия", "Дарья", "Марина", "Людмила", "Галина", "Ксения", "Алина", "Виктория", "Полина", "Софья",
+)
+# Имя отца -> (отчество сына, отчество дочери)
+_PATRONYMICS = (
+    ("Александрович", "Александровна"), ("Сергеевич", "Сергеевна"), ("Дмитриевич", "Дмитриевна"),
+    ("Андреевич", "Андреевна"), ("Алексеевич", "Алексеевна"), ("Иванович", "Ивановна"), ("Петрович", "Петровна"),
+    ("Михайлович", "Михайловна"), ("Владимирович", "Владимировна"), ("Николаевич", "Николаевна"),
+    ("Юрьевич", "Юрьевна"), ("Викторович", "Викторовна"), ("Олегович", "Олеговна"), ("Игоревич", "Игоревна"),
+    ("Павлович", "Павловна"), ("Евгеньевич", "Евгеньевна"), ("Васильевич", "Васильевна"),
+    ("Геннадьевич", "Геннадьевна"), ("Анатольевич", "Анатольевна"), ("Ильич", "Ильинична"),
+)
+# Город, код региона для подразделения ГИБДД
+_CITIES = (
+    ("Москва", "77"), ("Санкт-Петербург", "78"), ("Новосибирск", "54"), ("Екатеринбург", "66"), ("Казань", "16"),
+    ("Нижний Новгород", "52"), ("Челябинск", "74"), ("Самара", "63"), ("Омск", "55"), ("Ростов-на-Дону", "61"),
+    ("Уфа", "02"), ("Красноярск", "24"), ("Воронеж", "36"), ("Пермь", "59"), ("Волгоград", "34"),
+)
+_STREETS = (
+    "ул. Ленина", "ул. Мира", "ул. Советская", "ул. Садовая", "ул. Гагарина", "ул. Пушкина", "пр. Победы",
+    "ул. Молодежная", "ул. Школьная", "ул. Лесная", "ул. Новая", "ул. Центральная", "пр. Ленинградский",
+)
+_POSITIONS = ("водитель", "водитель-экспедитор", "водитель автобуса", "механик", "менеджер", "инженер", "")
+_WORKPLACES = ("ООО «Транспорт»", "АО «Автоколонна 1»", "ИП Сидоров", "МУП «Горэлектротранс»", "ООО «Логистика»", "")
+_EMAIL_DOMAINS = ("mail.ru", "yandex.ru", "gmail.com", "bk.ru", "list.ru", "inbox.ru")
+# Наборы категорий ВУ и их доля
+_CATEGORY_SETS = (
+    (("B",), 50), (("B", "C"), 12), (("A", "B"), 10), (("B", "C", "CE"), 8), (("B", "BE"), 5),
+    (("B", "C", "D"), 4), (("A", "A1", "B", "B1", "M"), 4), (("B", "C", "C1", "CE", "C1E"), 3),
+    (("B", "D", "DE"), 2), (("B", "Tm"), 1), (("B", "Tb"), 1),
+)
+
+_CYRILLIC_TO_LATIN = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "y", "ь": "",
+    "э": "e", "ю": "yu", "я": "ya",
+})
+
+PHOTO_WIDTH = 300
+PHOTO_HEIGHT = 400
+
+
+class _Numbers:
+    """Различные номера из digits цифр в случайном порядке: number -> (a * number + b) mod 10**digits.
+
+    При a, взаимно простом с 10, отображение взаимно однозначно, поэтому
+    номера не повторяются без хранения уже выданных.
+    """
+
+    def __init__(self, generator, digits):
+        self.modulus = 10 ** digits
+        self.a = generator.randrange(self.modulus // 10, self.modulus) | 1
+        while self.a % 5 == 0:
+            self.a += 2
+        self.b = generator.randrange(self.modulus)
+        self.digits = digits
+
+    def __call__(self, number):
+        return f"{(self.a * number + self.b) % self.modulus:0{self.digits}d}"
+
+
+class DriverGenerator:
+    """Поток водителей с ВУ для зерна seed; запись number одна и та же при любом count."""
+
+    def __init__(self, seed=1, licenses_per_driver=(1, 1, 1, 1, 0, 2), photo_paths=()):
+        self.seed = seed
+        setup = random.Random(seed)
+        self.passports = _Numbers(setup, 10)
+        self.licenses = _Numbers(setup, 10)
+        self.phones = _Numbers(setup, 9)
+        self.licenses_per_driver = licenses_per_driver
+        self.photo_paths = tuple(photo_paths)
+        self.category_sets = [", ".join(categories) for categories, _ in _CATEGORY_SETS]
+        self.category_weights = [weight for _, weight in _CATEGORY_SETS]
+
+    def driver(self, number):
+        """Водитель с номером number (с нуля) и его ВУ в "licenses"."""
+        generator = random.Random(self.seed * 1000003 + number)
+        female = generator.random() < 0.3
+        gender = 1 if female else 0
+        last_name = generator.choice(_LAST_NAMES)[gender]
+        first_name = generator.choice(_FEMALE_NAMES if female else _MALE_NAMES)
+        middle_name = generator.choice(_PATRONYMICS)[gender]
+        birth_year = generator.randint(1955, 2006)
+        dob = f"{generator.randint(1, 28):02d}.{generator.randint(1, 12):02d}.{birth_year}"
+        registration_city, region = generator.choice(_CITIES)
+        living_city = registration_city if generator.random() < 0.8 else generator.choice(_CITIES)[0]
+        passport = self.passports(number)
+        driver_id = str(uuid.UUID(int=generator.getrandbits(128), version=4))
+        login = f"{first_name[0]}.{last_name}".lower().translate(_CYRILLIC_TO_LATIN)
+        driver = {
+            "driver_id": driver_id,
+            "last_name": last_name,
+            "first_name": first_name,
+            "middle_name": middle_name,
+            "dob": dob,
+            "passport": f"{passport[:4]} {passport[4:]}",
+            "registration_city": registration_city,
+            "registration_address": self._address(generator),
+            "living_city": living_city,
+            "living_address": self._address(generator),
+            "workplace": generator.choice(_WORKPLACES),
+            "position": generator.choice(_POSITIONS),
+            "phone": "+79" + self.phones(number),
+            "email": f"{login}{number}@{generator.choice(_EMAIL_DOMAINS)}",
+            "photo_path": self.photo_paths[number % len(self.photo_paths)] if self.photo_paths else "",
+            "notes": "",
+        }
+        driver["licenses"] = [
+            self._license(generator, driver_id, number, index, birth_year, region)
+            for index in range(generator.choice(self.licenses_per_driver))
+        ]
+        return driver
+
+    def _address(self, generator):
+        return f"{generator.choice(_STREETS)}, д. {generator.randint(1, 150)}, кв. {generator.randint(1, 300)}"
+
+    def _license(self, generator, driver_id, number, index, birth_year, region):
+        # ВУ выдается с 18 лет на 10 лет. i-е ВУ водителя берет номер number + i * 2 млрд,
+        # поэтому номера различны, пока водителей меньше 2 млрд
+        issue_year = generator.randint(min(birth_year + 18, 2024), 2024)
+        issue = f"{generator.randint(1, 28):02d}.{generator.randint(1, 12):02d}"
+        license_number = self.licenses(number + index * 2000000000)
+        categories = generator.choices(self.category_sets, self.category_weights)[0]
+        return {
+            "driver_id": driver_id,
+            "license_number": f"{license_number[:4]} {license_number[4:]}",
+            "issue_date": f"{issue}.{issue_year}",
+            "expiry_date": f"{issue}.{issue_year + 10}",
+            "issuing_authority": f"ГИБДД {region}{generator.randint(1, 30):02d}",
+            "vehicle_categories": categories,
+            "photo_path": "",
+        }
+
+    def drivers(self, count, start=0):
+        for number in range(start, start + count):
+            yield self.driver(number)
+
+
+def write_photo(path, seed):
+    """JPEG 3:4 со случайными фигурами: у разных seed разные перцептивные хеши."""
+    from PyQt5.QtCore import QRect
+    from PyQt5.QtGui import QColor, QImage, QPainter
+
+    generator = random.Random(seed)
+    image = QImage(PHOTO_WIDTH, PHOTO_HEIGHT, QImage.Format_RGB32)
+    image.fill(QColor(*(generator.randrange(256) for _ in range(3))))
+    painter = QPainter(image)
+    for _ in range(12):
+        painter.fillRect(
+            QRect(generator.randrange(PHOTO_WIDTH), generator.randrange(PHOTO_HEIGHT),
+                  generator.randint(20, 200), generator.randint(20, 250)),
+            QColor(*(generator.randrange(256) for _ in range(3))),
+        )
+    painter.end()
+    if not image.save(path, "JPG", 85):
+        raise OSError(f"Не удалось записать {path}")
+    return path
+
+
+def write_photos(directory, count, seed=1):
+    os.makedirs(directory, exist_ok=True)
+    return [
+        write_photo(os.path.join(directory, f"photo_{number:06d}.jpg"), seed * 1000003 + number)
+        for number in range(count)
+    ]
+
+
+def write_drivers(path, count, seed=1, licenses_path=None, start=0):
+    """Водители в JSONL (без ВУ) и, если задан licenses_path, их ВУ в отдельный JSONL."""
+    generator = DriverGenerator(seed)
+    licenses_file = open(licenses_path, "w", encoding="utf-8") if licenses_path else None
+    written = licenses = 0
+    started = time.perf_counter()
+    try:
+        with open(path, "w", encoding="utf-8") as drivers_file:
+            for driver in generator.drivers(count, start):
+                for license in driver.pop("licenses"):
+                    if licenses_file is not None:
+                        licenses_file.write(json.dumps(license, ensure_ascii=False) + "\n")
+                        licenses += 1
+                drivers_file.write(json.dumps(driver, ensure_ascii=False) + "\n")
+                written += 1
+                if written % 100000 == 0:
+                    rate = written / (time.perf_counter() - started)
+                    print(f"\rЗаписано {written} из {count} ({rate:.0f} в с)", end="", file=sys.stderr)
+    finally:
+        if licenses_file is not None:
+            licenses_file.close()
+    if written >= 100000:
+        print(file=sys.stderr)
+    return written, licenses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Синтетические водители, ВУ и фото для замеров")
+    commands = parser.add_subparsers(dest="command", required=True)
+    drivers = commands.add_parser("drivers", help="Водители (и ВУ) в JSONL для bulk_import.py")
+    drivers.add_argument("path")
+    drivers.add_argument("--count", type=int, default=100000)
+    drivers.add_argument("--start", type=int, default=0, help="Номер первой записи (для загрузки частями)")
+    drivers.add_argument("--licenses", default=None, help="Файл ВУ (JSONL)")
+    drivers.add_argument("--seed", type=int, default=1)
+    photos = commands.add_parser("photos", help="Фото 3:4 в формате JPEG")
+    photos.add_argument("directory")
+    photos.add_argument("--count", type=int, default=100)
+    photos.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == "drivers":
+        written, licenses = write_drivers(args.path, args.count, args.seed, args.licenses, args.start)
+        print(f"Водителей: {written}, ВУ: {licenses}")
+    else:
+        paths = write_photos(args.directory, args.count, args.seed)
+        print(f"Фото: {len(paths)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
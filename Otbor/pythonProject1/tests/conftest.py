@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+# Модули проекта лежат плоско в родительской папке
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture
+def drivers():
+    """Синтетические водители (без ВУ) и их ВУ: drivers(count, seed=1)."""
+    from synthetic import DriverGenerator
+
+    def make(count, seed=1, start=0):
+        records = list(DriverGenerator(seed).drivers(count, start))
+        licenses = [license for record in records for license in record.pop("licenses")]
+        return records, licenses
+
+    return make
+
+
+@pytest.fixture
+def store(tmp_path):
+    from storage import DriverStore
+
+    store = DriverStore(str(tmp_path / "registry.db"))
+    yield store
+    store.close()
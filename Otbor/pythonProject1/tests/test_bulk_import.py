@@ -0,0 +1,77 @@
+import json
+
+import bulk_import
+from bulk_import import Importer
+from uniqueness import BloomFilter
+
+
+def _write_jsonl(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return str(path)
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_import_rejects_invalid_and_duplicate_records(store, drivers, tmp_path):
+    records, _ = drivers(5)
+    records[1]["phone"] = "123"
+    records[3]["passport"] = records[0]["passport"]
+    source = _write_jsonl(tmp_path / "drivers.jsonl", records)
+    errors = str(tmp_path / "rejects.jsonl")
+
+    report = Importer(store, "drivers", errors, batch_size=2).run(source, progress=False)
+
+    assert (report["read"], report["accepted"], report["rejected"]) == (5, 3, 2)
+    rejects = {reject["record"]: reject["errors"] for reject in _read_jsonl(errors)}
+    assert set(rejects) == {2, 4}
+    assert "phone" in rejects[2] and "passport" in rejects[4]
+
+
+def test_stale_bloom_filter_retries_batch(store, drivers, tmp_path, monkeypatch):
+    records, _ = drivers(3)
+    store.save_driver(records[0]["driver_id"], records[0])
+    # Другой процесс занял паспорт после того, как фильтр был построен
+    monkeypatch.setattr(bulk_import.BloomFilter, "from_store", classmethod(lambda cls, store: BloomFilter(1000)))
+    twin = dict(records[1], driver_id=None, passport=records[0]["passport"])
+    source = _write_jsonl(tmp_path / "drivers.jsonl", [twin, records[2]])
+    errors = str(tmp_path / "rejects.jsonl")
+
+    report = Importer(store, "drivers", errors).run(source, progress=False)
+
+    assert (report["accepted"], report["rejected"]) == (1, 1)
+    assert store.get_driver(records[2]["driver_id"]) is not None
+    # Отклоненная запись записана один раз, хотя пачка проверялась дважды
+    assert [reject["record"] for reject in _read_jsonl(errors)] == [1]
+
+
+def test_import_resumes_from_checkpoint(store, drivers, tmp_path):
+    records, _ = drivers(4)
+    source = _write_jsonl(tmp_path / "drivers.jsonl", records[:2])
+    errors = str(tmp_path / "rejects.jsonl")
+    Importer(store, "drivers", errors).run(source, progress=False)
+    _write_jsonl(tmp_path / "drivers.jsonl", records)
+
+    report = Importer(store, "drivers", errors).run(source, progress=False)
+
+    assert report["resumed_from"] == 2
+    assert (report["read"], report["accepted"]) == (2, 4)
+    assert store.count_drivers() == 4
+
+
+def test_licenses_need_known_driver(store, drivers, tmp_path):
+    records, licenses = drivers(3)
+    store.save_drivers([(record["driver_id"], record) for record in records[:1]])
+    mine = [license for license in licenses if license["driver_id"] == records[0]["driver_id"]]
+    foreign = [license for license in licenses if license["driver_id"] != records[0]["driver_id"]]
+    source = _write_jsonl(tmp_path / "licenses.jsonl", mine + foreign)
+    errors = str(tmp_path / "rejects.jsonl")
+
+    report = Importer(store, "licenses", errors).run(source, progress=False)
+
+    assert (report["accepted"], report["rejected"]) == (len(mine), len(foreign))
+    assert all("driver_id" in reject["errors"] for reject in _read_jsonl(errors))
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+
+from credentials import SCRYPT_SCHEME, CredentialStore
+
+# Малая стоимость scrypt, чтобы тесты шли быстро
+COST = 10
+
+
+def test_password_is_salted_and_verified(tmp_path):
+    store = CredentialStore(str(tmp_path / "users.db"), cost=COST)
+    store.set_password("ivanov", "secret")
+    store.set_password("petrov", "secret")
+    try:
+        assert store.verify("ivanov", "secret")
+        assert not store.verify("ivanov", "Secret")
+        assert not store.verify("sidorov", "secret")
+        ivanov, petrov = store.users["ivanov"], store.users["petrov"]
+        assert ivanov[0] == SCRYPT_SCHEME and ivanov[2] != petrov[2] and ivanov[3] != petrov[3]
+    finally:
+        store.close()
+
+
+def test_accounts_survive_reopen(tmp_path):
+    path = str(tmp_path / "users.db")
+    store = CredentialStore(path, cost=COST)
+    store.set_password("ivanov", "secret")
+    store.close()
+    store = CredentialStore(path, cost=COST)
+    try:
+        assert "ivanov" in store and len(store) == 1
+        assert store.verify("ivanov", "secret")
+    finally:
+        store.close()
+
+
+def test_low_cost_hash_is_upgraded(tmp_path):
+    store = CredentialStore(str(tmp_path / "users.db"), cost=COST)
+    try:
+        store.set_password("ivanov", "secret", cost=COST - 1)
+        assert store.verify("ivanov", "secret")
+        assert store.users["ivanov"][1] == COST
+        assert store.verify("ivanov", "secret")
+    finally:
+        store.close()
+
+
+def test_unsalted_sha256_records_are_refused(tmp_path):
+    store = CredentialStore(str(tmp_path / "users.db"), cost=COST)
+    try:
+        store._put("ivanov", "sha256", 0, b"", hashlib.sha256(b"secret").digest())
+        assert not store.verify("ivanov", "secret")
+        assert store.users["ivanov"][0] == "sha256"
+    finally:
+        store.close()
+
+
+def test_parallel_verification(tmp_path):
+    store = CredentialStore(str(tmp_path / "users.db"), cost=COST)
+    store.set_password("ivanov", "secret")
+    results = []
+
+    def worker():
+        results.append(store.verify("ivanov", "secret"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+    assert results == [True] * 8
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+from journal import ABORT, DRIVERS, LICENSES, Journal, JournalBusyError, history
+from storage import DriverStore
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return str(tmp_path / "journal")
+
+
+def _open(path, journal_dir):
+    journal = Journal(journal_dir)
+    return DriverStore(path, journal=journal), journal
+
+
+def _close(store, journal):
+    store.close()
+    journal.close()
+
+
+def test_records_survive_reopen_and_torn_tail_is_cut(journal_dir):
+    journal = Journal(journal_dir)
+    journal.wait(journal.append(DRIVERS, [["a", {"last_name": "Иванов"}]]))
+    journal.wait(journal.append(DRIVERS, [["b", {"last_name": "Петров"}]]))
+    journal.close()
+    segment = Journal(journal_dir)
+    path = segment.segments()[-1]
+    segment.close()
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    journal = Journal(journal_dir)
+    try:
+        assert [record.seq for record in journal.records()] == [1]
+        assert journal.append(DRIVERS, [["c", {}]]) == 2
+    finally:
+        journal.close()
+
+
+def test_second_open_is_refused(journal_dir):
+    journal = Journal(journal_dir)
+    try:
+        with pytest.raises(JournalBusyError):
+            Journal(journal_dir)
+    finally:
+        journal.close()
+
+
+def test_replay_into_empty_database_skips_rolled_back(tmp_path, journal_dir, drivers):
+    records, licenses = drivers(3)
+    store, journal = _open(str(tmp_path / "a.db"), journal_dir)
+    store.save_drivers([(record["driver_id"], record) for record in records[:2]])
+    store.add_licenses([(license["driver_id"], license) for license in licenses if license["driver_id"] == records[0]["driver_id"]])
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.save_driver(records[2]["driver_id"], records[2])
+            raise RuntimeError
+    _close(store, journal)
+
+    # База потеряна целиком: все изменения восстанавливаются по журналу
+    store, journal = _open(str(tmp_path / "b.db"), journal_dir)
+    try:
+        assert store.recovered == (2, 0)
+        assert store.count_drivers() == 2
+        assert store.get_driver(records[2]["driver_id"]) is None
+        assert len(store.get_licenses(records[0]["driver_id"])) == len(
+            [license for license in licenses if license["driver_id"] == records[0]["driver_id"]]
+        )
+        assert [record.op for record in journal.records()].count(ABORT) == 1
+    finally:
+        _close(store, journal)
+
+
+def test_recover_applies_only_missing_records(tmp_path, journal_dir, drivers):
+    records, _ = drivers(2)
+    path = str(tmp_path / "registry.db")
+    store, journal = _open(path, journal_dir)
+    store.save_driver(records[0]["driver_id"], records[0])
+    store.backup(str(tmp_path / "old.db"))
+    store.save_driver(records[1]["driver_id"], records[1])
+    _close(store, journal)
+    os.replace(str(tmp_path / "old.db"), path)
+
+    store, journal = _open(path, journal_dir)
+    try:
+        assert store.recovered == (1, 0)
+        assert store.count_drivers() == 2
+    finally:
+        _close(store, journal)
+
+
+def test_changes_missing_from_journal_are_rejournaled(tmp_path, journal_dir, drivers):
+    records, _ = drivers(1)
+    store, journal = _open(str(tmp_path / "registry.db"), journal_dir)
+    store.save_driver(records[0]["driver_id"], records[0])
+    _close(store, journal)
+    # Запись зафиксирована в базе, но не дошла до диска журнала
+    for name in os.listdir(journal_dir):
+        if name.endswith(".log"):
+            os.remove(os.path.join(journal_dir, name))
+
+    store, journal = _open(str(tmp_path / "registry.db"), journal_dir)
+    try:
+        assert store.recovered == (0, 1)
+        [(record, data)] = history(journal, records[0]["driver_id"])
+        assert record.op == DRIVERS and data["passport"] == records[0]["passport"]
+    finally:
+        _close(store, journal)
+
+
+def test_history_and_actor(tmp_path, journal_dir, drivers):
+    records, licenses = drivers(1)
+    store, journal = _open(str(tmp_path / "registry.db"), journal_dir)
+    try:
+        with journal.acting("ivanov"):
+            store.save_driver(records[0]["driver_id"], records[0])
+        store.add_licenses([(license["driver_id"], license) for license in licenses[:1]])
+        entries = list(history(journal, records[0]["driver_id"]))
+        assert [(record.op, record.actor) for record, _ in entries] == [(DRIVERS, "ivanov"), (LICENSES, None)]
+        assert entries[1][1]["license_number"] == licenses[0]["license_number"]
+    finally:
+        _close(store, journal)
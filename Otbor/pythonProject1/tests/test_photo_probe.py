@@ -0,0 +1,91 @@
+import struct
+import zlib
+
+import pytest
+
+from photo_probe import MAX_PHOTO_SIZE, PhotoInfo, check_directory, check_photo, photo_errors, probe
+
+
+def _segment(marker, payload):
+    return bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def _jpeg(width, height, before=b""):
+    # SOI, сегменты до кадра, SOF0 и обрывок данных: пиксели probe не читает
+    sof = _segment(0xC0, struct.pack(">BHHB", 8, height, width, 3) + b"\x01\x22\x00" * 3)
+    return b"\xff\xd8" + before + sof + _segment(0xDA, b"\x00" * 10) + b"\x00" * 64
+
+
+def _png(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    return b"\x89PNG\r\n\x1a\n" + chunk
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_jpeg_size_after_other_segments(tmp_path):
+    before = _segment(0xE0, b"JFIF\x00" + b"\x00" * 9) + _segment(0xDB, b"\x00" * 65) + b"\xff\xff"
+    path = _write(tmp_path, "a.jpg", _jpeg(300, 400, before))
+    assert probe(path) == PhotoInfo(300, 400, len(open(path, "rb").read()))
+
+
+def test_jpeg_dht_is_not_taken_for_frame(tmp_path):
+    # C4 (DHT) лежит в диапазоне SOF, но размеров кадра не содержит
+    path = _write(tmp_path, "a.jpg", _jpeg(600, 800, _segment(0xC4, b"\x10" + b"\x00" * 16)))
+    assert probe(path)[:2] == (600, 800)
+
+
+def test_png_size(tmp_path):
+    assert probe(_write(tmp_path, "a.png", _png(30, 40)))[:2] == (30, 40)
+
+
+@pytest.mark.parametrize("data", [
+    b"\xff\xd8\xff\xe0\x00",
+    b"\xff\xd8" + _segment(0xDA, b"\x00" * 4),
+    b"\xff\xd8\xff\xd9",
+    b"GIF89a" + b"\x00" * 20,
+    _png(0, 40),
+])
+def test_broken_or_unsupported_files(tmp_path, data):
+    with pytest.raises(ValueError):
+        probe(_write(tmp_path, "bad.jpg", data))
+
+
+def test_real_images_match_decoder(tmp_path):
+    QtGui = pytest.importorskip("PyQt5.QtGui")
+    for name, width, height in (("a.jpg", 300, 400), ("b.png", 90, 120), ("c.jpg", 123, 77)):
+        path = str(tmp_path / name)
+        image = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+        image.fill(0)
+        assert image.save(path)
+        assert probe(path)[:2] == (width, height)
+
+
+def test_photo_rules():
+    assert photo_errors(PhotoInfo(300, 400, 1000)) == []
+    assert len(photo_errors(PhotoInfo(400, 300, MAX_PHOTO_SIZE + 1))) == 3
+    assert photo_errors(PhotoInfo(300, 401, 1000)) == ["Соотношение сторон изображения должно быть 3:4."]
+
+
+def test_check_photo_reports_first_error(tmp_path):
+    with pytest.raises(ValueError, match="3:4"):
+        check_photo(_write(tmp_path, "a.jpg", _jpeg(400, 400)))
+    assert check_photo(_write(tmp_path, "b.jpg", _jpeg(3, 4))).width == 3
+
+
+def test_check_directory_report(tmp_path):
+    photos = tmp_path / "photos"
+    (photos / "nested").mkdir(parents=True)
+    _write(photos, "ok.jpg", _jpeg(300, 400))
+    _write(photos / "nested", "wide.png", _png(400, 300))
+    _write(photos, "broken.jpeg", b"\xff\xd8\xff")
+    _write(photos, "notes.txt", b"skip")
+    report = str(tmp_path / "report.csv")
+    assert check_directory(str(photos), report, workers=2) == (1, 2)
+    with open(report, encoding="utf-8") as f:
+        assert len(f.readlines()) == 4
@@ -0,0 +1,60 @@
+import pytest
+
+from rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    limiter = RateLimiter(str(tmp_path / "limits.db"), max_failures=3, window=60, lock_seconds=60,
+                          client_max_failures=10)
+    yield limiter
+    limiter.close()
+
+
+def test_lock_after_max_failures(limiter):
+    assert limiter.register_failure("user:ivanov", now=100) == (0, 2)
+    assert limiter.register_failure("user:ivanov", now=101) == (0, 1)
+    assert limiter.register_failure("user:ivanov", now=102) == (60, 0)
+    assert limiter.check("user:ivanov", now=150) == 12
+    assert limiter.check("user:ivanov", now=162) == 0
+
+
+def test_failures_outside_window_are_forgotten(limiter):
+    limiter.register_failure("user:ivanov", now=100)
+    limiter.register_failure("user:ivanov", now=101)
+    assert limiter.register_failure("user:ivanov", now=200) == (0, 2)
+
+
+def test_client_has_its_own_higher_limit(limiter):
+    # Инспекторы одного отдела за общим адресом ошибаются в своих паролях
+    for number in range(9):
+        limiter.login_failed(f"user{number}", "10.0.0.1")
+    assert limiter.check_login("petrov", "10.0.0.1") == 0
+    locked_for, _ = limiter.login_failed("user9", "10.0.0.1")
+    assert locked_for > 0
+    assert limiter.check_login("petrov", "10.0.0.1") > 0
+    assert limiter.check_login("petrov", "10.0.0.2") == 0
+
+
+def test_success_resets_only_the_login(limiter):
+    limiter.login_failed("ivanov", "10.0.0.1")
+    limiter.login_failed("ivanov", "10.0.0.1")
+    limiter.login_succeeded("ivanov", "10.0.0.1")
+    assert limiter.login_failed("ivanov", "10.0.0.1") == (0, 2)
+    assert limiter.register_failure("client:10.0.0.1", max_failures=10) == (0, 6)
+
+
+def test_lock_is_shared_through_the_file(tmp_path, limiter):
+    for _ in range(3):
+        limiter.login_failed("ivanov")
+    other = RateLimiter(str(tmp_path / "limits.db"))
+    try:
+        assert other.check_login("ivanov") > 0
+    finally:
+        other.close()
+
+
+def test_purge_drops_expired_entries(limiter):
+    limiter.register_failure("user:ivanov", now=100)
+    limiter.purge(now=1000)
+    assert limiter.conn.execute("SELECT COUNT(*) FROM login_limits").fetchone()[0] == 0
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+from credentials import CredentialStore
+from journal import history
+from registry import Registry
+from service import RegistryService
+
+
+@pytest.fixture
+def service(tmp_path):
+    credentials = CredentialStore(str(tmp_path / "users.db"))
+    credentials.set_password("ivanov", "secret")
+    credentials.close()
+    registry = Registry(str(tmp_path / "registry.db"), credentials_path=str(tmp_path / "users.db"),
+                        limits_path=str(tmp_path / "limits.db"))
+    service = RegistryService(registry, workers=2, auth_workers=1)
+    yield service
+    service.close()
+    registry.close()
+
+
+def _call(service, method, target, body=None, token=None):
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    authorization = f"Bearer {token}" if token else None
+    return asyncio.run(service.dispatch(method, target, payload, "127.0.0.1", authorization=authorization))
+
+
+def _login(service, password="secret"):
+    return _call(service, "POST", "/auth/login", {"login": "ivanov", "password": password})
+
+
+def test_public_routes_need_no_session(service):
+    for target in ("/health", "/cache/stats", "/metrics?format=json"):
+        status, _ = _call(service, "GET", target)
+        assert status == 200
+
+
+@pytest.mark.parametrize("method, target", [
+    ("GET", "/drivers"),
+    ("GET", "/drivers/0b7c8f9e-0000-4000-8000-000000000000"),
+    ("GET", "/unique/passport?value=1234%20567890"),
+    ("GET", "/licenses/expiring?from=01.01.2024&to=01.01.2025"),
+    ("GET", "/sync/state"),
+    ("POST", "/drivers"),
+    ("POST", "/photos"),
+])
+def test_data_routes_need_session(service, method, target):
+    status, payload = _call(service, method, target, token="forged")
+    assert status == 401 and "error" in payload
+
+
+def test_login_issues_token_for_data_routes(service, drivers):
+    status, result = _login(service, "wrong")
+    assert status == 200 and not result["ok"] and "token" not in result
+    status, result = _login(service)
+    assert result["ok"]
+    token = result["token"]
+
+    records, _ = drivers(1)
+    status, saved = _call(service, "POST", "/drivers", {"data": records[0], "profile": "driver_no_city"}, token)
+    assert status == 200
+    status, driver = _call(service, "GET", f"/drivers/{saved['driver_id']}", token=token)
+    assert status == 200 and driver["passport"] == records[0]["passport"]
+    # Изменение записано в журнал от имени вошедшего инспектора
+    [(record, _)] = history(service.registry.pool.journal, saved["driver_id"])
+    assert record.actor == "ivanov"
+
+
+def test_expired_session_is_refused(service):
+    token = _login(service)[1]["token"]
+    login, _ = service.sessions.tokens[token]
+    service.sessions.tokens[token] = (login, 0)
+    status, _ = _call(service, "GET", "/drivers", token=token)
+    assert status == 401
+
+
+def test_login_is_locked_after_failures(service):
+    for _ in range(3):
+        _login(service, "wrong")
+    status, result = _login(service)
+    assert not result["ok"] and not result["checked"] and result["locked_for"] > 0
+
+
+async def _raw_request(service, request):
+    server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+    async with server:
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_malformed_content_length_is_rejected(service, length):
+    response = asyncio.run(_raw_request(
+        service, f"POST /auth/login HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode("latin-1")
+    ))
+    head, _, _ = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 400") and b"Connection: close" in head
@@ -0,0 +1,88 @@
+import pytest
+
+from storage import DriverStore
+from uniqueness import LICENSE, PASSPORT, BloomFilter, DuplicateKeyError, find_duplicates, normalize
+
+
+def _items(records):
+    return [(record["driver_id"], record) for record in records]
+
+
+def test_passport_is_unique_across_drivers(store, drivers):
+    records, _ = drivers(2)
+    store.save_drivers(_items(records))
+    twin = dict(records[1], passport=records[0]["passport"].replace(" ", ""))
+    with pytest.raises(DuplicateKeyError) as error:
+        store.save_driver(twin["driver_id"], twin)
+    assert error.value.kind == PASSPORT
+    assert error.value.owner == records[0]["driver_id"]
+    # Транзакция откатилась: у второго водителя прежний паспорт
+    assert store.get_driver(twin["driver_id"])["passport"] == records[1]["passport"]
+
+
+def test_resaving_driver_keeps_own_passport(store, drivers):
+    records, _ = drivers(1)
+    store.save_drivers(_items(records))
+    store.save_driver(records[0]["driver_id"], dict(records[0], phone="+79990000000"))
+    assert store.get_driver(records[0]["driver_id"])["phone"] == "+79990000000"
+    assert store.key_owner(PASSPORT, records[0]["passport"]) == records[0]["driver_id"]
+
+
+def test_changed_passport_is_released(store, drivers):
+    records, _ = drivers(2)
+    store.save_drivers(_items(records[:1]))
+    old = records[0]["passport"]
+    store.save_driver(records[0]["driver_id"], dict(records[0], passport="0000 000001"))
+    assert store.key_owner(PASSPORT, old) is None
+    store.save_driver(records[1]["driver_id"], dict(records[1], passport=old))
+    assert store.key_owner(PASSPORT, old) == records[1]["driver_id"]
+
+
+def test_license_number_normalization(store, drivers):
+    records, licenses = drivers(2)
+    store.save_drivers(_items(records))
+    store.add_licenses([(licenses[0]["driver_id"], dict(licenses[0], license_number="77 АВ 123456"))])
+    other = dict(licenses[0], driver_id=records[1]["driver_id"], license_number="77ab123456")
+    assert normalize(LICENSE, "77 АВ 123456") == normalize(LICENSE, "77ab123456")
+    with pytest.raises(DuplicateKeyError):
+        store.add_licenses([(other["driver_id"], other)])
+
+
+def test_duplicates_inside_one_batch(store, drivers):
+    records, _ = drivers(3)
+    items = [(record["passport"], record["driver_id"]) for record in records]
+    items.append((records[0]["passport"], "new-driver"))
+    assert find_duplicates(store, PASSPORT, items) == {3: records[0]["driver_id"]}
+
+
+def test_stale_bloom_filter_is_stopped_by_the_database(store, drivers):
+    records, _ = drivers(2)
+    store.save_drivers(_items(records[:1]))
+    # Фильтр построен до записи паспорта и считает его свободным
+    stale = BloomFilter(1000)
+    assert not stale.might_contain(PASSPORT, records[0]["passport"])
+    twin = dict(records[1], passport=records[0]["passport"])
+    with pytest.raises(DuplicateKeyError):
+        store.save_drivers(_items([twin]), bloom=stale)
+    assert store.get_driver(twin["driver_id"]) is None
+
+
+def test_bloom_filter_from_store(store, drivers):
+    records, _ = drivers(50)
+    store.save_drivers(_items(records))
+    bloom = BloomFilter.from_store(store)
+    assert bloom.count == 50
+    assert all(bloom.might_contain(PASSPORT, record["passport"]) for record in records)
+
+
+def test_keys_survive_reopen(tmp_path, drivers):
+    records, _ = drivers(1)
+    path = str(tmp_path / "registry.db")
+    store = DriverStore(path)
+    store.save_drivers(_items(records))
+    store.close()
+    store = DriverStore(path)
+    try:
+        assert store.key_owner(PASSPORT, records[0]["passport"]) == records[0]["driver_id"]
+    finally:
+        store.close()
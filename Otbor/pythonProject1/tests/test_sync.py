@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from registry import Registry, RegistryError
+from sync import SyncError, apply_changes, check, export_changes, synchronize
+
+
+@pytest.fixture
+def nodes(tmp_path):
+    first = Registry(str(tmp_path / "first.db"))
+    second = Registry(str(tmp_path / "second.db"))
+    yield first, second
+    first.close()
+    second.close()
+
+
+def _save(registry, record, **changes):
+    return registry.save_driver(dict(record, **changes), profile="driver_no_city")
+
+
+def test_check_scenarios():
+    assert check() == []
+
+
+def test_changes_travel_both_ways_once(nodes, drivers):
+    first, second = nodes
+    records, licenses = drivers(4)
+    for record in records[:2]:
+        _save(first, record)
+    for record in records[2:]:
+        _save(second, record)
+    first.register_licenses([license for license in licenses if license["driver_id"] == records[0]["driver_id"]])
+
+    totals = synchronize(first, second)
+
+    assert totals["sent"]["applied"] == 2 + len(first.get_driver(records[0]["driver_id"]).licenses)
+    assert totals["received"]["applied"] == 2
+    for record in records:
+        assert first.get_driver(record["driver_id"]).passport == second.get_driver(record["driver_id"]).passport
+    totals = synchronize(first, second)
+    assert totals["sent"]["changes"] == totals["received"]["changes"] == 0
+
+
+def test_later_edit_wins_on_both_nodes(nodes, drivers):
+    first, second = nodes
+    records, _ = drivers(1)
+    driver_id = _save(first, records[0])
+    synchronize(first, second)
+    _save(first, records[0], notes="first")
+    time.sleep(0.01)
+    _save(second, records[0], notes="second")
+
+    synchronize(first, second)
+
+    assert first.get_driver(driver_id).notes == second.get_driver(driver_id).notes == "second"
+    assert not first.sync_conflicts() and not second.sync_conflicts()
+
+
+def test_passport_stays_with_earlier_driver(nodes, drivers):
+    first, second = nodes
+    records, _ = drivers(2)
+    winner = _save(first, records[0])
+    time.sleep(0.01)
+    loser = _save(second, records[1], passport=records[0]["passport"])
+
+    synchronize(first, second)
+
+    for registry in nodes:
+        assert registry.get_driver(winner).passport == records[0]["passport"]
+        with pytest.raises(RegistryError):
+            registry.get_driver(loser)
+    [conflict] = second.sync_conflicts()
+    assert conflict["key"] == loser and conflict["winner"] == winner
+
+
+def test_photo_store_keys_are_synchronized(nodes, drivers):
+    first, second = nodes
+    records, licenses = drivers(1)
+    driver_id = _save(first, records[0])
+    first.register_licenses(licenses)
+    synchronize(first, second)
+    number = licenses[0]["license_number"]
+    key = "0" * 32
+    with first.pool.connection() as store:
+        store.set_photo_paths("drivers", [(key, store.get_driver(driver_id)["id"])])
+        store.set_license_photos([[driver_id, number, key]])
+
+    totals = synchronize(first, second)
+
+    assert totals["sent"]["applied"] == 2
+    with second.pool.connection() as store:
+        assert store.get_driver(driver_id)["photo_path"] == key
+        assert [item["photo_path"] for item in store.get_licenses(driver_id)] == [key]
+
+
+def test_batch_must_continue_received_changes(nodes, drivers):
+    first, second = nodes
+    records, _ = drivers(2)
+    for record in records:
+        _save(first, record)
+    with first.pool.connection() as store:
+        payload = export_changes(store, after=1)
+    with second.pool.connection() as store:
+        with pytest.raises(SyncError):
+            apply_changes(store, payload)
+    with first.pool.connection() as store:
+        with pytest.raises(SyncError):
+            apply_changes(store, export_changes(store))
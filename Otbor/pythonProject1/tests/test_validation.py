@@ -0,0 +1,70 @@
+import pytest
+
+from validation import DRIVER_FIELDS, LICENSE_FIELDS, RULES, Validator, get_validator
+
+
+@pytest.fixture
+def record(drivers):
+    records, _ = drivers(1)
+    return dict(records[0], photo_path="photo.jpg")
+
+
+@pytest.mark.parametrize("field, value", [
+    ("passport", "12345 67890"),
+    ("passport", "1234 56789O"),
+    ("phone", "89990001122"),
+    ("email", "ivanov.mail.ru"),
+    ("last_name", ""),
+    ("photo_path", None),
+    ("phone", 79990001122),
+])
+def test_fast_path_agrees_with_full_check(record, field, value):
+    validator = Validator()
+    bad = dict(record, **{field: value})
+    assert validator.is_valid(record) and not validator.validate(record)
+    assert not validator.is_valid(bad)
+    assert validator.validate(bad) == {field: RULES[field][1]}
+    assert validator.validate_batch([record, bad, record]) == [(1, {field: RULES[field][1]})]
+
+
+def test_missing_field_goes_to_slow_path(record):
+    validator = Validator()
+    del record["email"]
+    assert not validator.is_valid(record)
+    assert validator.validate_batch([record]) == [(0, {"email": RULES["email"][1]})]
+
+
+def test_separator_in_value_does_not_pass(record):
+    # Склеенный шаблон делит значения символом \x00: значение с ним не должно
+    # сдвигать поля и проходить проверку
+    validator = Validator()
+    bad = dict(record, passport="1234 567890\x00+79990001122")
+    assert not validator.is_valid(bad)
+    assert "passport" in validator.validate(bad)
+
+
+def test_errors_follow_field_order():
+    errors = Validator().validate({})
+    assert list(errors) == list(DRIVER_FIELDS)
+
+
+def test_license_dates_and_categories(drivers):
+    _, licenses = drivers(1)
+    validator = get_validator("license")
+    assert validator.fields == LICENSE_FIELDS
+    assert validator.validate_batch(licenses) == []
+    bad = dict(licenses[0], issue_date="1.2.2020", vehicle_categories="B, Z")
+    assert set(validator.validate(bad)) == {"issue_date", "vehicle_categories"}
+
+
+def test_single_field_check():
+    validator = Validator()
+    assert validator.validate_field("phone", "+79990001122") is None
+    assert validator.validate_field("phone", "123") == RULES["phone"][1]
+    assert validator.validate_field("dob", "") is None
+
+
+def test_profiles_are_cached_and_checked():
+    assert get_validator("driver_short") is get_validator("driver_short")
+    with pytest.raises(ValueError):
+        get_validator("unknown")
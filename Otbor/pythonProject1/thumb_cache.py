@@ -0,0 +1,220 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+
+from photo_store import photo_key
+
+# Размер превью фотографии в формах
+THUMB_WIDTH = 100
+THUMB_HEIGHT = 133
+
+THUMB_DIR = "thumbnails"
+
+
+def content_key(file_path):
+    """Хеш содержимого файла — ключ превью не зависит от имени и расположения файла."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def decode_thumbnail(source):
+    """Декодирование сразу в размер превью (для JPEG — масштабированием при декодировании).
+
+    source — путь к файлу или открытый QIODevice.
+    """
+    reader = QImageReader(source)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid():
+        reader.setScaledSize(size.scaled(THUMB_WIDTH, THUMB_HEIGHT, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Не удалось загрузить изображение: {reader.errorString()}")
+    if image.width() > THUMB_WIDTH or image.height() > THUMB_HEIGHT:
+        image = image.scaled(THUMB_WIDTH, THUMB_HEIGHT, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+
+class ThumbnailCache:
+    """Двухуровневый кеш превью фотографий.
+
+    Память: LRU из QPixmap (только в GUI-потоке).
+    Диск: готовые превью 100x133, при превышении лимита удаляются давно не читанные.
+    """
+
+    def __init__(self, directory=THUMB_DIR, memory_items=512, disk_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        # Путь -> (mtime, размер, ключ), чтобы не хешировать неизмененный файл повторно
+        self.keys = {}
+        self.disk_used = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key_for(self, file_path):
+        stat = os.stat(file_path)
+        with self.lock:
+            known = self.keys.get(file_path)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known[2]
+        key = content_key(file_path)
+        with self.lock:
+            self.keys[file_path] = (stat.st_mtime_ns, stat.st_size, key)
+        return key
+
+    def thumb_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".jpg")
+
+    # --- Память (только GUI-поток) ---
+
+    def cached_pixmap(self, key):
+        pixmap = self.memory.get(key)
+        if pixmap is not None:
+            self.memory.move_to_end(key)
+            with self.lock:
+                self.memory_hits += 1
+        return pixmap
+
+    def peek(self, file_path):
+        """Превью из памяти без чтения файла, если файл уже встречался.
+
+        Для фото хранилища (photo_store.py) ключ превью — сам ключ фото:
+        это тот же хеш содержимого файла.
+        """
+        key = photo_key(file_path)
+        if key is not None:
+            return self.cached_pixmap(key)
+        known = self.keys.get(file_path)
+        if known is None:
+            return None
+        return self.cached_pixmap(known[2])
+
+    def put_pixmap(self, key, image):
+        pixmap = QPixmap.fromImage(image)
+        self.memory[key] = pixmap
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+        return pixmap
+
+    # --- Диск (можно вызывать из рабочих потоков) ---
+
+    def load_image(self, file_path, key=None):
+        """Превью в виде QImage: с диска или декодированием исходника. Возвращает (ключ, QImage)."""
+        key = key or self.key_for(file_path)
+        path = self.thumb_path(key)
+        image = QImage(path) if os.path.exists(path) else QImage()
+        if not image.isNull():
+            with self.lock:
+                self.disk_hits += 1
+            try:
+                os.utime(path)  # отметка для вытеснения давно не читанных
+            except OSError:
+                pass
+            return key, image
+
+        with self.lock:
+            self.misses += 1
+        image = decode_thumbnail(file_path)
+        self._store(path, image)
+        return key, image
+
+    def load_data(self, key, fetch):
+        """Превью фото хранилища по ключу; fetch(key) -> bytes вызывается только без превью на диске."""
+        path = self.thumb_path(key)
+        image = QImage(path) if os.path.exists(path) else QImage()
+        if not image.isNull():
+            with self.lock:
+                self.disk_hits += 1
+            return key, image
+
+        with self.lock:
+            self.misses += 1
+        buffer = QBuffer()
+        buffer.setData(QByteArray(fetch(key)))
+        buffer.open(QIODevice.ReadOnly)
+        image = decode_thumbnail(buffer)
+        self._store(path, image)
+        return key, image
+
+    def _store(self, path, image):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        if not image.save(tmp_path, "JPG", 90):
+            return
+        os.replace(tmp_path, path)
+        with self.lock:
+            if self.disk_used is None:
+                self.disk_used = self._scan_disk_usage()
+            else:
+                self.disk_used += os.path.getsize(path)
+            if self.disk_used > self.disk_bytes:
+                self._evict_disk()
+
+    def _thumb_files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".jpg"):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _scan_disk_usage(self):
+        return sum(size for _, size, _ in self._thumb_files())
+
+    def _evict_disk(self):
+        # Удаляем самые старые превью, пока не освободим четверть лимита
+        target = self.disk_bytes * 3 // 4
+        files = sorted(self._thumb_files())
+        used = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if used <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            used -= size
+        self.disk_used = used
+
+    # --- Синхронный доступ ---
+
+    def get(self, file_path):
+        """QPixmap превью для файла (GUI-поток)."""
+        key = self.key_for(file_path)
+        pixmap = self.cached_pixmap(key)
+        if pixmap is None:
+            key, image = self.load_image(file_path, key)
+            pixmap = self.put_pixmap(key, image)
+        return pixmap
+
+    def stats(self):
+        with self.lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+                "memory_items": len(self.memory),
+                "disk_bytes": self.disk_used,
+            }
+
+
+# Общий кеш превью для всех окон
+thumbnails = ThumbnailCache()
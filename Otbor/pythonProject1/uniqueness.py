@@ -0,0 +1,139 @@
+"""Уникальность паспортов и номеров ВУ.
+
+Номер приводится к каноническому виду и хешируется в 64-битное число.
+В базе (таблица unique_keys) ключом служит этот хеш, поэтому поиск идет по
+компактному целочисленному индексу. Перед массовой загрузкой ключи из базы
+собираются в фильтр Блума: кандидат, которого нет в фильтре, точно новый,
+и база для него не запрашивается.
+"""
+import hashlib
+import math
+import re
+
+PASSPORT = "passport"
+LICENSE = "license"
+KINDS = (PASSPORT, LICENSE)
+
+_SPACES = re.compile(r"[\s-]+")
+# Кириллические буквы, совпадающие по написанию с латинскими
+_TO_LATIN = str.maketrans("АВЕКМНОРСТУХ", "ABEKMHOPCTYX")
+
+_MESSAGES = {
+    PASSPORT: "Паспорт {value} уже зарегистрирован за водителем {owner}.",
+    LICENSE: "ВУ {value} уже зарегистрировано за водителем {owner}.",
+}
+
+
+class DuplicateKeyError(ValueError):
+    def __init__(self, kind, value, owner):
+        super().__init__(duplicate_message(kind, value, owner))
+        self.kind = kind
+        self.value = value
+        self.owner = owner
+
+
+def duplicate_message(kind, value, owner):
+    return _MESSAGES[kind].format(value=value, owner=owner)
+
+
+def normalize(kind, value):
+    """'1234 567890' и '1234567890' — один паспорт; 'ав 123' и 'AB123' — одно ВУ."""
+    return _SPACES.sub("", value).upper().translate(_TO_LATIN)
+
+
+def unique_key(kind, value):
+    """Текст ключа в unique_keys: 'passport:1234567890'."""
+    return f"{kind}:{normalize(kind, value)}"
+
+
+def key_hash(kind, value):
+    """Знаковое 64-битное число (тип INTEGER SQLite)."""
+    digest = hashlib.blake2b(unique_key(kind, value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+class BloomFilter:
+    """Фильтр Блума по 64-битным хешам ключей.
+
+    Позиции битов получаются из двух половин хеша (двойное хеширование),
+    поэтому текст ключа повторно не хешируется.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1000)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value_hash):
+        value_hash &= 0xFFFFFFFFFFFFFFFF
+        first = value_hash & 0xFFFFFFFF
+        step = (value_hash >> 32) | 1
+        size = self.size
+        return [(first + number * step) % size for number in range(self.hashes)]
+
+    def add_hash(self, value_hash):
+        bits = self.bits
+        for position in self._positions(value_hash):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def might_contain_hash(self, value_hash):
+        bits = self.bits
+        for position in self._positions(value_hash):
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+    def add(self, kind, value):
+        self.add_hash(key_hash(kind, value))
+
+    def might_contain(self, kind, value):
+        return self.might_contain_hash(key_hash(kind, value))
+
+    @classmethod
+    def from_store(cls, store, headroom=1000000, error_rate=0.001):
+        """Фильтр по всем ключам базы с запасом на headroom новых ключей."""
+        bloom = cls(store.count_unique_keys() + headroom, error_rate)
+        for value_hash in store.iter_key_hashes():
+            bloom.add_hash(value_hash)
+        return bloom
+
+
+def registered_owners(store, kind, items, bloom=None):
+    """{индекс: GUID} для номеров пачки [(номер, GUID)], уже занятых в базе
+    или раньше в этой же пачке.
+
+    Если передан bloom, в базе проверяются только номера, которые фильтр
+    считает возможно существующими.
+    """
+    if bloom is None:
+        candidates = [value for value, _ in items]
+    else:
+        candidates = [value for value, _ in items if bloom.might_contain_hash(key_hash(kind, value))]
+    registered = store.key_owners(kind, candidates) if candidates else {}
+    owners = {}
+    seen = {}
+    for index, (value, driver_id) in enumerate(items):
+        key = normalize(kind, value)
+        owner = registered.get(key) or seen.get(key)
+        if owner:
+            owners[index] = owner
+        else:
+            seen[key] = driver_id
+    return owners
+
+
+def is_duplicate(kind, owner, driver_id):
+    # Паспорт может повторно сохранить тот же водитель, номер ВУ не регистрируется дважды
+    return kind == LICENSE or owner != driver_id
+
+
+def find_duplicates(store, kind, items, bloom=None):
+    """{индекс: GUID владельца} для номеров пачки, занятых другим водителем (паспорт) или вообще (ВУ)."""
+    return {
+        index: owner
+        for index, owner in registered_owners(store, kind, items, bloom).items()
+        if is_duplicate(kind, owner, items[index][1])
+    }
@@ -0,0 +1,167 @@
+import re
+from operator import itemgetter
+
+from categories import CATEGORIES_RE
+
+# Шаблоны компилируются один раз при импорте модуля
+PASSPORT_RE = re.compile(r"\d{4}\s\d{6}")
+PHONE_RE = re.compile(r"\+7\d{10}")
+EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+# ДД.ММ.ГГГГ или ГГГГ-ММ-ДД, календарная проверка — dates.parse_day
+DATE_RE = re.compile(r"\d{2}\.\d{2}\.\d{4}|\d{4}-\d{2}-\d{2}")
+
+# Правила полей: (шаблон формата или None, текст ошибки)
+RULES = {
+    "last_name": (None, "Фамилия обязательна."),
+    "first_name": (None, "Имя обязательно."),
+    "middle_name": (None, "Отчество обязательно."),
+    "passport": (PASSPORT_RE, "Паспорт должен быть в формате 'XXXX XXXXXX'."),
+    "registration_city": (None, "Город регистрации обязателен."),
+    "registration_address": (None, "Адрес регистрации обязателен."),
+    "living_city": (None, "Город проживания обязателен."),
+    "living_address": (None, "Адрес проживания обязателен."),
+    "phone": (PHONE_RE, "Телефон должен быть в формате '+7XXXXXXXXXX'."),
+    "email": (EMAIL_RE, "Email имеет неверный формат."),
+    "photo_path": (None, "Фотография обязательна."),
+    "dob": (None, "Дата рождения обязательна."),
+    # Водительское удостоверение
+    "driver_id": (None, "Идентификатор водителя обязателен."),
+    "license_number": (None, "Номер удостоверения обязателен."),
+    "issue_date": (DATE_RE, "Дата выдачи должна быть в формате ДД.ММ.ГГГГ."),
+    "expiry_date": (DATE_RE, "Дата окончания действия должна быть в формате ДД.ММ.ГГГГ."),
+    "issuing_authority": (None, "Орган, выдавший удостоверение, обязателен."),
+    "vehicle_categories": (CATEGORIES_RE, "Категории транспортных средств указаны неверно (например: B, C, CE)."),
+}
+
+# Полный набор полей формы создания водителя (hash.py)
+DRIVER_FIELDS = (
+    "last_name", "first_name", "middle_name", "passport",
+    "registration_city", "registration_address", "living_city", "living_address",
+    "phone", "email", "photo_path",
+)
+
+# Поля формы регистрации ВУ (d.py)
+LICENSE_FIELDS = (
+    "driver_id", "license_number", "issue_date", "expiry_date",
+    "issuing_authority", "vehicle_categories",
+)
+
+
+def _tuple_getter(fields):
+    # itemgetter с одним ключом возвращает значение, а не кортеж
+    if len(fields) == 1:
+        field = fields[0]
+        return lambda record: (record[field],)
+    if not fields:
+        return lambda record: ()
+    return itemgetter(*fields)
+
+
+class Validator:
+    """Проверка записей водителей без привязки к виджетам.
+
+    Ошибки возвращаются словарем {поле: текст ошибки} в порядке полей.
+    """
+
+    def __init__(self, fields=DRIVER_FIELDS):
+        self.fields = tuple(fields)
+        self.checks = tuple(
+            (field, RULES[field][0].fullmatch if RULES[field][0] else None, RULES[field][1])
+            for field in self.fields
+        )
+        # Для проверки одного поля по мере ввода (form_validation.py)
+        self.field_checks = {field: (check, message) for field, check, message in self.checks}
+        self.getter = _tuple_getter(self.fields)
+        # Быстрый путь: все шаблоны склеены в один через разделитель \x00,
+        # который не допускает ни один из них, — одна проверка вместо нескольких
+        pattern_fields = [field for field in self.fields if RULES[field][0]]
+        self.pattern_getter = _tuple_getter(pattern_fields)
+        self.combined = re.compile(
+            "\x00".join(f"(?:{RULES[field][0].pattern})" for field in pattern_fields)
+        ).fullmatch
+
+    def validate(self, record):
+        # Значение не строкой (число из JSON, None) — ошибка поля, а не исключение:
+        # пакетная загрузка отклоняет такую запись и идет дальше
+        errors = {}
+        get = record.get
+        for field, check, message in self.checks:
+            value = get(field)
+            if not value or not isinstance(value, str) or (check is not None and check(value) is None):
+                errors[field] = message
+        return errors
+
+    def validate_field(self, field, value):
+        """Текст ошибки одного поля или None. Поля вне набора не проверяются."""
+        entry = self.field_checks.get(field)
+        if entry is None:
+            return None
+        check, message = entry
+        if not value or not isinstance(value, str) or (check is not None and check(value) is None):
+            return message
+        return None
+
+    def is_valid(self, record):
+        try:
+            return all(self.getter(record)) and self.combined("\x00".join(self.pattern_getter(record))) is not None
+        except (KeyError, TypeError):
+            return False
+
+    def validate_batch(self, records):
+        """Проверка пачки записей.
+
+        Возвращает список (индекс записи, ошибки) только для невалидных записей.
+        Валидные записи проходят по быстрому пути без построения словаря ошибок.
+        """
+        getter = self.getter
+        pattern_getter = self.pattern_getter
+        combined = self.combined
+        join = "\x00".join
+        validate = self.validate
+        invalid = []
+        for index, record in enumerate(records):
+            try:
+                if all(getter(record)) and combined(join(pattern_getter(record))) is not None:
+                    continue
+            except (KeyError, TypeError):
+                pass
+            invalid.append((index, validate(record)))
+        return invalid
+
+
+# Наборы обязательных полей форм
+PROFILES = {
+    # hash.py, CreateDriverWindow
+    "driver": DRIVER_FIELDS,
+    # authorization.py, CreateDriverWindow: без городов, фото не обязательно
+    "driver_no_city": (
+        "last_name", "first_name", "middle_name", "passport",
+        "registration_address", "living_address", "phone", "email",
+    ),
+    # d.py, AddDriverWindow
+    "driver_short": ("last_name", "first_name", "middle_name", "dob"),
+    # d.py, DriverLicenseWindow
+    "license": LICENSE_FIELDS,
+}
+
+# Валидатор формы создания водителя по умолчанию
+driver_validator = Validator()
+license_validator = Validator(LICENSE_FIELDS)
+_validators = {"driver": driver_validator, "license": license_validator}
+
+
+def get_validator(profile):
+    validator = _validators.get(profile)
+    if validator is None:
+        if profile not in PROFILES:
+            raise ValueError(f"Неизвестный набор правил: {profile}")
+        validator = _validators[profile] = Validator(PROFILES[profile])
+    return validator
+
+
+def validate_driver(record):
+    return driver_validator.validate(record)
+
+
+def validate_batch(records):
+    return driver_validator.validate_batch(records)